@@ -3,7 +3,10 @@ Reklam Analiz Web Uygulaması
 """
 from flask import Flask
 import os
-import numpy as np
+import sys
+import time
+import click
+import importlib
 from flask.json.provider import DefaultJSONProvider
 from flask_login import LoginManager
 from dotenv import load_dotenv
@@ -15,8 +18,12 @@ class NumpyJSONProvider(DefaultJSONProvider):
     """
     Numpy tiplerini (int64, float64) otomatik olarak Python native tiplerine çeviren JSON Provider.
     "Object of type int64 is not JSON serializable" hatasını çözer.
+    numpy yüklenmemişse obj numpy tipi olamaz; import edilmez.
     """
     def default(self, obj):
+        np = sys.modules.get('numpy')
+        if np is None:
+            return super().default(obj)
         if isinstance(obj, np.integer):
             return int(obj)
         if isinstance(obj, np.floating):
@@ -25,6 +32,37 @@ class NumpyJSONProvider(DefaultJSONProvider):
             return obj.tolist()
         return super().default(obj)
 
+# Web katmanı bunları ilk kullanımda yükler (routes içindeki yerel import'lar);
+# gunicorn preload modunda master süreçte bir kez yüklenip worker'larla paylaşılır
+HEAVY_MODULES = (
+    'pandas',
+    'pyarrow',
+    'app.services.pipeline_service',
+    'app.services.query_service',
+    'app.services.edit_service',
+    'app.services.lag_service',
+    'pymysql',
+    'sqlalchemy',
+    'sshtunnel',
+)
+
+
+def preload_heavy_modules():
+    """
+    HEAVY_MODULES'ü şimdi yükle (gunicorn master'ında fork öncesi çağrılır)
+
+    Returns:
+        float: Süre (sn)
+    """
+    started = time.perf_counter()
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+    # pyarrow'un pandas entegrasyonu da tembel yüklenir (bkz. pipeline_service)
+    from app.services.pipeline_service import _init_arrow_pandas
+    _init_arrow_pandas()
+    return time.perf_counter() - started
+
+
 def create_app():
     app = Flask(__name__, 
                 template_folder='../templates',
@@ -35,8 +73,9 @@ def create_app():
     
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-    app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), '../data/uploads')
-    app.config['OUTPUT_FOLDER'] = os.path.join(os.path.dirname(__file__), '../data/output')
+    app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', os.path.join(os.path.dirname(__file__), '../data/uploads'))
+    app.config['OUTPUT_FOLDER'] = os.environ.get('OUTPUT_FOLDER', os.path.join(os.path.dirname(__file__), '../data/output'))
+    app.config['PROFILE_FOLDER'] = os.environ.get('PROFILE_FOLDER', os.path.join(os.path.dirname(__file__), '../data/profiles'))
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
     
     # Ensure folders exist
@@ -63,4 +102,58 @@ def create_app():
     from app.routes import main_bp
     app.register_blueprint(main_bp)
     
+    # Opsiyonel istek profilleme (REQUEST_PROFILING=1)
+    from app.utils.request_profile import init_request_profiling
+    init_request_profiling(app)
+    
+    @app.cli.command('backfill-rollups')
+    @click.option('--force', is_flag=True, help='Güncel rollup\'ları da yeniden üret')
+    def backfill_rollups_command(force):
+        """Kampanyalar arası rollup tablolarını mevcut çıktılardan doldur"""
+        from app.routes import rollup_store, campaign_store
+        from app.services.rollup_service import backfill_rollups
+        backfill_rollups(rollup_store, campaign_store, app.config['OUTPUT_FOLDER'], force=force)
+
+    @app.cli.command('analyze-bulk')
+    @click.argument('source', type=click.Path(exists=True))
+    @click.option('--start', 'start_date', help='Varsayılan başlangıç tarihi (YYYY-MM-DD)')
+    @click.option('--end', 'end_date', help='Varsayılan bitiş tarihi (YYYY-MM-DD)')
+    @click.option('--workers', default=4, show_default=True, help='Paralel süreç sayısı')
+    @click.option('--db-concurrency', default=2, show_default=True,
+                  help='Aynı anda açık veritabanı bağlantısı üst sınırı')
+    def analyze_bulk_command(source, start_date, end_date, workers, db_concurrency):
+        """Bir dizin veya manifest'teki alıcı CSV'lerini toplu analiz et"""
+        from app.routes import campaign_store
+        from app.services.bulk_service import load_jobs, run_bulk
+        try:
+            jobs = load_jobs(source, start_date, end_date)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        if not jobs:
+            raise click.ClickException('Analiz edilecek CSV bulunamadı')
+        summary = run_bulk(jobs, app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER'],
+                           store_path=campaign_store.store_path,
+                           workers=workers, db_concurrency=db_concurrency)
+        if summary['failed']:
+            raise SystemExit(1)
+
+    @app.cli.command('load-data-source')
+    @click.argument('forms_csv', type=click.Path(exists=True))
+    @click.option('--adsets', 'adsets_csv', type=click.Path(exists=True),
+                  help='adset_id,name sütunlu CSV')
+    @click.option('--path', help='SQLite dosyası (varsayılan DATA_SOURCE_PATH)')
+    @click.option('--append', is_flag=True, help='Mevcut tablolara ekle (varsayılan: yeniden oluştur)')
+    def load_data_source_command(forms_csv, adsets_csv, path, append):
+        """Yerel (sqlite) veri kaynağını form kayıtları CSV'sinden doldur"""
+        import pandas as pd
+        from app.utils.data_source import SQLiteDataSource
+        source = SQLiteDataSource(path)
+        df_forms = pd.read_csv(forms_csv, dtype=str)
+        df_adsets = pd.read_csv(adsets_csv, dtype=str) if adsets_csv else None
+        try:
+            count = source.write(df_forms, df_adsets, replace=not append)
+        except KeyError as e:
+            raise click.ClickException(f"Eksik sütun: {e}")
+        click.echo(f"✅ {count} form kaydı yazıldı: {source.path}")
+
     return app
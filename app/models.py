@@ -3,9 +3,11 @@ Campaign ve Analysis modelleri
 """
 from datetime import datetime
 from dataclasses import dataclass
-from typing import Optional, List
+from contextlib import contextmanager
+from typing import Optional, List, Iterable
 import json
 import os
+import sqlite3
 from flask_login import UserMixin
 
 @dataclass
@@ -63,8 +65,13 @@ class AnalysisResult:
         }
 
 
-class CampaignStore:
-    """Kampanya verilerini dosya sisteminde saklar (basit JSON store)"""
+def campaign_output_dir(output_root, campaign_id):
+    """Kampanya çıktı dizini (OUTPUT_FOLDER/final/<id>)"""
+    return os.path.join(output_root, 'final', campaign_id)
+
+
+class JsonCampaignStore:
+    """Kampanya verilerini dosya sisteminde saklar (basit JSON store, eski format)"""
     
     def __init__(self, store_path='data/campaigns'):
         self.store_path = store_path
@@ -106,3 +113,191 @@ class CampaignStore:
         if campaign:
             campaign.status = status
             self.save(campaign)
+
+
+class CampaignStore:
+    """
+    Kampanya verilerini SQLite'ta (WAL modu) saklar.
+    
+    Birden fazla gunicorn worker'ı aynı dosyayı güvenle kullanabilir; durum
+    geçişleri tek bir UPDATE ile atomiktir. İlk açılışta eski JSON
+    dosyaları bir kez içeri aktarılır.
+    """
+    
+    DB_FILENAME = 'campaigns.db'
+    COLUMNS = ['id', 'name', 'start_date', 'end_date', 'customer_file', 'created_at', 'status']
+    
+    def __init__(self, store_path='data/campaigns'):
+        self.store_path = store_path
+        os.makedirs(store_path, exist_ok=True)
+        self.db_path = os.path.join(store_path, self.DB_FILENAME)
+        self._init_db()
+        self._migrate_json()
+    
+    @contextmanager
+    def _connect(self):
+        """İşlem başına kısa ömürlü bağlantı (thread/fork güvenli)"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA busy_timeout = 30000')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS campaigns (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    start_date TEXT,
+                    end_date TEXT,
+                    customer_file TEXT,
+                    created_at TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    updated_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_campaigns_created_at ON campaigns (created_at DESC);
+                CREATE INDEX IF NOT EXISTS idx_campaigns_status ON campaigns (status, created_at DESC);
+                CREATE TABLE IF NOT EXISTS store_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+    
+    def _migrate_json(self):
+        """data/campaigns/*.json dosyalarını bir kez veritabanına aktar"""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                done = conn.execute(
+                    "SELECT value FROM store_meta WHERE key = 'json_migrated'"
+                ).fetchone()
+                if done:
+                    conn.execute('COMMIT')
+                    return
+                
+                json_store = JsonCampaignStore(self.store_path)
+                migrated = 0
+                for campaign in json_store.list_all():
+                    cursor = conn.execute(
+                        f"INSERT OR IGNORE INTO campaigns ({', '.join(self.COLUMNS)}, updated_at) "
+                        f"VALUES ({', '.join('?' * len(self.COLUMNS))}, ?)",
+                        (*self._row_values(campaign), datetime.now().isoformat())
+                    )
+                    migrated += cursor.rowcount
+                
+                conn.execute(
+                    "INSERT INTO store_meta (key, value) VALUES ('json_migrated', ?)",
+                    (datetime.now().isoformat(),)
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        
+        if migrated:
+            print(f"✓ {migrated} kampanya JSON dosyalarından SQLite'a aktarıldı")
+    
+    @staticmethod
+    def _row_values(campaign: Campaign):
+        data = campaign.to_dict()
+        return tuple(data[col] for col in CampaignStore.COLUMNS)
+    
+    @staticmethod
+    def _from_row(row) -> Campaign:
+        return Campaign.from_dict({col: row[col] for col in CampaignStore.COLUMNS})
+    
+    def save(self, campaign: Campaign):
+        """Kampanya kaydet (varsa güncelle)"""
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO campaigns ({', '.join(self.COLUMNS)}, updated_at) "
+                f"VALUES ({', '.join('?' * len(self.COLUMNS))}, ?) "
+                "ON CONFLICT(id) DO UPDATE SET "
+                + ', '.join(f"{col} = excluded.{col}" for col in self.COLUMNS[1:])
+                + ", updated_at = excluded.updated_at",
+                (*self._row_values(campaign), datetime.now().isoformat())
+            )
+    
+    def get(self, campaign_id: str) -> Optional[Campaign]:
+        """Kampanya getir"""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM campaigns WHERE id = ?",
+                (campaign_id,)
+            ).fetchone()
+        return self._from_row(row) if row else None
+    
+    def list_page(self, limit: Optional[int] = None, offset: int = 0,
+                  status: Optional[str] = None) -> List[Campaign]:
+        """Kampanyaları en yeni önce, sayfalı ve opsiyonel durum filtresiyle listele"""
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM campaigns"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [self._from_row(row) for row in rows]
+    
+    def count(self, status: Optional[str] = None) -> int:
+        """Kampanya sayısı"""
+        with self._connect() as conn:
+            if status:
+                row = conn.execute("SELECT COUNT(*) FROM campaigns WHERE status = ?", (status,)).fetchone()
+            else:
+                row = conn.execute("SELECT COUNT(*) FROM campaigns").fetchone()
+        return row[0]
+    
+    def status_counts(self) -> dict:
+        """Durum bazında kampanya sayıları ({status: sayı})"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM campaigns GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+    
+    def list_all(self) -> List[Campaign]:
+        """Tüm kampanyaları listele"""
+        return self.list_page()
+    
+    def state_token(self, status: Optional[str] = None) -> str:
+        """Listenin değişip değişmediğini anlamak için ucuz imza (sayı + son güncelleme)"""
+        with self._connect() as conn:
+            if status:
+                row = conn.execute(
+                    "SELECT COUNT(*), MAX(updated_at) FROM campaigns WHERE status = ?", (status,)
+                ).fetchone()
+            else:
+                row = conn.execute("SELECT COUNT(*), MAX(updated_at) FROM campaigns").fetchone()
+        return f"{row[0]}:{row[1]}"
+    
+    def update_status(self, campaign_id: str, status: str,
+                      expected_status: Optional[Iterable[str]] = None) -> bool:
+        """
+        Kampanya durumunu atomik olarak güncelle
+        
+        Args:
+            expected_status: Verilirse sadece mevcut durum bunlardan biriyse güncellenir
+                (örn. ('pending', 'error') → 'processing')
+        
+        Returns:
+            bool: Güncelleme yapıldı mı
+        """
+        query = "UPDATE campaigns SET status = ?, updated_at = ? WHERE id = ?"
+        params = [status, datetime.now().isoformat(), campaign_id]
+        if expected_status is not None:
+            expected_status = list(expected_status)
+            query += f" AND status IN ({', '.join('?' * len(expected_status))})"
+            params.extend(expected_status)
+        
+        with self._connect() as conn:
+            cursor = conn.execute(query, params)
+        return cursor.rowcount == 1
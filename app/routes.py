@@ -3,24 +3,43 @@ Flask Routes
 Ana API endpoints
 """
 
-from flask import Blueprint, render_template, request, jsonify, send_file, current_app, redirect, url_for
-import pandas as pd
+from flask import Blueprint, render_template, request, jsonify, send_file, current_app, redirect, url_for, Response, stream_with_context
 import os
+import re
 import uuid
-import json
+import hmac
+import hashlib
 from datetime import datetime
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 from flask_login import login_user, logout_user, login_required, current_user
 
-from app.models import Campaign, CampaignStore, AnalysisResult, User
-from app.services.utm_service import collect_utm_data, process_utm_details
-from app.services.reklam_service import enrich_with_ad_details
-from app.services.analysis_service import categorize_customers, split_by_category
-from app.services.export_service import create_campaign_export, export_to_csv
-from app.services.validation_service import validate_analysis, create_validation_report_html
+from app.models import Campaign, CampaignStore, AnalysisResult, User, campaign_output_dir
+from app.services.summary_service import get_summary, write_summary
+from app.services.rollup_service import RollupStore, DIMENSIONS, refresh_campaign_rollup, backfill_rollups
+from app.services.scheduler_service import (
+    JobQueue, AnalysisScheduler, QueueFullError, ACTIVE_STATUSES, job_to_dict, count_csv_rows
+)
+from app.utils.cancellation import AnalysisCancelled
+from app.utils.metrics import render_prometheus
+from app.utils.health import readiness
+from app.utils.query_profile import QUERY_PROFILE_FILENAME
+from app.utils.request_profile import list_profiles, profile_path
 
 main_bp = Blueprint('main', __name__)
 campaign_store = CampaignStore()
+rollup_store = RollupStore()
+
+CAMPAIGN_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+MAX_PAGE_LIMIT = 1000
+CAMPAIGNS_PER_PAGE = 24
+
+
+def _campaign_output_dir(campaign_id):
+    """Kampanya çıktı dizini (geçersiz ID'ler için None)"""
+    if not CAMPAIGN_ID_PATTERN.match(campaign_id):
+        return None
+    return os.path.join(current_app.config['OUTPUT_FOLDER'], 'final', campaign_id)
 
 
 @main_bp.route('/login', methods=['GET', 'POST'])
@@ -54,9 +73,56 @@ def logout():
 @main_bp.route('/')
 @login_required
 def index():
-    """Ana sayfa - Kampanya listesi"""
-    campaigns = campaign_store.list_all()
-    return render_template('index.html', campaigns=campaigns)
+    """Ana sayfa - Kampanya listesi (sayfalı)"""
+    page = max(1, request.args.get('page', 1, type=int))
+    status = request.args.get('status') or None
+    
+    total = campaign_store.count(status)
+    total_pages = max(1, (total + CAMPAIGNS_PER_PAGE - 1) // CAMPAIGNS_PER_PAGE)
+    page = min(page, total_pages)
+    
+    campaigns = campaign_store.list_page(
+        limit=CAMPAIGNS_PER_PAGE,
+        offset=(page - 1) * CAMPAIGNS_PER_PAGE,
+        status=status
+    )
+    
+    # Tamamlanan kampanyaların özetleri (cache'ten)
+    summaries = {}
+    for campaign in campaigns:
+        if campaign.status == 'completed':
+            output_dir = _campaign_output_dir(campaign.id)
+            summaries[campaign.id] = get_summary(output_dir) if output_dir else None
+    
+    etag_source = '|'.join([
+        campaign_store.state_token(status), str(page), str(status),
+        *[f"{cid}:{(summary or {}).get('etag')}" for cid, summary in summaries.items()]
+    ])
+    etag = hashlib.sha256(etag_source.encode('utf-8')).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    
+    response = current_app.make_response(render_template(
+        'index.html',
+        campaigns=campaigns,
+        summaries=summaries,
+        page=page,
+        total_pages=total_pages,
+        total=total,
+        status=status
+    ))
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _not_modified(etag, weak=False):
+    response = Response(status=304)
+    response.set_etag(etag, weak=weak)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 
 @main_bp.route('/campaign/new')
@@ -150,11 +216,147 @@ def create_campaign():
         return jsonify({'error': str(e)}), 500
 
 
+# Analiz yeniden başlatılabilecek kampanya durumları
+ANALYZABLE_STATUSES = ('pending', 'error', 'completed', 'cancelled')
+
+
+def _job_campaign_ids(job):
+    """İşin durumunu yönettiği kampanyalar (hızlı tahmin kampanya durumuna dokunmaz)"""
+    if job['kind'] == 'batch':
+        return (job.get('payload') or {}).get('campaign_ids') or []
+    if job['kind'] == 'estimate':
+        return []
+    return [job['campaign_id']] if job.get('campaign_id') else []
+
+
+def _run_estimate_job(job):
+    """Hızlı tahmin işi: örneklem analizi estimate/ altına yazılır"""
+    from app.services.pipeline_service import read_customer_file
+    from app.services.estimate_service import run_estimate
+    
+    campaign = campaign_store.get(job['campaign_id'])
+    if not campaign:
+        raise Exception('Kampanya bulunamadı')
+    payload = job.get('payload') or {}
+    _, _, email_list = read_customer_file(
+        os.path.join(current_app.config['UPLOAD_FOLDER'], campaign.customer_file)
+    )
+    run_estimate(
+        campaign,
+        email_list,
+        campaign_output_dir(current_app.config['OUTPUT_FOLDER'], campaign.id),
+        sample_size=payload.get('sample_size'),
+        seed=payload.get('seed', 0)
+    )
+
+
+def _run_analysis_job(job):
+    """
+    Kuyruktan alınan analiz işini çalıştır (dağıtıcı thread'inde, uygulama
+    bağlamında). Hata kampanyayı 'error', iptal 'cancelled' yapar.
+    """
+    from app.services.pipeline_service import read_customer_file, run_analysis, run_batch_analysis
+    from app.services.estimate_service import load_sample_submissions
+    
+    if job['kind'] == 'estimate':
+        return _run_estimate_job(job)
+    
+    if job['kind'] == 'batch':
+        campaigns = [c for c in map(campaign_store.get, job['payload']['campaign_ids']) if c]
+        for campaign in campaigns:
+            campaign_store.update_status(campaign.id, 'processing')
+        try:
+            outcomes = run_batch_analysis(
+                campaigns,
+                current_app.config['UPLOAD_FOLDER'],
+                current_app.config['OUTPUT_FOLDER'],
+                campaign_store,
+                rollup_store=rollup_store
+            )
+        except AnalysisCancelled:
+            # Bitmiş kampanyalar sonuçlarını korur
+            for campaign in campaigns:
+                campaign_store.update_status(campaign.id, 'cancelled', expected_status=('processing',))
+            raise
+        failed = [campaign_id for campaign_id, outcome in outcomes.items() if not outcome['success']]
+        if failed:
+            raise Exception(f"{len(failed)} kampanya hata ile bitti: {', '.join(failed)}")
+        return
+    
+    campaign = campaign_store.get(job['campaign_id'])
+    if not campaign:
+        raise Exception('Kampanya bulunamadı')
+    
+    try:
+        campaign_store.update_status(campaign.id, 'processing')
+        customer_file = os.path.join(current_app.config['UPLOAD_FOLDER'], campaign.customer_file)
+        output_dir = campaign_output_dir(current_app.config['OUTPUT_FOLDER'], campaign.id)
+        run_analysis(
+            campaign,
+            customer_file,
+            output_dir,
+            rollup_store=rollup_store,
+            customer_data=read_customer_file(customer_file),
+            # Güncel hızlı tahminin örneklemi tekrar sorgulanmaz
+            prefetched=load_sample_submissions(output_dir, campaign)
+        )
+        
+        # Status güncelle
+        campaign_store.update_status(campaign.id, 'completed')
+        
+        print("\n=== ANALİZ TAMAMLANDI! ===\n")
+    
+    except AnalysisCancelled:
+        print(f"\n⏹️ ANALİZ İPTAL EDİLDİ: {campaign.id}\n")
+        campaign_store.update_status(campaign.id, 'cancelled')
+        raise
+    
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        print("\n" + "="*80)
+        print("❌❌❌ HATA DETAYLARI ❌❌❌")
+        print("="*80)
+        print(f"Hata Mesajı: {str(e)}")
+        print(f"Hata Tipi: {type(e).__name__}")
+        print("\nStack Trace:")
+        print(error_details)
+        print("="*80 + "\n")
+        
+        campaign_store.update_status(campaign.id, 'error')
+        raise
+
+
+def _fail_stale_job(job):
+    """Heartbeat'i kesilen (worker'ı ölen) işin kampanyalarını 'error' yap"""
+    for campaign_id in _job_campaign_ids(job):
+        campaign_store.update_status(campaign_id, 'error', expected_status=('queued', 'processing'))
+
+
+job_queue = JobQueue()
+scheduler = AnalysisScheduler(job_queue, _run_analysis_job, on_stale=_fail_stale_job)
+
+
+@main_bp.before_app_request
+def _start_scheduler():
+    """Her süreç (gunicorn worker'ı) ilk istekte kendi dağıtıcısını başlatır"""
+    scheduler.ensure_started(current_app._get_current_object())
+
+
+def _queue_full_response(error):
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = 429 if error.per_user else 503
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
 @main_bp.route('/api/campaign/<campaign_id>/analyze', methods=['POST'])
 @login_required
 def analyze_campaign(campaign_id):
     """
-    Kampanya analizini başlat
+    Kampanya analizini kuyruğa al (202). Analiz, zamanlayıcı yer açtığında
+    arka planda çalışır; durum /api/campaign/<id>/job ile izlenir.
     
     Pipeline:
     1. UTM verilerini topla (collect_utm_data)
@@ -162,178 +364,261 @@ def analyze_campaign(campaign_id):
     3. Reklam detaylarını ekle (enrich_with_ad_details)
     4. Kategorilere ayır (categorize_customers)
     5. Export dosyaları oluştur
+    
+    Kuyruk doluysa 503 (kullanıcının kuyruğu doluysa 429) ve Retry-After döner.
     """
+    from app.services.pipeline_service import read_customer_file, CustomerFileError
     
     try:
         campaign = campaign_store.get(campaign_id)
         if not campaign:
             return jsonify({'error': 'Kampanya bulunamadı'}), 404
         
-        # Status güncelle
-        campaign_store.update_status(campaign_id, 'processing')
+        # Status güncelle (atomik: aynı kampanya iki kez kuyruğa alınamaz)
+        if not campaign_store.update_status(campaign_id, 'queued',
+                                            expected_status=ANALYZABLE_STATUSES):
+            return jsonify({'error': 'Analiz zaten sırada veya çalışıyor'}), 409
         
-        # Müşteri dosyasını oku
+        # Dosya hataları kuyruğa girmeden bildirilir; email sayısı iş boyutudur
         customer_file = os.path.join(current_app.config['UPLOAD_FOLDER'], campaign.customer_file)
-        df_customers = pd.read_csv(customer_file)
-        
-        # Email sütununu bul
-        email_column = None
-        for col in ['email', 'Email', 'EMAIL', 'MAİL ADRESİ', 'Mail']:
-            if col in df_customers.columns:
-                email_column = col
-                break
-        
-        if not email_column:
+        try:
+            _, _, email_list = read_customer_file(customer_file)
+        except CustomerFileError as e:
+            campaign_store.update_status(campaign_id, 'error')
             return jsonify({
-                'error': 'Email sütunu bulunamadı',
-                'columns': df_customers.columns.tolist()
+                'error': str(e),
+                'columns': e.columns
             }), 400
         
-        email_list = df_customers[email_column].dropna().unique().tolist()
-        
-        results = {}
-        
-        # STEP 1: UTM verilerini topla
-        print("\n" + "="*80)
-        print("🔄 STEP 1: UTM VERİLERİ TOPLANIYOR")
-        print(f"📧 Email Sayısı: {len(email_list)}")
-        print(f"📅 Tarih Aralığı: {campaign.start_date} - {campaign.end_date}")
-        print("="*80)
-        
-        df_all_records, stats1 = collect_utm_data(
-            email_list=email_list,
-            start_date=campaign.start_date,
-            end_date=campaign.end_date,
-            campaign_id=campaign_id
-        )
-        
-        print(f"✅ STEP 1 TAMAMLANDI: {len(df_all_records)} kayıt toplandı")
-        results['step1'] = stats1
-        
-        # STEP 2: UTM detaylarını netleştir
-        print("\n=== STEP 2: UTM DETAYLARI NETLEŞTİRİLİYOR ===")
-        df_utm_details, stats2 = process_utm_details(df_all_records)
-        
-        results['step2'] = stats2
+        try:
+            job = scheduler.submit(current_user.get_id(), len(email_list), campaign_id=campaign_id)
+        except QueueFullError as e:
+            campaign_store.update_status(campaign_id, campaign.status)
+            return _queue_full_response(e)
         
-        # STEP 3: Reklam detaylarını ekle
-        print("\n=== STEP 3: REKLAM DETAYLARI EKLENİYOR ===")
-        df_reklam_detay, stats3 = enrich_with_ad_details(df_utm_details)
-        
-        results['step3'] = stats3
-        
-        # STEP 4: Kategorilere ayır
-        print("\n=== STEP 4: KATEGORİLERE AYRILIYOR ===")
-        df_categorized, stats4 = categorize_customers(df_reklam_detay)
-        
-        results['step4'] = stats4
-        
-        # STEP 4.5: Kalite Kontrol
-        print("\n=== STEP 4.5: KALİTE KONTROL ===")
-        validation_report = validate_analysis(
-            input_file=customer_file,
-            output_df=df_categorized,
-            email_column=email_column
-        )
-        
-        results['validation'] = validation_report
-        
-        # STEP 5: Export dosyaları oluştur
-        print("\n=== STEP 5: DOSYALAR OLUŞTURULUYOR ===")
-        output_dir = os.path.join(current_app.config['OUTPUT_FOLDER'], 'final', campaign_id)
-        exported_files = create_campaign_export(df_categorized, campaign.name, output_dir)
-        
-        results['exported_files'] = exported_files
-
-        # Prepare Final Stats for Frontend
-        final_stats = {
-            'total_emails': len(email_list),
-            'match_rate': round(stats4.get('REKLAM (Meta)', {}).get('percentage', 0), 1),
-            **{k: v['count'] for k, v in stats4.items()}
-        }
-        results['final_stats'] = final_stats
-        
-        # Save Results to JSON file
-        results_file = os.path.join(output_dir, 'results.json')
-        with open(results_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
-        
-        # Status güncelle
-        campaign_store.update_status(campaign_id, 'completed')
-        
-        print("\n=== ANALİZ TAMAMLANDI! ===\n")
-        
-        return jsonify({
+        response = jsonify({
             'success': True,
             'campaign_id': campaign_id,
-            'results': results,
-            'message': 'Analiz tamamlandı'
+            'job': job_to_dict(job),
+            'message': 'Analiz sıraya alındı'
         })
+        response.status_code = 202
+        response.headers['Location'] = url_for('main.campaign_job', campaign_id=campaign_id)
+        return response
     
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print("\n" + "="*80)
-        print("❌❌❌ HATA DETAYLARI ❌❌❌")
-        print("="*80)
-        print(f"Hata Mesajı: {str(e)}")
-        print(f"Hata Tipi: {type(e).__name__}")
-        print("\nStack Trace:")
-        print(error_details)
-        print("="*80 + "\n")
-        
         campaign_store.update_status(campaign_id, 'error')
         return jsonify({
             'error': str(e),
-            'type': type(e).__name__,
-            'details': error_details
+            'type': type(e).__name__
         }), 500
 
 
+@main_bp.route('/api/campaigns/analyze-batch', methods=['POST'])
+@login_required
+def analyze_campaigns_batch():
+    """
+    Birden fazla kampanyayı tek veritabanı geçişiyle analiz et (tek iş olarak kuyruğa alınır, 202)
+    
+    Body: {"campaign_ids": ["...", "..."]}
+    Email'lerin birleşimi ve tarih aralıklarının zarfı için form kayıtları bir kez
+    getirilir; her kampanyanın sonucu tek tek analizle aynıdır.
+    """
+    data = request.get_json(silent=True) or {}
+    campaign_ids = list(dict.fromkeys(data.get('campaign_ids') or []))
+    if not campaign_ids:
+        return jsonify({'error': 'campaign_ids gerekli'}), 400
+    
+    campaigns = []
+    skipped = {}
+    for campaign_id in campaign_ids:
+        campaign = campaign_store.get(campaign_id)
+        if not campaign:
+            skipped[campaign_id] = 'Kampanya bulunamadı'
+        elif not campaign_store.update_status(campaign_id, 'queued',
+                                              expected_status=ANALYZABLE_STATUSES):
+            skipped[campaign_id] = 'Analiz zaten sırada veya çalışıyor'
+        else:
+            campaigns.append(campaign)
+    
+    if not campaigns:
+        return jsonify({'success': False, 'skipped': skipped}), 409
+    
+    # İş boyutu: dosyaların satır sayısı (okuma hataları analizde kampanya bazında raporlanır)
+    size = 0
+    for campaign in campaigns:
+        try:
+            size += count_csv_rows(os.path.join(current_app.config['UPLOAD_FOLDER'], campaign.customer_file))
+        except OSError:
+            pass
+    
+    try:
+        job = scheduler.submit(current_user.get_id(), size, kind='batch',
+                               payload={'campaign_ids': [c.id for c in campaigns]})
+    except QueueFullError as e:
+        for campaign in campaigns:
+            campaign_store.update_status(campaign.id, campaign.status)
+        return _queue_full_response(e)
+    
+    return jsonify({
+        'success': True,
+        'job': job_to_dict(job),
+        'campaigns': [c.id for c in campaigns],
+        'skipped': skipped
+    }), 202
+
+
+@main_bp.route('/api/campaign/<campaign_id>/job')
+@login_required
+def campaign_job(campaign_id):
+    """Kampanyanın son analiz işi: durum, tahmini sıra ve başlama zamanı"""
+    
+    campaign = campaign_store.get(campaign_id) if CAMPAIGN_ID_PATTERN.match(campaign_id) else None
+    if not campaign:
+        return jsonify({'error': 'Kampanya bulunamadı'}), 404
+    job = job_queue.latest_for_campaign(campaign_id)
+    response = jsonify({'campaign_status': campaign.status, 'job': job_to_dict(job)})
+    response.cache_control.no_store = True
+    return response
+
+
+@main_bp.route('/api/campaign/<campaign_id>/estimate', methods=['GET', 'POST'])
+@login_required
+def campaign_estimate(campaign_id):
+    """
+    Hızlı tahmin (örneklem analizi)
+    
+    POST: Kuyruğa al (202). Body/query: sample_size (varsayılan
+        ESTIMATE_SAMPLE_SIZE), seed. Kampanyanın durumu değişmez.
+    GET: Son tahmin işi ve kayıtlı tahmin (kategori payları, en sık
+        utm_campaign / adset'ler ve güven aralıkları)
+    """
+    from app.services.estimate_service import sample_size_setting, load_estimate
+    
+    campaign = campaign_store.get(campaign_id) if CAMPAIGN_ID_PATTERN.match(campaign_id) else None
+    if not campaign:
+        return jsonify({'error': 'Kampanya bulunamadı'}), 404
+    
+    if request.method == 'GET':
+        response = jsonify({
+            'job': job_to_dict(job_queue.latest_for_campaign(campaign_id, kind='estimate')),
+            'estimate': load_estimate(campaign_output_dir(current_app.config['OUTPUT_FOLDER'], campaign_id))
+        })
+        response.cache_control.no_store = True
+        return response
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        sample_size = data.get('sample_size', request.args.get('sample_size'))
+        sample_size = sample_size_setting(int(sample_size) if sample_size is not None else None)
+        seed = int(data.get('seed', request.args.get('seed', 0)))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'sample_size ve seed tam sayı olmalı'}), 400
+    
+    active = job_queue.latest_for_campaign(campaign_id, kind='estimate')
+    if active and active['status'] in ACTIVE_STATUSES:
+        return jsonify({'error': 'Tahmin zaten sırada veya çalışıyor', 'job': job_to_dict(active)}), 409
+    
+    try:
+        job = scheduler.submit(current_user.get_id(), sample_size, campaign_id=campaign_id,
+                               kind='estimate', payload={'sample_size': sample_size, 'seed': seed})
+    except QueueFullError as e:
+        return _queue_full_response(e)
+    
+    response = jsonify({
+        'success': True,
+        'campaign_id': campaign_id,
+        'job': job_to_dict(job),
+        'message': 'Hızlı tahmin sıraya alındı'
+    })
+    response.status_code = 202
+    response.headers['Location'] = url_for('main.campaign_estimate', campaign_id=campaign_id)
+    return response
+
+
+def _cancel_job(job):
+    """
+    İşi iptal et ve cevabı hazırla: sıradaki iş hemen iptal edilir (200),
+    çalışan işe iptal isteği gönderilir (202; pipeline ilk kontrol noktasında durur)
+    """
+    state = scheduler.cancel(job['id'])
+    if state is None:
+        return jsonify({'error': 'Aktif analiz yok', 'job': job_to_dict(job)}), 409
+    if state == 'cancelled':
+        for campaign_id in _job_campaign_ids(job):
+            campaign_store.update_status(campaign_id, 'cancelled', expected_status=('queued',))
+    return jsonify({
+        'success': True,
+        'state': state,
+        'job': job_to_dict(job_queue.get(job['id'])),
+        'message': 'Analiz iptal edildi' if state == 'cancelled' else 'İptal isteği gönderildi'
+    }), 200 if state == 'cancelled' else 202
+
+
+@main_bp.route('/api/campaign/<campaign_id>/cancel', methods=['POST'])
+@login_required
+def cancel_campaign_analysis(campaign_id):
+    """Kampanyanın sıradaki veya çalışan analizini iptal et"""
+    
+    campaign = campaign_store.get(campaign_id) if CAMPAIGN_ID_PATTERN.match(campaign_id) else None
+    if not campaign:
+        return jsonify({'error': 'Kampanya bulunamadı'}), 404
+    job = job_queue.latest_for_campaign(campaign_id)
+    if job is None:
+        return jsonify({'error': 'Aktif analiz yok'}), 409
+    return _cancel_job(job)
+
+
+@main_bp.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(job_id):
+    """Analiz işini (toplu analiz dahil) iptal et"""
+    
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'İş bulunamadı'}), 404
+    return _cancel_job(job)
+
+
+@main_bp.route('/api/jobs')
+@login_required
+def list_jobs():
+    """Analiz kuyruğu: sınırlar, çalışan ve bekleyen işler (tahmini sırayla)"""
+    
+    snapshot = job_queue.snapshot()
+    snapshot['jobs'] = [job_to_dict(job) for job in snapshot['jobs']]
+    response = jsonify(snapshot)
+    response.cache_control.no_store = True
+    return response
+
+
 @main_bp.route('/api/campaign/<campaign_id>/files')
 @login_required
 def list_campaign_files(campaign_id):
-    """Kampanya dosyalarını listele"""
+    """Kampanya dosyalarını listele (önceden hesaplanmış özetten)"""
     
     try:
         campaign = campaign_store.get(campaign_id)
         if not campaign:
             return jsonify({'error': 'Kampanya bulunamadı'}), 404
-            
-        output_dir = os.path.join(current_app.config['OUTPUT_FOLDER'], 'final', campaign_id)
-        
-        files = []
-        validation = None
-        stats = None
-        
-        if os.path.exists(output_dir):
-            # Load results.json if exists
-            results_path = os.path.join(output_dir, 'results.json')
-            if os.path.exists(results_path):
-                try:
-                    with open(results_path, 'r', encoding='utf-8') as f:
-                        results = json.load(f)
-                        validation = results.get('validation')
-                        stats = results.get('final_stats')
-                except Exception as e:
-                    print(f"Error reading results.json: {e}")
-
-            for filename in os.listdir(output_dir):
-                if filename == 'results.json': continue
-                
-                filepath = os.path.join(output_dir, filename)
-                files.append({
-                    'filename': filename,
-                    'size': os.path.getsize(filepath),
-                    'created': datetime.fromtimestamp(os.path.getctime(filepath)).isoformat()
-                })
         
-        return jsonify({
+        output_dir = _campaign_output_dir(campaign_id)
+        summary = get_summary(output_dir) if os.path.isdir(output_dir) else None
+        
+        etag = f"{campaign.status}-{summary['etag'] if summary else 'none'}"
+        if request.if_none_match.contains(etag):
+            return _not_modified(etag)
+        
+        response = jsonify({
             'status': campaign.status,
-            'files': files,
-            'validation': validation,
-            'stats': stats
+            'files': summary['files'] if summary else [],
+            'validation': summary['validation'] if summary else None,
+            'stats': summary['final_stats'] if summary else None
         })
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -342,53 +627,159 @@ def list_campaign_files(campaign_id):
 @main_bp.route('/api/campaign/<campaign_id>/download/<filename>')
 @login_required
 def download_file(campaign_id, filename):
-    """Dosya indir"""
+    """
+    Dosya indir
+    
+    - Strong ETag (dosya içeriğinin sha256'sı), If-None-Match → 304
+    - Range istekleri (yarıda kalan indirmeyi sürdürme) → 206
+    - ?compress=gzip: dosyayı anlık gzip'leyerek stream et
+    """
+    from app.services.export_service import get_export_path, file_content_hash, iter_gzip
     
     try:
-        output_dir = os.path.join(current_app.config['OUTPUT_FOLDER'], 'final', campaign_id)
-        filepath = os.path.join(output_dir, filename)
+        output_dir = _campaign_output_dir(campaign_id)
+        if output_dir is None:
+            return jsonify({'error': 'Dosya bulunamadı'}), 404
+        
+        # Export dosyası henüz yoksa burada üretilir (lazy)
+        filepath = get_export_path(output_dir, filename)
         
-        if not os.path.exists(filepath):
+        if filepath is None:
             return jsonify({'error': 'Dosya bulunamadı'}), 404
         
-        return send_file(filepath, as_attachment=True)
+        etag = file_content_hash(filepath)
+        
+        if request.args.get('compress') == 'gzip' and not filename.endswith(('.gz', '.zip', '.xlsx')):
+            gzip_etag = f"{etag}-gzip"
+            if request.if_none_match.contains_weak(gzip_etag):
+                response = Response(status=304)
+                response.set_etag(gzip_etag, weak=True)
+                return response
+            
+            response = Response(stream_with_context(iter_gzip(filepath)), mimetype='application/gzip')
+            response.headers['Content-Disposition'] = f'attachment; filename="{secure_filename(filename)}.gz"'
+            response.set_etag(gzip_etag, weak=True)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        
+        response = send_file(
+            filepath,
+            as_attachment=True,
+            download_name=filename,
+            etag=etag,
+            conditional=True
+        )
+        response.cache_control.private = True
+        return response
     
+    except HTTPException:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@main_bp.route('/api/campaign/<campaign_id>/download-all')
+@login_required
+def download_bundle(campaign_id):
+    """Tüm kampanya çıktılarını geçici dosya oluşturmadan zip olarak stream et"""
+    from app.services.export_service import iter_zip_bundle, bundle_members, bundle_etag
+    
+    try:
+        campaign = campaign_store.get(campaign_id) if CAMPAIGN_ID_PATTERN.match(campaign_id) else None
+        if not campaign:
+            return jsonify({'error': 'Kampanya bulunamadı'}), 404
+        
+        output_dir = _campaign_output_dir(campaign_id)
+        members = bundle_members(output_dir)
+        
+        if not members:
+            return jsonify({'error': 'Dosya bulunamadı'}), 404
+        
+        etag = bundle_etag(members)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+        
+        bundle_name = secure_filename(campaign.name.replace(' ', '_')) or campaign_id
+        response = Response(stream_with_context(iter_zip_bundle(members)), mimetype='application/zip')
+        response.headers['Content-Disposition'] = f'attachment; filename="{bundle_name}_{campaign_id}.zip"'
+        response.set_etag(etag, weak=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _page_args(default_limit):
+    """offset/limit query parametreleri (limit en fazla MAX_PAGE_LIMIT)"""
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = request.args.get('limit', default_limit, type=int)
+    limit = min(max(1, limit), MAX_PAGE_LIMIT)
+    return offset, limit
+
+
+def _page_response(df, index, offset, limit):
+    import pandas as pd
+    # NaN değerlerini None'a çevir (JSON için)
+    df = df.astype(object).where(pd.notna(df), None)
+    
+    return {
+        'columns': index['columns'],
+        'data': df.to_dict('records'),
+        'total_rows': index['row_count'],
+        'showing': len(df),
+        'offset': offset,
+        'limit': limit
+    }
+
+
 @main_bp.route('/api/campaign/<campaign_id>/preview/<filename>')
 @login_required
 def preview_file(campaign_id, filename):
-    """Dosya önizleme (ilk 50 satır)"""
+    """
+    Dosya önizleme (sayfalı)
+    
+    Query:
+    - offset, limit: Sayfa (varsayılan ilk 50 satır)
+    - kategori: Sadece bu kategorinin satırları (analiz CSV'si için)
+    """
+    from app.services.export_service import get_export_path, export_name
+    from app.services.index_service import read_csv_page
     
     try:
-        output_dir = os.path.join(current_app.config['OUTPUT_FOLDER'], 'final', campaign_id)
-        filepath = os.path.join(output_dir, filename)
-        
-        if not os.path.exists(filepath):
+        output_dir = _campaign_output_dir(campaign_id)
+        if output_dir is None:
             return jsonify({'error': 'Dosya bulunamadı'}), 404
         
         # Sadece CSV dosyaları için önizleme
         if not filename.endswith('.csv'):
             return jsonify({'error': 'Sadece CSV dosyaları önizlenebilir'}), 400
         
-        # CSV'yi oku (ilk 50 satır)
-        df = pd.read_csv(filepath, nrows=50)
+        kategori = request.args.get('kategori')
+        if kategori:
+            # Kategori filtresi: kategori CSV'si (kendi indeksiyle) sayfalanır
+            if filename != export_name(output_dir, 'csv'):
+                return jsonify({'error': 'Kategori filtresi sadece analiz CSV dosyası için desteklenir'}), 400
+            filename = export_name(output_dir, 'category_csv', kategori)
+            if filename is None:
+                return jsonify({'error': 'Kategori bulunamadı'}), 404
+        
+        filepath = get_export_path(output_dir, filename)
         
-        # NaN değerlerini None'a çevir (JSON için)
-        df = df.where(pd.notna(df), None)
+        if filepath is None:
+            return jsonify({'error': 'Dosya bulunamadı'}), 404
         
-        # Toplam satır sayısı
-        total_rows = len(pd.read_csv(filepath))
+        # İndeks üzerinden sadece istenen sayfayı oku
+        offset, limit = _page_args(50)
+        df, index = read_csv_page(filepath, offset, limit)
         
-        return jsonify({
-            'columns': df.columns.tolist(),
-            'data': df.to_dict('records'),
-            'total_rows': total_rows,
-            'showing': len(df),
-            'filename': filename
-        })
+        response = _page_response(df, index, offset, limit)
+        response['filename'] = filename
+        return jsonify(response)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -401,10 +792,17 @@ def get_step_data(campaign_id, step):
     Belirli bir adımın verilerini getir (kullanıcı müdahale için)
     
     Steps: utm_collection, utm_details, reklam_detay, final_analysis
+    
+    Query:
+    - offset, limit: Sayfa (varsayılan ilk 100 satır)
     """
+    from app.services.export_service import get_export_path, export_name
+    from app.services.index_service import read_csv_page
     
     try:
-        output_dir = os.path.join(current_app.config['OUTPUT_FOLDER'], 'final', campaign_id)
+        output_dir = _campaign_output_dir(campaign_id)
+        if output_dir is None:
+            return jsonify({'error': 'Dosya bulunamadı'}), 404
         
         # Step'e göre dosyayı bul
         step_files = {
@@ -414,33 +812,218 @@ def get_step_data(campaign_id, step):
         if step not in step_files:
             return jsonify({'error': 'Geçersiz step'}), 400
         
-        # En son dosyayı bul
-        pattern = step_files[step]
-        files = [f for f in os.listdir(output_dir) if pattern in f and f.endswith('.csv')]
+        # Analiz CSV'si (düzenlemeler uygulanmış); eski kampanyalarda son CSV dosyası
+        filename = export_name(output_dir, 'csv')
+        if filename:
+            filepath = get_export_path(output_dir, filename)
+        else:
+            pattern = step_files[step]
+            files = []
+            if os.path.exists(output_dir):
+                files = [f for f in os.listdir(output_dir) if pattern in f and f.endswith('.csv')]
+            files.sort(reverse=True)
+            filepath = os.path.join(output_dir, files[0]) if files else None
         
-        if not files:
+        if filepath is None:
             return jsonify({'error': 'Dosya bulunamadı'}), 404
         
-        files.sort(reverse=True)
-        latest_file = files[0]
+        offset, limit = _page_args(100)
+        df, index = read_csv_page(filepath, offset, limit)
         
-        # DataFrame'i oku ve JSON'a çevir
-        filepath = os.path.join(output_dir, latest_file)
-        df = pd.read_csv(filepath)
+        return jsonify(_page_response(df, index, offset, limit))
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/api/campaign/<campaign_id>/attribution')
+@login_required
+def campaign_attribution(campaign_id):
+    """
+    Çoklu temas atfı (kaydedilmiş temas kredilerinden, veritabanına gitmeden)
+    
+    Query:
+    - model: first_touch | last_touch | linear | time_decay (varsayılan linear)
+    - group_by: Virgülle ayrılmış kırılım (varsayılan utm_campaign,adset_name)
+    - half_life: Time-decay yarı ömrü (gün); verilirse yeniden hesaplanır
+    - email: Sadece bu email'in temasları ve kredileri
+    - limit: Satır sayısı (varsayılan 50)
+    """
+    import pandas as pd
+    from app.services.attribution_service import (
+        MODELS as ATTRIBUTION_MODELS, GROUP_COLUMNS as ATTRIBUTION_GROUP_COLUMNS,
+        load_attribution, summarize_attribution
+    )
+    
+    try:
+        output_dir = _campaign_output_dir(campaign_id)
+        touches = load_attribution(output_dir) if output_dir else None
+        if touches is None:
+            return jsonify({'error': 'Atıf verisi bulunamadı'}), 404
         
-        # NaN değerlerini None'a çevir (JSON için)
-        df = df.where(pd.notna(df), None)
+        model = request.args.get('model', 'linear')
+        if model not in ATTRIBUTION_MODELS:
+            return jsonify({'error': f"Geçersiz model: {model}", 'models': ATTRIBUTION_MODELS}), 400
         
-        # İlk 100 kayıt (performans için)
-        data = df.head(100).to_dict('records')
+        group_by = [c.strip() for c in request.args.get('group_by', 'utm_campaign,adset_name').split(',') if c.strip()]
+        unknown = [c for c in group_by if c not in ATTRIBUTION_GROUP_COLUMNS or c not in touches.columns]
+        if not group_by or unknown:
+            return jsonify({'error': f"Geçersiz kırılım: {', '.join(unknown)}"}), 400
         
-        return jsonify({
-            'columns': df.columns.tolist(),
-            'data': data,
-            'total_rows': len(df),
-            'showing': len(data)
-        })
+        half_life = request.args.get('half_life', type=float)
+        if half_life is not None and half_life <= 0:
+            return jsonify({'error': 'half_life pozitif olmalı'}), 400
+        
+        email = request.args.get('email')
+        if email:
+            rows = touches[touches['email'] == email].copy()
+            rows['created_at'] = rows['created_at'].dt.strftime('%Y-%m-%d %H:%M:%S')
+            rows = rows.astype(object).where(pd.notna(rows), None)
+            return jsonify({'email': email, 'data': rows.to_dict('records')})
+        
+        limit = min(max(1, request.args.get('limit', 50, type=int)), MAX_PAGE_LIMIT)
+        result = summarize_attribution(touches, model=model, group_by=group_by,
+                                       half_life_days=half_life, limit=limit)
+        result['group_by'] = group_by
+        result['models'] = ATTRIBUTION_MODELS
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/api/campaign/<campaign_id>/lag')
+@login_required
+def campaign_lag(campaign_id):
+    """
+    Satın alma → son form kaydı gecikme dağılımları (saat)
+    
+    Query:
+    - group_by: Virgülle ayrılmış kırılım (varsayılan utm_source)
+    - limit: Satır sayısı (varsayılan 50)
+    """
+    from app.services.lag_service import LAG_GROUP_COLUMNS, summarize_lag, load_lag
+    
+    try:
+        output_dir = _campaign_output_dir(campaign_id)
+        matched = load_lag(output_dir) if output_dir else None
+        if matched is None:
+            return jsonify({'error': 'Gecikme verisi bulunamadı (müşteri dosyasında satın alma tarihi yok)'}), 404
+        
+        group_by = [c.strip() for c in request.args.get('group_by', 'utm_source').split(',') if c.strip()]
+        unknown = [c for c in group_by if c not in LAG_GROUP_COLUMNS or c not in matched.columns]
+        if not group_by or unknown:
+            return jsonify({'error': f"Geçersiz kırılım: {', '.join(unknown)}"}), 400
+        
+        limit = min(max(1, request.args.get('limit', 50, type=int)), MAX_PAGE_LIMIT)
+        result = summarize_lag(matched, group_by=group_by, limit=limit)
+        result['group_by'] = group_by
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/api/campaign/<campaign_id>/query-profile')
+@login_required
+def download_query_profile(campaign_id):
+    """Sorgu profili raporunu indir (analiz DB_PROFILE=1 ile çalıştıysa)"""
+    
+    try:
+        output_dir = _campaign_output_dir(campaign_id)
+        filepath = os.path.join(output_dir, QUERY_PROFILE_FILENAME) if output_dir else None
+        if not filepath or not os.path.exists(filepath):
+            return jsonify({'error': 'Sorgu profili bulunamadı (DB_PROFILE=1 ile analiz edin)'}), 404
+        
+        response = send_file(
+            filepath,
+            mimetype='application/json',
+            as_attachment=True,
+            download_name=f'{campaign_id}_{QUERY_PROFILE_FILENAME}'
+        )
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/api/profiles')
+@login_required
+def list_request_profiles():
+    """
+    Kayıtlı istek profilleri (REQUEST_PROFILING=1 iken X-Profile: 1 ile alınır)
+    Query params: limit (varsayılan 50), top (profil başına fonksiyon, varsayılan 10)
+    """
+    
+    try:
+        limit = min(max(1, request.args.get('limit', 50, type=int)), MAX_PAGE_LIMIT)
+        top = min(max(1, request.args.get('top', 10, type=int)), 100)
+        profiles = list_profiles(current_app.config['PROFILE_FOLDER'], limit=limit, top=top)
+        return jsonify({'profiles': profiles, 'count': len(profiles)})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/api/profiles/<profile_id>')
+@login_required
+def download_request_profile(profile_id):
+    """Profilin pstats dosyasını indir (snakeviz / pstats ile açılır)"""
+    
+    filepath = profile_path(current_app.config['PROFILE_FOLDER'], profile_id)
+    if not filepath:
+        return jsonify({'error': 'Profil bulunamadı'}), 404
+    return send_file(filepath, mimetype='application/octet-stream',
+                     as_attachment=True, download_name=f'{profile_id}.prof')
+
+
+@main_bp.route('/api/campaign/<campaign_id>/query')
+@login_required
+def query_campaign_data(campaign_id):
+    """
+    Analiz sonucunu sorgula (düzenleme tablosu için)
     
+    Query:
+    - kategori, durum, utm_source: Filtre (birden fazla değer verilebilir)
+    - q: Email içinde arama
+    - sort: Sıralama sütunu, order: asc | desc
+    - columns: Virgülle ayrılmış sütun listesi
+    - limit: Sayfa boyutu (varsayılan 100)
+    - cursor: Önceki cevaptaki next_cursor
+    """
+    from app.services.query_service import query_result, QueryError, FILTER_COLUMNS
+    from app.services.edit_service import current_version
+    
+    try:
+        output_dir = _campaign_output_dir(campaign_id)
+        if output_dir is None:
+            return jsonify({'error': 'Dosya bulunamadı'}), 404
+        
+        filters = {col: request.args.getlist(col) for col in FILTER_COLUMNS if request.args.getlist(col)}
+        columns = [c for c in request.args.get('columns', '').split(',') if c] or None
+        limit = min(max(1, request.args.get('limit', 100, type=int)), MAX_PAGE_LIMIT)
+        
+        result = query_result(
+            output_dir,
+            filters=filters,
+            search=request.args.get('q') or None,
+            sort=request.args.get('sort') or None,
+            descending=request.args.get('order', 'asc') == 'desc',
+            columns=columns,
+            limit=limit,
+            cursor=request.args.get('cursor') or None
+        )
+        
+        if result is None:
+            return jsonify({'error': 'Dosya bulunamadı'}), 404
+        
+        result['version'] = current_version(output_dir)
+        return jsonify(result)
+    
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -450,34 +1033,212 @@ def get_step_data(campaign_id, step):
 def update_campaign_data(campaign_id):
     """
     Kampanya verilerini güncelle (kullanıcı müdahalesi)
+    
+    Body:
+    - patches: [{row_id, column, value}] (sadece değişen hücreler)
+    - base_version: Tablonun yüklendiği versiyon (çakışma kontrolü için)
     """
+    from app.services.export_service import find_result_file
+    from app.services.edit_service import append_patches, EditConflictError
     
     try:
-        data = request.get_json()
-        updated_data = data.get('data', [])
-        modified_count = data.get('modified_count', 0)
+        output_dir = _campaign_output_dir(campaign_id)
+        if output_dir is None:
+            return jsonify({'error': 'Kampanya bulunamadı'}), 404
         
-        if not updated_data:
-            return jsonify({'error': 'Veri bulunamadı'}), 400
+        data = request.get_json() or {}
+        patches = data.get('patches', [])
         
-        # DataFrame'e çevir ve kaydet
-        df = pd.DataFrame(updated_data)
+        if not patches:
+            return jsonify({'error': 'Değişiklik bulunamadı'}), 400
         
-        # Yeni dosya olarak kaydet (orijinali korumak için)
-        output_dir = os.path.join(current_app.config['OUTPUT_FOLDER'], 'final', campaign_id)
-        os.makedirs(output_dir, exist_ok=True)
+        if find_result_file(output_dir) is None:
+            return jsonify({'error': 'Analiz sonucu bulunamadı'}), 404
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"EDITED_TUM_KATEGORILER_{timestamp}.csv"
-        filepath = os.path.join(output_dir, filename)
+        # Yamalar append-only log'a yazılır; veri okunurken uygulanır
+        entry = append_patches(
+            output_dir,
+            patches,
+            user=current_user.get_id(),
+            base_version=data.get('base_version')
+        )
         
-        df.to_csv(filepath, index=False, encoding='utf-8-sig')
+        write_summary(output_dir)
+        
+        campaign = campaign_store.get(campaign_id)
+        if campaign is not None:
+            try:
+                refresh_campaign_rollup(rollup_store, campaign, output_dir)
+            except Exception as e:
+                print(f"⚠️  Rollup güncellenemedi: {e}")
         
         return jsonify({
             'success': True,
-            'message': f'{modified_count} değişiklik kaydedildi',
-            'filename': filename
+            'message': f"{len(entry['patches'])} değişiklik kaydedildi",
+            'version': entry['version']
         })
     
+    except EditConflictError as e:
+        return jsonify({'error': str(e), 'conflicts': e.conflicts}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/api/campaign/<campaign_id>/versions')
+@login_required
+def list_campaign_versions(campaign_id):
+    """Düzenleme versiyonlarını listele (0 = orijinal analiz)"""
+    from app.services.edit_service import list_versions
+    
+    try:
+        output_dir = _campaign_output_dir(campaign_id)
+        versions = list_versions(output_dir) if output_dir else None
+        
+        if versions is None:
+            return jsonify({'error': 'Analiz sonucu bulunamadı'}), 404
+        
+        return jsonify({'versions': versions, 'current': versions[-1]['version']})
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/api/campaign/<campaign_id>/versions/diff')
+@login_required
+def diff_campaign_versions(campaign_id):
+    """
+    İki versiyon arasındaki hücre farkları
+    
+    Query:
+    - from: Başlangıç versiyonu (varsayılan 0)
+    - to: Bitiş versiyonu (varsayılan en güncel)
+    """
+    from app.services.export_service import find_result_file
+    from app.services.edit_service import diff_versions, current_version
+    
+    try:
+        output_dir = _campaign_output_dir(campaign_id)
+        if output_dir is None or find_result_file(output_dir) is None:
+            return jsonify({'error': 'Analiz sonucu bulunamadı'}), 404
+        
+        latest = current_version(output_dir)
+        from_version = request.args.get('from', 0, type=int)
+        to_version = request.args.get('to', latest, type=int)
+        
+        if not (0 <= from_version <= latest and 0 <= to_version <= latest):
+            return jsonify({'error': 'Geçersiz versiyon'}), 400
+        
+        changes = diff_versions(output_dir, from_version, to_version)
+        
+        return jsonify({
+            'from': from_version,
+            'to': to_version,
+            'changes': changes,
+            'count': len(changes)
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/api/dashboard/rollup')
+@login_required
+def dashboard_rollup():
+    """
+    Son N kampanyada alıcıları getiren kırılımlar (rollup tablosundan)
+    
+    Query:
+    - last: Dahil edilecek en yeni kampanya sayısı (varsayılan 10)
+    - group_by: Virgülle ayrılmış boyutlar (varsayılan adset_name)
+    - kategori, utm_source: Filtre (birden fazla değer verilebilir)
+    - limit: Satır sayısı (varsayılan 20)
+    """
+    
+    try:
+        group_by = [c.strip() for c in request.args.get('group_by', 'adset_name').split(',') if c.strip()]
+        unknown = [c for c in group_by if c not in DIMENSIONS]
+        if not group_by or unknown:
+            return jsonify({'error': f"Geçersiz kırılım: {', '.join(unknown)}", 'dimensions': DIMENSIONS}), 400
+        
+        last = min(max(1, request.args.get('last', 10, type=int)), 1000)
+        limit = min(max(1, request.args.get('limit', 20, type=int)), MAX_PAGE_LIMIT)
+        
+        result = rollup_store.top(
+            group_by=group_by,
+            last=last,
+            kategori=request.args.getlist('kategori'),
+            utm_source=request.args.getlist('utm_source'),
+            limit=limit
+        )
+        result['group_by'] = group_by
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/api/dashboard/rollup/backfill', methods=['POST'])
+@login_required
+def dashboard_rollup_backfill():
+    """
+    Rollup'ları mevcut kampanya çıktılarından doldur
+    
+    Body (opsiyonel): {"force": true} → güncel olanları da yeniden üret
+    """
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        summary = backfill_rollups(
+            rollup_store,
+            campaign_store,
+            current_app.config['OUTPUT_FOLDER'],
+            force=bool(data.get('force'))
+        )
+        return jsonify({'success': True, **summary})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@main_bp.route('/metrics')
+def metrics():
+    """
+    Prometheus metrikleri (süreç bazında; her gunicorn worker'ı kendi değerlerini döner).
+    Oturum açmış kullanıcıya veya METRICS_TOKEN ayarlıysa
+    "Authorization: Bearer <token>" ile gelen isteğe açıktır; token yoksa
+    scraper'lar erişemez (varsayılan kapalı).
+    """
+    token = os.environ.get('METRICS_TOKEN')
+    authorized = current_user.is_authenticated or bool(
+        token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    )
+    if not authorized:
+        return Response('unauthorized\n', status=401, mimetype='text/plain')
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@main_bp.route('/healthz')
+def healthz():
+    """Canlılık: süreç istek cevaplayabiliyor (G/Ç yapılmaz)"""
+    response = jsonify({'status': 'ok'})
+    response.cache_control.no_store = True
+    return response
+
+
+@main_bp.route('/readyz')
+def readyz():
+    """
+    Hazırlık: veri dizinleri, kampanya deposu / iş kuyruğu ve veri kaynağı
+    (önbellekli yoklama, bkz. app/utils/health.py). Hazır değilse 503.
+    """
+    report, ready = readiness({
+        'uploads': current_app.config['UPLOAD_FOLDER'],
+        'output': current_app.config['OUTPUT_FOLDER'],
+        'campaigns': campaign_store.store_path
+    }, campaign_store)
+    response = jsonify(report)
+    response.status_code = 200 if ready else 503
+    response.cache_control.no_store = True
+    return response
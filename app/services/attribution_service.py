@@ -0,0 +1,274 @@
+"""
+Çoklu Temas (Multi-touch) Atıf Servisi
+1. adımda toplanan tüm form kayıtları (df_all_records) üzerinde, email + tarih
+sıralı tek bir vektörel geçişle first-touch, last-touch, linear ve time-decay
+kredileri hesaplanır. Temas bazlı krediler kampanya çıktısının yanına
+(attribution/touches.parquet) yazılır; model değiştirmek veritabanına gitmez.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from app.utils.metrics import record_cache
+
+ATTRIBUTION_DIRNAME = 'attribution'
+TOUCHES_FILENAME = 'touches.parquet'
+MODELS = ['first_touch', 'last_touch', 'linear', 'time_decay']
+DEFAULT_HALF_LIFE_DAYS = 7.0
+UTM_FIELDS = ['utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term']
+GROUP_COLUMNS = ['utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term', 'adset_name']
+MAX_CACHED_TOUCHES = 4
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def valid_touch_mask(df):
+    """
+    Atfa giren kayıtlar: UTM VAR ve hiçbir UTM alanında {{}} placeholder yok
+    (2. adımdaki geçerli kayıt kuralının vektörel hali). UTM alanları düşük
+    kardinaliteli olduğundan placeholder kontrolü sadece tekil değerlerde yapılır.
+    """
+    mask = (df['durum'] == 'UTM VAR').to_numpy()
+    for field in UTM_FIELDS:
+        if field in df.columns:
+            codes, uniques = pd.factorize(df[field])
+            has_placeholder = np.array([('{{' in str(u) or '}}' in str(u)) for u in uniques] + [False])
+            mask &= ~has_placeholder[codes]
+    return mask
+
+
+def _group_layout(codes):
+    """Gruplara göre sıralı kod dizisinde grup başlangıçları ve boyutları"""
+    sizes = np.bincount(codes)
+    sizes = sizes[sizes > 0]
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    group = np.repeat(np.arange(len(sizes)), sizes)
+    return group, starts, sizes
+
+
+def _sorted_group_codes(emails):
+    """Email'e göre gruplanmış (ardışık) dizi için 0..k-1 grup kodları"""
+    emails = np.asarray(emails, dtype=object)
+    if len(emails) == 0:
+        return np.empty(0, dtype=np.int64)
+    changed = np.empty(len(emails), dtype=bool)
+    changed[0] = False
+    changed[1:] = emails[1:] != emails[:-1]
+    return np.cumsum(changed)
+
+
+def _email_codes(touches):
+    """Temas tablosunda email grup kodları (touch_index varsa ondan, karşılaştırmasız)"""
+    if 'touch_index' in touches.columns:
+        return np.cumsum(touches['touch_index'].to_numpy() == 1) - 1
+    return _sorted_group_codes(touches['email'].to_numpy())
+
+
+def _group_codes(touches, group_by):
+    """
+    Kırılım sütunlarının birleşik grup kodları. Kategorik kodlar tek bir int64
+    anahtarda birleştirilip factorize edilir; anahtar taşacaksa groupby'a düşülür.
+    """
+    key = np.zeros(len(touches), dtype=np.int64)
+    capacity = 1
+    for col in group_by:
+        values = touches[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, cardinality = values.cat.codes.to_numpy(), len(values.cat.categories)
+        else:
+            codes, uniques = pd.factorize(values)
+            cardinality = len(uniques)
+        capacity *= cardinality + 1
+        if capacity >= np.iinfo(np.int64).max:
+            return touches.groupby(group_by, dropna=False, sort=False, observed=True).ngroup().to_numpy()
+        key = key * (cardinality + 1) + (codes.astype(np.int64) + 1)
+    codes, _ = pd.factorize(key)
+    return codes
+
+
+def time_decay_credit(email_codes, created_at, half_life_days=DEFAULT_HALF_LIFE_DAYS):
+    """
+    Time-decay kredisi: son temasa göre yaşı half_life_days olan temas yarı ağırlık alır.
+    Dizi email + tarih sıralı olmalıdır. Tarihi olmayan temaslar ağırlık almaz;
+    bir email'in hiç tarihli teması yoksa kredi eşit dağıtılır.
+    """
+    if len(email_codes) == 0:
+        return np.empty(0)
+
+    codes, starts, sizes = _group_layout(email_codes)
+    times = pd.to_datetime(pd.Series(created_at).reset_index(drop=True), errors='coerce')
+    has_time = times.notna().to_numpy()
+    seconds = np.where(has_time, times.to_numpy(dtype='datetime64[ns]').astype('int64') / 1e9, -np.inf)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        age = np.maximum.reduceat(seconds, starts)[codes] - seconds
+        weight = np.where(has_time, np.exp2(-age / (half_life_days * 86400.0)), 0.0)
+        totals = np.bincount(codes, weights=weight)
+        credit = weight / totals[codes]
+    linear = 1.0 / sizes[codes]
+    return np.where(totals[codes] > 0, credit, linear)
+
+
+def compute_attribution(df_all_records, adset_names=None, half_life_days=DEFAULT_HALF_LIFE_DAYS):
+    """
+    Temas bazlı atıf kredilerini hesapla
+
+    Args:
+        df_all_records: collect_utm_data çıktısı (email başına birden fazla kayıt)
+        adset_names: utm_term (adset_id) → adset_name eşlemesi (opsiyonel, 3. adımdan)
+        half_life_days: Time-decay yarı ömrü (gün)
+
+    Returns:
+        DataFrame: Her geçerli temas için email, created_at, UTM alanları,
+            touch_index, touch_count ve MODELS kredileri (email başına toplam 1)
+    """
+    columns = ['email', 'created_at'] + [f for f in UTM_FIELDS if f in df_all_records.columns]
+    touches = df_all_records.loc[valid_touch_mask(df_all_records), columns]
+    created_at = pd.to_datetime(touches['created_at'], errors='coerce')
+
+    # Tek sıralama: email grubu, sonra tarih (boş tarihler sonda, eşitlikte orijinal sıra)
+    email_codes, _ = pd.factorize(touches['email'])
+    created_ns = created_at.to_numpy(dtype='datetime64[ns]').astype('int64')
+    created_ns = np.where(created_at.isna().to_numpy(), np.iinfo(np.int64).max, created_ns)
+    order = np.lexsort((created_ns, email_codes))
+
+    touches = touches.iloc[order].reset_index(drop=True)
+    touches['created_at'] = created_at.iloc[order].to_numpy()
+
+    codes, starts, sizes = _group_layout(email_codes[order])
+    position = np.arange(len(touches)) - starts[codes]
+    count = sizes[codes]
+
+    touches['touch_index'] = position + 1
+    touches['touch_count'] = count
+    touches['first_touch'] = (position == 0).astype(float)
+    touches['last_touch'] = (position == count - 1).astype(float)
+    touches['linear'] = 1.0 / count
+    touches['time_decay'] = time_decay_credit(codes, touches['created_at'], half_life_days)
+
+    if 'utm_term' in touches.columns:
+        touches['utm_term'] = touches['utm_term'].astype(str).where(touches['utm_term'].notna(), None)
+    return apply_adset_names(touches, adset_names)
+
+
+def apply_adset_names(frame, adset_names):
+    """
+    utm_term (adset_id) üzerinden adset_name sütununu doldur. Eşleme 3. adımdan
+    sonra geldiğinde (pipeline'da atıf 3. adımla eşzamanlı hesaplanır) sonradan uygulanır.
+    """
+    if 'utm_term' in frame.columns:
+        frame['adset_name'] = frame['utm_term'].map(adset_names) if adset_names is not None else None
+    return frame
+
+
+def adset_name_map(df_reklam_detay):
+    """3. adım çıktısından adset_id → adset_name eşlemesi"""
+    id_column = 'utm_term(adset_id)'
+    if id_column not in df_reklam_detay.columns or 'adset_name' not in df_reklam_detay.columns:
+        return None
+    pairs = df_reklam_detay[[id_column, 'adset_name']].dropna()
+    pairs = pairs.drop_duplicates(id_column)
+    return pd.Series(pairs['adset_name'].to_numpy(), index=pairs[id_column].astype(str).to_numpy())
+
+
+def _touches_path(output_dir):
+    return os.path.join(output_dir, ATTRIBUTION_DIRNAME, TOUCHES_FILENAME)
+
+
+def write_attribution(output_dir, touches):
+    """Temas kredilerini kampanya çıktısının yanına yaz"""
+    from app.services.export_service import _arrow_safe
+
+    path = _touches_path(output_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".tmp{os.getpid()}_{TOUCHES_FILENAME}")
+    _arrow_safe(touches).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_attribution(output_dir):
+    """Temas kredilerini oku (mtime ile doğrulanan cache; yoksa None)"""
+    path = _touches_path(output_dir)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        touches = _cache.get(key)
+        if touches is not None:
+            _cache.move_to_end(key)
+    record_cache('attribution', touches is not None)
+    if touches is not None:
+        return touches
+
+    touches = pd.read_parquet(path)
+    for col in GROUP_COLUMNS:
+        if col in touches.columns:
+            touches[col] = touches[col].astype('category')
+    with _cache_lock:
+        for old_key in [k for k in _cache if k[0] == path]:
+            del _cache[old_key]
+        _cache[key] = touches
+        while len(_cache) > MAX_CACHED_TOUCHES:
+            _cache.popitem(last=False)
+    return touches
+
+
+def summarize_attribution(touches, model='linear', group_by=('utm_campaign', 'adset_name'),
+                          half_life_days=None, limit=None):
+    """
+    Kredileri kırılım bazında topla
+
+    Args:
+        model: MODELS içinden
+        group_by: GROUP_COLUMNS içinden
+        half_life_days: Verilirse time_decay bu yarı ömürle yeniden hesaplanır
+
+    Returns:
+        dict: model, total_credit, rows [{...group_by, credit, touches, emails, share}]
+    """
+    group_by = list(group_by)
+    email_codes = _email_codes(touches)
+    credit = touches[model]
+    if model == 'time_decay' and half_life_days is not None:
+        credit = pd.Series(time_decay_credit(email_codes, touches['created_at'], half_life_days), index=touches.index)
+
+    # Grup kodları üzerinden bincount (temaslar email'e göre ardışık)
+    group_codes = _group_codes(touches, group_by)
+    n_groups = int(group_codes.max()) + 1 if len(group_codes) else 0
+    n_emails = int(email_codes.max()) + 1 if len(email_codes) else 1
+
+    credit_sum = np.bincount(group_codes, weights=credit.to_numpy(), minlength=n_groups)
+    touch_count = np.bincount(group_codes, minlength=n_groups)
+    pairs = np.unique(group_codes.astype(np.int64) * n_emails + email_codes)
+    email_count = np.bincount(pairs // n_emails, minlength=n_groups)
+
+    first_row = np.full(n_groups, len(group_codes), dtype=np.int64)
+    np.minimum.at(first_row, group_codes, np.arange(len(group_codes)))
+    grouped = touches[group_by].iloc[first_row].reset_index(drop=True).astype(object)
+    grouped['credit'] = credit_sum
+    grouped['touches'] = touch_count
+    grouped['emails'] = email_count
+
+    grouped = grouped[grouped['credit'] > 0].sort_values('credit', ascending=False, kind='mergesort')
+    if limit is not None:
+        grouped = grouped.head(limit)
+
+    total = float(credit.sum())
+    grouped['share'] = (grouped['credit'] / total * 100).round(1) if total else 0.0
+    grouped['credit'] = grouped['credit'].round(3)
+    rows = grouped.astype(object).where(pd.notna(grouped), None).to_dict('records')
+
+    return {
+        'model': model,
+        'total_credit': round(total, 3),
+        'rows': rows
+    }
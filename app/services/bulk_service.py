@@ -0,0 +1,223 @@
+"""
+Toplu (Headless) Analiz Servisi
+Bir dizindeki veya manifest'teki alıcı CSV'leri için web arayüzüyle aynı
+pipeline'ı (run_analysis) süreç havuzunda çalıştırır. Kampanyalar aynı
+CampaignStore'a ve çıktı düzenine yazılır; sonuçlar web arayüzünde görünür.
+Veritabanı yükü, süreçler arası ortak bir semaforla (aynı anda açık bağlantı
+sayısı) sınırlandırılır.
+"""
+
+import os
+import csv
+import json
+import time
+import uuid
+import shutil
+import contextlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from werkzeug.utils import secure_filename
+
+from app.models import Campaign, CampaignStore
+from app.services.pipeline_service import run_analysis, campaign_output_dir
+from app.services.rollup_service import RollupStore
+from app.utils.db_connection import set_connection_limiter
+
+MANIFEST_FIELDS = ['file', 'name', 'start_date', 'end_date']
+LOG_DIRNAME = 'logs'
+
+
+def _read_manifest(manifest_path):
+    """Manifest satırları (.csv başlıklı veya .json liste)"""
+    if manifest_path.endswith('.json'):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+        if not isinstance(rows, list):
+            raise ValueError('JSON manifest bir liste olmalı')
+        return rows
+
+    with open(manifest_path, 'r', encoding='utf-8-sig', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def load_jobs(source, start_date=None, end_date=None):
+    """
+    Analiz edilecek dosyaları topla
+
+    Args:
+        source: CSV dizini veya manifest (.csv / .json; sütunlar: file, name,
+            start_date, end_date). Manifest'teki göreli yollar manifest'in
+            dizinine, dizindeki dosyalar dizine göre çözülür.
+        start_date, end_date: Manifest'te tarih yoksa kullanılacak varsayılanlar
+
+    Returns:
+        list: [{'file', 'name', 'start_date', 'end_date'}]
+    """
+    if os.path.isdir(source):
+        rows = [
+            {'file': f, 'name': os.path.splitext(f)[0]}
+            for f in sorted(os.listdir(source)) if f.lower().endswith('.csv')
+        ]
+        base_dir = source
+    else:
+        rows = _read_manifest(source)
+        base_dir = os.path.dirname(os.path.abspath(source))
+
+    jobs = []
+    for i, row in enumerate(rows, 1):
+        file_path = (row.get('file') or '').strip()
+        if not file_path:
+            raise ValueError(f"Manifest satırı {i}: 'file' boş")
+        file_path = os.path.join(base_dir, file_path)
+        if not os.path.isfile(file_path):
+            raise ValueError(f"Dosya bulunamadı: {file_path}")
+
+        job = {
+            'file': os.path.abspath(file_path),
+            'name': (row.get('name') or '').strip() or os.path.splitext(os.path.basename(file_path))[0],
+            'start_date': (row.get('start_date') or '').strip() or start_date,
+            'end_date': (row.get('end_date') or '').strip() or end_date
+        }
+        for key in ('start_date', 'end_date'):
+            if not job[key]:
+                raise ValueError(f"{job['name']}: {key} yok (manifest'te veya --start/--end ile verin)")
+            datetime.strptime(job[key], '%Y-%m-%d')
+        jobs.append(job)
+
+    return jobs
+
+
+def register_campaigns(jobs, upload_folder, campaign_store):
+    """
+    Her dosya için web arayüzündeki gibi bir kampanya oluştur: dosya
+    <id>_<ad>.csv olarak upload klasörüne kopyalanır, kampanya 'processing'
+    durumunda kaydedilir.
+
+    Returns:
+        list: Campaign
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    campaigns = []
+    for job in jobs:
+        campaign_id = str(uuid.uuid4())[:8]
+        safe_filename = f"{campaign_id}_{secure_filename(os.path.basename(job['file']))}"
+        shutil.copyfile(job['file'], os.path.join(upload_folder, safe_filename))
+
+        campaign = Campaign(
+            id=campaign_id,
+            name=job['name'],
+            start_date=job['start_date'],
+            end_date=job['end_date'],
+            customer_file=safe_filename,
+            created_at=datetime.now(),
+            status='processing'
+        )
+        campaign_store.save(campaign)
+        campaigns.append(campaign)
+    return campaigns
+
+
+def _init_worker(limiter):
+    """Havuz süreci başlangıcı: ortak bağlantı semaforunu kur"""
+    set_connection_limiter(limiter)
+
+
+def _run_campaign(campaign_data, upload_folder, output_root, store_path, log_dir):
+    """
+    Tek kampanyayı havuz sürecinde analiz et (pipeline çıktısı log dosyasına)
+
+    Returns:
+        dict: id, success, elapsed, final_stats | error
+    """
+    campaign = Campaign.from_dict(dict(campaign_data))
+    campaign_store = CampaignStore(store_path)
+    started = time.perf_counter()
+    outcome = {'id': campaign.id}
+
+    log_path = os.path.join(log_dir, f"{campaign.id}.log")
+    with open(log_path, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        try:
+            results = run_analysis(
+                campaign,
+                os.path.join(upload_folder, campaign.customer_file),
+                campaign_output_dir(output_root, campaign.id),
+                rollup_store=RollupStore(store_path)
+            )
+            campaign_store.update_status(campaign.id, 'completed')
+            outcome.update(success=True, final_stats=results.get('final_stats'))
+        except Exception as e:
+            print(f"❌ Hata: {e}")
+            campaign_store.update_status(campaign.id, 'error')
+            outcome.update(success=False, error=str(e))
+
+    outcome['elapsed'] = round(time.perf_counter() - started, 1)
+    return outcome
+
+
+def run_bulk(jobs, upload_folder, output_root, store_path='data/campaigns',
+             workers=4, db_concurrency=2):
+    """
+    Dosyaları kampanya olarak kaydedip süreç havuzunda analiz et
+
+    Args:
+        jobs: load_jobs çıktısı
+        workers: Paralel süreç sayısı
+        db_concurrency: Tüm süreçlerde aynı anda açık veritabanı bağlantısı üst sınırı
+
+    Returns:
+        dict: {'completed', 'failed', 'elapsed', 'campaigns': [outcome, ...]}
+    """
+    campaign_store = CampaignStore(store_path)
+    campaigns = register_campaigns(jobs, upload_folder, campaign_store)
+    names = {c.id: c.name for c in campaigns}
+    log_dir = os.path.join(output_root, LOG_DIRNAME)
+    os.makedirs(log_dir, exist_ok=True)
+
+    print("\n" + "="*80)
+    print(f"📦 TOPLU ANALİZ: {len(campaigns)} kampanya")
+    print(f"⚙️  Süreç: {workers} | DB bağlantı sınırı: {db_concurrency}")
+    print(f"📝 Loglar: {log_dir}")
+    print("="*80)
+
+    started = time.perf_counter()
+    outcomes = []
+    limiter = multiprocessing.BoundedSemaphore(max(1, db_concurrency))
+
+    with ProcessPoolExecutor(max_workers=max(1, workers), initializer=_init_worker,
+                             initargs=(limiter,)) as pool:
+        futures = {
+            pool.submit(_run_campaign, c.to_dict(), upload_folder, output_root, store_path, log_dir): c
+            for c in campaigns
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            campaign = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                # Süreç çöktü (örn. bellek); kampanya işlemede kalmasın
+                campaign_store.update_status(campaign.id, 'error')
+                outcome = {'id': campaign.id, 'success': False, 'error': str(e), 'elapsed': None}
+            outcomes.append(outcome)
+
+            if outcome['success']:
+                stats = outcome.get('final_stats') or {}
+                detail = f"{stats.get('total_emails', 0)} email, eşleşme %{stats.get('match_rate', 0)}"
+                print(f"[{i}/{len(campaigns)}] ✅ {names[campaign.id]} ({campaign.id}) "
+                      f"{outcome['elapsed']} sn - {detail}")
+            else:
+                print(f"[{i}/{len(campaigns)}] ❌ {names[campaign.id]} ({campaign.id}): {outcome['error']}")
+
+    completed = sum(o['success'] for o in outcomes)
+    elapsed = round(time.perf_counter() - started, 1)
+    print("\n" + "="*80)
+    print(f"✅ {completed} başarılı, ❌ {len(outcomes) - completed} hatalı | Toplam süre: {elapsed} sn")
+    print("="*80 + "\n")
+
+    return {
+        'completed': completed,
+        'failed': len(outcomes) - completed,
+        'elapsed': elapsed,
+        'campaigns': outcomes
+    }
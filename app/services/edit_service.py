@@ -0,0 +1,430 @@
+"""
+Düzenleme (Delta) Servisi
+Kullanıcı düzenlemeleri, kanonik analiz sonucuna karşı sadece değişen
+hücreleri içeren yamalar olarak append-only bir log'a (edits.jsonl) yazılır.
+Güncel veri okunurken base + yamalar uygulanarak üretilir; log belirli
+aralıklarla checkpoint (Parquet) dosyalarına sıkıştırılır.
+"""
+
+import os
+import json
+import shutil
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: sadece süreç içi kilit
+    fcntl = None
+
+EDIT_LOG_FILENAME = 'edits.jsonl'
+CHECKPOINT_DIRNAME = 'checkpoints'
+ARCHIVE_DIRNAME = 'edits_archive'
+COMPACT_EVERY = 20
+KEEP_CHECKPOINTS = 3
+
+_log_lock = threading.Lock()
+
+
+class EditConflictError(Exception):
+    """Düzenlenen hücre, istemcinin gördüğü versiyondan sonra değişmiş"""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(f"{len(conflicts)} hücre başka bir düzenlemede değiştirilmiş")
+
+
+def _log_path(output_dir):
+    return os.path.join(output_dir, EDIT_LOG_FILENAME)
+
+
+def _checkpoint_dir(output_dir):
+    return os.path.join(output_dir, CHECKPOINT_DIRNAME)
+
+
+@contextmanager
+def _locked_log(output_dir):
+    """
+    Log dosyasını açıp kilitle. Kilit beklenirken log arşivlendiyse
+    (bkz. replace_result) yerine açılan yeni log kilitlenir.
+    """
+    log_path = _log_path(output_dir)
+    with _log_lock:
+        while True:
+            log_file = open(log_path, 'a+', encoding='utf-8')
+            if fcntl is not None:
+                fcntl.flock(log_file, fcntl.LOCK_EX)
+            try:
+                current = os.path.samestat(os.fstat(log_file.fileno()), os.stat(log_path))
+            except FileNotFoundError:
+                current = False
+            if current:
+                break
+            log_file.close()
+        try:
+            yield log_file
+        finally:
+            if fcntl is not None:
+                fcntl.flock(log_file, fcntl.LOCK_UN)
+            log_file.close()
+
+
+def replace_result(output_dir, tmp_path, result_path):
+    """
+    Yeni kanonik sonucu yayınla (tmp_path → result_path)
+
+    Yamalar satır numarasıyla önceki sonuca bağlıdır; yeni sonuca
+    uygulanmamaları için log ve checkpoint'ler aynı kilit altında
+    edits_archive/<önceki sonuç>/ dizinine taşınır.
+    """
+    from app.services.export_service import find_result_file, CANONICAL_EXT
+
+    previous = find_result_file(output_dir)
+    with _locked_log(output_dir) as log_file:
+        checkpoint_dir = _checkpoint_dir(output_dir)
+        has_edits = os.fstat(log_file.fileno()).st_size > 0
+        if has_edits or os.path.isdir(checkpoint_dir):
+            label = (os.path.basename(previous)[:-len(CANONICAL_EXT)] if previous
+                     else datetime.now().strftime('%Y%m%d_%H%M%S'))
+            archive_dir = os.path.join(output_dir, ARCHIVE_DIRNAME, label)
+            os.makedirs(archive_dir, exist_ok=True)
+            if has_edits:
+                os.replace(_log_path(output_dir), os.path.join(archive_dir, EDIT_LOG_FILENAME))
+            if os.path.isdir(checkpoint_dir):
+                shutil.move(checkpoint_dir, os.path.join(archive_dir, CHECKPOINT_DIRNAME))
+            print(f"🗄️  Önceki düzenlemeler arşivlendi: {ARCHIVE_DIRNAME}/{label}")
+        else:
+            os.remove(_log_path(output_dir))  # _locked_log'un açtığı boş log
+        os.replace(tmp_path, result_path)
+
+
+def read_edit_log(output_dir):
+    """Düzenleme log'undaki tüm versiyonları oku (eskiden yeniye)"""
+    path = _log_path(output_dir)
+    if not os.path.exists(path):
+        return []
+
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+
+def edit_log_signature(output_dir):
+    """Log'un ucuz imzası (boyut + mtime); log yoksa '0'"""
+    path = _log_path(output_dir)
+    if not os.path.exists(path):
+        return '0'
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def current_version(output_dir):
+    """Son düzenleme versiyonu (düzenleme yoksa 0 = orijinal analiz)"""
+    entries = read_edit_log(output_dir)
+    return entries[-1]['version'] if entries else 0
+
+
+def _list_checkpoints(output_dir):
+    """[(version, path)] — versiyona göre artan"""
+    checkpoint_dir = _checkpoint_dir(output_dir)
+    if not os.path.isdir(checkpoint_dir):
+        return []
+
+    checkpoints = []
+    for filename in os.listdir(checkpoint_dir):
+        if filename.startswith('v') and filename.endswith('.parquet'):
+            try:
+                checkpoints.append((int(filename[1:-len('.parquet')]), os.path.join(checkpoint_dir, filename)))
+            except ValueError:
+                continue
+    checkpoints.sort()
+    return checkpoints
+
+
+def _coerce_value(value, dtype):
+    """Tarayıcıdan gelen değeri sütun tipine çevir ('' → boş)"""
+    if value is None or (isinstance(value, str) and value.strip() == ''):
+        return None
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_float_dtype(dtype):
+        try:
+            number = float(value)
+            return int(number) if number.is_integer() and pd.api.types.is_integer_dtype(dtype) else number
+        except (TypeError, ValueError):
+            return value
+    return value
+
+
+def apply_patches(df, patches):
+    """Yamaları DataFrame'e uygula (sütun bazında toplu atama)"""
+    if not patches:
+        return df
+
+    by_column = {}
+    for patch in patches:
+        by_column.setdefault(patch['column'], {})[patch['row_id']] = patch['value']
+
+    for column, cells in by_column.items():
+        if column not in df.columns:
+            continue
+        row_ids = list(cells.keys())
+        values = [_coerce_value(v, df[column].dtype) for v in cells.values()]
+        fits = all(v is None or isinstance(v, (int, float)) for v in values)
+        if not (fits and pd.api.types.is_numeric_dtype(df[column].dtype)):
+            df[column] = df[column].astype(object)
+        elif any(v is None for v in values) and pd.api.types.is_integer_dtype(df[column].dtype):
+            df[column] = df[column].astype(float)
+        df.loc[row_ids, column] = values
+
+    return df
+
+
+def materialize(output_dir, version=None, columns=None):
+    """
+    Belirli bir versiyondaki veriyi üret (None: en güncel)
+
+    En yakın checkpoint'ten (yoksa base'den) başlar ve sonraki yamaları uygular.
+    """
+    from app.services.export_service import find_result_file
+
+    result_file = find_result_file(output_dir)
+    if result_file is None:
+        return None
+
+    entries = read_edit_log(output_dir)
+    if version is None:
+        version = entries[-1]['version'] if entries else 0
+
+    start_version, start_file = 0, result_file
+    for checkpoint_version, checkpoint_file in _list_checkpoints(output_dir):
+        if checkpoint_version <= version:
+            start_version, start_file = checkpoint_version, checkpoint_file
+
+    df = pd.read_parquet(start_file)
+    for entry in entries:
+        if start_version < entry['version'] <= version:
+            df = apply_patches(df, entry['patches'])
+
+    if columns is not None:
+        df = df[columns]
+    return df
+
+
+def _compact(output_dir, version):
+    """Güncel durumu checkpoint olarak yaz ve eski checkpoint'leri temizle"""
+    from app.services.export_service import _arrow_safe
+
+    checkpoint_dir = _checkpoint_dir(output_dir)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    df = materialize(output_dir, version=version)
+    path = os.path.join(checkpoint_dir, f"v{version}.parquet")
+    tmp_path = os.path.join(checkpoint_dir, f".tmp{os.getpid()}_v{version}.parquet")
+    _arrow_safe(df).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+    for _, old_path in _list_checkpoints(output_dir)[:-KEEP_CHECKPOINTS]:
+        os.remove(old_path)
+
+    print(f"🗜️  Düzenleme log'u sıkıştırıldı (checkpoint v{version})")
+
+
+def _int_arg(value, label):
+    """İstemciden gelen tamsayı alanı (örn. "17" → 17); geçersizse ValueError"""
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"Geçersiz {label}: {value!r}")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Geçersiz {label}: {value!r}") from None
+
+
+def _validate_patches(patches):
+    """Yamaları çakışma kontrolünden önce tiplerine çevir (row_id int, column str)"""
+    if not isinstance(patches, list):
+        raise ValueError('patches bir liste olmalı')
+    validated = []
+    for patch in patches:
+        if not isinstance(patch, dict):
+            raise ValueError(f"Geçersiz yama: {patch!r}")
+        column = patch.get('column')
+        if not isinstance(column, str):
+            raise ValueError(f"Geçersiz sütun: {column!r}")
+        validated.append({
+            'row_id': _int_arg(patch.get('row_id'), 'satır'),
+            'column': column,
+            'value': patch.get('value')
+        })
+    return validated
+
+
+def append_patches(output_dir, patches, user=None, base_version=None):
+    """
+    Yeni bir düzenleme versiyonu ekle
+
+    Args:
+        patches: [{'row_id': int, 'column': str, 'value': ...}]
+        user: Düzenlemeyi yapan kullanıcı
+        base_version: İstemcinin gördüğü versiyon; verilirse bu versiyondan sonra
+            değişmiş hücrelere yazma EditConflictError ile reddedilir
+
+    Returns:
+        dict: Eklenen versiyon kaydı
+
+    Raises:
+        ValueError: Geçersiz row_id / column / base_version (veya bilinmeyen
+            sütun, aralık dışı satır)
+        EditConflictError: base_version'dan sonra değişmiş hücre
+    """
+    patches = _validate_patches(patches)
+    if base_version is not None:
+        base_version = _int_arg(base_version, 'base_version')
+
+    with _locked_log(output_dir) as log_file:
+        entries = read_edit_log(output_dir)
+        version = entries[-1]['version'] if entries else 0
+
+        if base_version is not None and base_version < version:
+            touched = {}
+            for entry in entries:
+                if entry['version'] > base_version:
+                    for patch in entry['patches']:
+                        touched[(patch['row_id'], patch['column'])] = entry['version']
+            conflicts = [p for p in patches if (p['row_id'], p['column']) in touched]
+            if conflicts:
+                raise EditConflictError(conflicts)
+
+        df = materialize(output_dir, version=version)
+        if df is None:
+            raise ValueError('Analiz sonucu bulunamadı')
+
+        normalized = []
+        for patch in patches:
+            row_id = patch['row_id']
+            column = patch['column']
+            if column not in df.columns:
+                raise ValueError(f"Bilinmeyen sütun: {column}")
+            if not 0 <= row_id < len(df):
+                raise ValueError(f"Geçersiz satır: {row_id}")
+            old_value = df.at[row_id, column]
+            normalized.append({
+                'row_id': row_id,
+                'column': column,
+                'old': None if pd.isna(old_value) else _json_value(old_value),
+                'value': patch['value']
+            })
+
+        entry = {
+            'version': version + 1,
+            'created_at': datetime.now().isoformat(),
+            'user': user,
+            'patches': normalized
+        }
+        log_file.seek(0, os.SEEK_END)
+        log_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        log_file.flush()
+        os.fsync(log_file.fileno())
+
+        # Kilit altında: sonuç değişirken eski sonucun checkpoint'i yazılmasın
+        checkpoints = _list_checkpoints(output_dir)
+        last_checkpoint = checkpoints[-1][0] if checkpoints else 0
+        if entry['version'] - last_checkpoint >= COMPACT_EVERY:
+            _compact(output_dir, entry['version'])
+
+    return entry
+
+
+def _json_value(value):
+    """numpy/pandas skalerlerini JSON'a yazılabilir hale getir"""
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat(sep=' ')
+    return value
+
+
+def list_versions(output_dir):
+    """Versiyon listesi (0 = orijinal analiz sonucu)"""
+    from app.services.export_service import find_result_file
+
+    result_file = find_result_file(output_dir)
+    if result_file is None:
+        return None
+
+    versions = [{
+        'version': 0,
+        'created_at': datetime.fromtimestamp(os.path.getmtime(result_file)).isoformat(),
+        'user': None,
+        'changes': 0
+    }]
+    for entry in read_edit_log(output_dir):
+        versions.append({
+            'version': entry['version'],
+            'created_at': entry['created_at'],
+            'user': entry.get('user'),
+            'changes': len(entry['patches'])
+        })
+    return versions
+
+
+def diff_versions(output_dir, from_version, to_version):
+    """
+    İki versiyon arasındaki hücre farkları
+
+    Sadece log'dan hesaplanır; base sadece ilgili hücreler için okunur.
+
+    Returns:
+        list: [{'row_id', 'email', 'column', 'old', 'new'}]
+    """
+    from app.services.export_service import find_result_file
+
+    reverse = from_version > to_version
+    low, high = (to_version, from_version) if reverse else (from_version, to_version)
+
+    entries = read_edit_log(output_dir)
+    value_at_low = {}
+    value_at_high = {}
+    for entry in entries:
+        for patch in entry['patches']:
+            cell = (patch['row_id'], patch['column'])
+            if entry['version'] <= low:
+                value_at_low[cell] = patch['value']
+            elif entry['version'] <= high:
+                value_at_high[cell] = patch['value']
+
+    if not value_at_high:
+        return []
+
+    base = pd.read_parquet(find_result_file(output_dir))
+
+    changes = []
+    for (row_id, column), new_value in sorted(value_at_high.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+        if (row_id, column) in value_at_low:
+            old_value = value_at_low[(row_id, column)]
+        else:
+            raw = base.at[row_id, column]
+            old_value = None if pd.isna(raw) else _json_value(raw)
+        if _same_value(old_value, new_value):
+            continue
+        if reverse:
+            old_value, new_value = new_value, old_value
+        changes.append({
+            'row_id': row_id,
+            'email': base.at[row_id, 'email'] if 'email' in base.columns else None,
+            'column': column,
+            'old': old_value,
+            'new': new_value
+        })
+    return changes
+
+
+def _same_value(a, b):
+    if a is None or b is None:
+        return (a is None or a == '') and (b is None or b == '')
+    return str(a) == str(b)
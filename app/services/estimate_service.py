@@ -0,0 +1,358 @@
+"""
+Hızlı Tahmin (Örneklem) Servisi
+Büyük bir alıcı listesinde tam analizden önce kategori dağılımını saniyeler
+içinde tahmin eder. Yüklenen dosyanın normalize email'lerinden katmanlı
+(email domain'ine göre) bir örneklem çekilir ve mevcut pipeline
+fonksiyonlarından (form kayıtları → UTM seçimi → reklam detayları →
+kategoriler) geçirilir.
+
+Tahminler katman ağırlıklarıyla hesaplanır; güven aralıkları Wilson
+aralığıdır (tabakalı varyanstan etkin örneklem büyüklüğüyle). Kategori
+payları ile en sık utm_campaign / adset değerleri raporlanır.
+
+Örneklemin form kayıtları kampanya çıktısının yanına (estimate/) yazılır;
+aynı tarih aralığı ve veri kaynağıyla yapılan tam analiz bu email'leri
+veritabanından tekrar istemez (bkz. load_sample_submissions).
+"""
+
+import os
+import json
+import time
+import random
+from datetime import datetime
+from statistics import NormalDist
+
+import pandas as pd
+
+from app.services.utm_service import normalize_email, fetch_form_submissions, build_utm_records, process_utm_details
+from app.services.reklam_service import enrich_with_ad_details
+from app.services.analysis_service import categorize_customers
+from app.utils.data_source import DEFAULT_SQLITE_PATH
+
+ESTIMATE_DIRNAME = 'estimate'
+ESTIMATE_FILENAME = 'estimate.json'
+SAMPLE_KEYS_FILENAME = 'sample_keys.json'
+SAMPLE_SUBMISSIONS_FILENAME = 'submissions.parquet'
+
+DEFAULT_SAMPLE_SIZE = 1000
+MAX_SAMPLE_SIZE = 20000
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_SEED = 0
+# En kalabalık bu kadar domain ayrı katman, kalanlar 'diğer'
+STRATA_DOMAINS = 8
+OTHER_STRATUM = 'diğer'
+ALL_STRATUM = 'tümü'
+TOP_VALUES = 10
+# En sık değerler listesine girmek için örneklemdeki en az görülme sayısı
+# (birkaç kez görülen değerlerin "en sık" seçilmesi tesadüftür, aralığı iyimserdir)
+TOP_MIN_SAMPLE = 5
+# Örneklem kayıtları tam analizde bu süreye kadar yeniden kullanılır (sn)
+DEFAULT_REUSE_SECONDS = 3600
+
+CATEGORIES = ['REKLAM (Meta)', 'ORGANİK', 'BOŞ', 'KAYIT YOK']
+TOP_COLUMNS = ['utm_campaign', 'adset_name']
+
+
+def sample_size_setting(value=None):
+    """İstenen örneklem büyüklüğü (varsayılan ESTIMATE_SAMPLE_SIZE), 1..MAX_SAMPLE_SIZE"""
+    if value is None:
+        try:
+            value = int(os.environ.get('ESTIMATE_SAMPLE_SIZE', DEFAULT_SAMPLE_SIZE))
+        except ValueError:
+            value = DEFAULT_SAMPLE_SIZE
+    return min(max(1, int(value)), MAX_SAMPLE_SIZE)
+
+
+def _domain(email_key):
+    return email_key.rsplit('@', 1)[-1] if '@' in email_key else ''
+
+
+def draw_sample(email_list, sample_size, seed=DEFAULT_SEED):
+    """
+    Normalize email'lerden domain katmanlı örneklem çek (orantılı dağıtım)
+
+    Args:
+        email_list: Dosyadaki email'ler (tekrar edenler bir kez sayılır)
+        sample_size: Örneklem büyüklüğü (nüfustan büyükse tüm email'ler)
+
+    Returns:
+        dict: {'population', 'emails': [örneklemdeki özgün email'ler],
+               'strata': {katman: {'population', 'sample', 'keys': [...]}}}
+    """
+    # Normalize anahtar → dosyadaki ilk özgün yazımı (pipeline ile aynı eşleşme)
+    originals = {}
+    for email in email_list:
+        originals.setdefault(normalize_email(email), str(email).strip())
+    keys = list(originals)
+
+    counts = pd.Series([_domain(k) for k in keys]).value_counts()
+    named = set(counts.index[:STRATA_DOMAINS])
+    members = {}
+    for key in keys:
+        domain = _domain(key)
+        members.setdefault(domain if domain in named else OTHER_STRATUM, []).append(key)
+
+    population = len(keys)
+    sample_size = min(sample_size, population)
+    if sample_size < len(members):
+        # Her katmana yetmeyen örneklem: tek katman (basit rastgele örneklem)
+        members = {ALL_STRATUM: keys}
+    # Orantılı dağıtım (en büyük kalan), her katmandan en az bir email
+    quotas = {name: sample_size * len(group) / population for name, group in members.items()}
+    allocation = {name: max(1, int(quota)) for name, quota in quotas.items()}
+    remaining = sample_size - sum(allocation.values())
+    for name in sorted(quotas, key=lambda n: quotas[n] - int(quotas[n]), reverse=True):
+        if remaining <= 0:
+            break
+        if allocation[name] < len(members[name]):
+            allocation[name] += 1
+            remaining -= 1
+    # Alt sınır yüzünden aşıldıysa en kalabalık katmanlardan geri al
+    for name in sorted(allocation, key=lambda n: allocation[n], reverse=True):
+        while remaining < 0 and allocation[name] > 1:
+            allocation[name] -= 1
+            remaining += 1
+
+    rng = random.Random(seed)
+    strata = {}
+    emails = []
+    for name in sorted(members):
+        chosen = rng.sample(members[name], allocation[name])
+        strata[name] = {'population': len(members[name]), 'sample': len(chosen), 'keys': chosen}
+        emails.extend(originals[key] for key in chosen)
+    return {'population': population, 'emails': emails, 'strata': strata}
+
+
+def wilson_interval(p, n, confidence=DEFAULT_CONFIDENCE):
+    """
+    Oran için Wilson güven aralığı
+
+    Args:
+        p: Tahmini oran
+        n: (Etkin) örneklem büyüklüğü
+
+    Returns:
+        tuple: (alt, üst)
+    """
+    if n <= 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z / denominator * ((p * (1 - p) / n + z * z / (4 * n * n)) ** 0.5)
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def stratified_share(hits, strata, confidence=DEFAULT_CONFIDENCE):
+    """
+    Tabakalı oran tahmini ve Wilson aralığı
+
+    Args:
+        hits: {katman: örneklemde özelliği taşıyan email sayısı}
+        strata: draw_sample()['strata']
+
+    Returns:
+        dict: {'share', 'low', 'high', 'sample_count'}
+    """
+    population = sum(s['population'] for s in strata.values())
+    sample = sum(s['sample'] for s in strata.values())
+    share = 0.0
+    variance = 0.0
+    for name, stratum in strata.items():
+        n, size = stratum['sample'], stratum['population']
+        if not n:
+            continue
+        weight = size / population
+        p = hits.get(name, 0) / n
+        share += weight * p
+        # Sonlu nüfus düzeltmeli katman varyansı
+        variance += weight ** 2 * (1 - n / size) * p * (1 - p) / max(1, n - 1)
+
+    if sample >= population:
+        low = high = share  # Tüm nüfus analiz edildi
+    else:
+        effective = share * (1 - share) / variance if variance > 0 else sample
+        low, high = wilson_interval(share, effective, confidence)
+    return {
+        'share': round(share, 4),
+        'low': round(low, 4),
+        'high': round(high, 4),
+        'sample_count': int(sum(hits.values()))
+    }
+
+
+def _estimate_entry(hits, strata, population, confidence):
+    entry = stratified_share(hits, strata, confidence)
+    entry['estimated_count'] = round(entry['share'] * population)
+    entry['count_low'] = round(entry['low'] * population)
+    entry['count_high'] = round(entry['high'] * population)
+    return entry
+
+
+def estimate_shares(df_categorized, sample, confidence=DEFAULT_CONFIDENCE, top=TOP_VALUES):
+    """
+    Örneklemin kategorilerinden nüfus tahminleri
+
+    Returns:
+        dict: {'categories': {kategori: tahmin}, 'top': {sütun: [{'value', ...tahmin}]}}
+    """
+    stratum_of = {key: name for name, s in sample['strata'].items() for key in s['keys']}
+    df = df_categorized.reset_index(drop=True)
+    strata = df['email'].map(lambda e: stratum_of.get(normalize_email(e)))
+    population = sample['population']
+
+    def estimates(values):
+        """Değer başına (katman → örneklem sayısı) tahmini"""
+        known = strata.notna() & values.notna()
+        table = pd.crosstab(values[known], strata[known])
+        return {value: _estimate_entry(row[row > 0].to_dict(), sample['strata'], population, confidence)
+                for value, row in table.iterrows()}
+
+    by_category = estimates(df['kategori'])
+    empty = _estimate_entry({}, sample['strata'], population, confidence)
+    categories = {category: by_category.get(category, empty) for category in CATEGORIES}
+
+    tops = {}
+    for column in TOP_COLUMNS:
+        if column not in df.columns:
+            continue
+        values = df[column].map(lambda v: str(v).strip() if pd.notna(v) else None)
+        values = values.where(~values.isin(['', 'nan', 'None']))
+        rows = [{'value': value, **entry} for value, entry in estimates(values).items()
+                if entry['sample_count'] >= TOP_MIN_SAMPLE]
+        rows.sort(key=lambda r: r['share'], reverse=True)
+        tops[column] = rows[:top]
+    return {'categories': categories, 'top': tops}
+
+
+def _source_name():
+    """Veri kaynağı (sqlite'ta dosya yoluyla); örneklem yalnızca aynı kaynakta yeniden kullanılır"""
+    name = (os.environ.get('DATA_SOURCE') or 'mysql').strip().lower()
+    if name == 'sqlite':
+        return f"sqlite:{os.path.abspath(os.environ.get('DATA_SOURCE_PATH', DEFAULT_SQLITE_PATH))}"
+    return name
+
+
+def _estimate_dir(output_dir):
+    return os.path.join(output_dir, ESTIMATE_DIRNAME)
+
+
+def _write_atomic(path, write):
+    tmp_path = os.path.join(os.path.dirname(path), f".tmp{os.getpid()}_{os.path.basename(path)}")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def run_estimate(campaign, email_list, output_dir, sample_size=None, seed=DEFAULT_SEED,
+                 confidence=DEFAULT_CONFIDENCE, source_name=None):
+    """
+    Kampanya için hızlı tahmin: örneklem çek, pipeline'dan geçir, tahmin et, kaydet
+
+    Args:
+        email_list: Müşteri dosyasının email'leri (read_customer_file)
+        output_dir: Kampanya çıktı dizini (tahmin estimate/ altına yazılır)
+        source_name: Veri kaynağı adı (örneklem yeniden kullanımı bununla eşleşir)
+
+    Returns:
+        dict: estimate.json içeriği
+    """
+    from app.services.export_service import _arrow_safe
+
+    started = time.perf_counter()
+    sample_size = sample_size_setting(sample_size)
+    sample = draw_sample(email_list, sample_size, seed)
+    if not sample['population']:
+        raise ValueError('Müşteri dosyasında email yok')
+
+    print("\n" + "="*80)
+    print(f"🎯 HIZLI TAHMİN: {len(sample['emails'])}/{sample['population']} email ({len(sample['strata'])} katman)")
+    print(f"📅 Tarih Aralığı: {campaign.start_date} - {campaign.end_date}")
+    print("="*80)
+
+    df_submissions = fetch_form_submissions(sample['emails'], campaign.start_date, campaign.end_date)
+    df_records, _ = build_utm_records(sample['emails'], df_submissions, campaign.start_date, campaign.end_date)
+    df_details, _ = process_utm_details(df_records)
+    df_reklam, _ = enrich_with_ad_details(df_details)
+    df_categorized, _ = categorize_customers(df_reklam)
+
+    estimate = estimate_shares(df_categorized, sample, confidence)
+    report = {
+        'campaign_id': campaign.id,
+        'population': sample['population'],
+        'sample_size': len(sample['emails']),
+        'seed': seed,
+        'confidence': confidence,
+        'strata': [{'name': name, 'population': s['population'], 'sample': s['sample']}
+                   for name, s in sample['strata'].items()],
+        **estimate,
+        'window': {'start_date': campaign.start_date, 'end_date': campaign.end_date},
+        'source': source_name or _source_name(),
+        'seconds': round(time.perf_counter() - started, 2),
+        'created_at': datetime.now().isoformat(),
+        'created_ts': time.time()
+    }
+
+    directory = _estimate_dir(output_dir)
+    os.makedirs(directory, exist_ok=True)
+    keys = [key for s in sample['strata'].values() for key in s['keys']]
+    _write_atomic(os.path.join(directory, SAMPLE_SUBMISSIONS_FILENAME),
+                  lambda path: _arrow_safe(df_submissions).to_parquet(path, index=False))
+    _write_atomic(os.path.join(directory, SAMPLE_KEYS_FILENAME),
+                  lambda path: _dump_json(path, keys))
+    _write_atomic(os.path.join(directory, ESTIMATE_FILENAME),
+                  lambda path: _dump_json(path, report))
+
+    meta = report['categories'].get('REKLAM (Meta)', {})
+    print(f"✅ Tahmin tamamlandı ({report['seconds']} sn): REKLAM (Meta) %{meta.get('share', 0) * 100:.1f} "
+          f"(%{meta.get('low', 0) * 100:.1f} - %{meta.get('high', 0) * 100:.1f})")
+    return report
+
+
+def _dump_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def load_estimate(output_dir):
+    """Kayıtlı tahmin raporu (yoksa None)"""
+    path = os.path.join(_estimate_dir(output_dir), ESTIMATE_FILENAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_sample_submissions(output_dir, campaign, source_name=None, max_age=None):
+    """
+    Tam analizde yeniden kullanılabilecek örneklem kayıtları
+
+    Tahmin aynı tarih aralığı ve veri kaynağıyla, max_age saniye
+    (ESTIMATE_REUSE_SECONDS) içinde yapıldıysa döner.
+
+    Returns:
+        tuple | None: (normalize email'ler, form kayıtları DataFrame'i)
+            (fetch_form_submissions'ın prefetched argümanı)
+    """
+    report = load_estimate(output_dir)
+    if report is None:
+        return None
+    if max_age is None:
+        try:
+            max_age = float(os.environ.get('ESTIMATE_REUSE_SECONDS', DEFAULT_REUSE_SECONDS))
+        except ValueError:
+            max_age = DEFAULT_REUSE_SECONDS
+    source_name = source_name or _source_name()
+    if (report.get('window') != {'start_date': campaign.start_date, 'end_date': campaign.end_date}
+            or report.get('source') != source_name
+            or time.time() - report.get('created_ts', 0) > max_age):
+        return None
+
+    directory = _estimate_dir(output_dir)
+    try:
+        with open(os.path.join(directory, SAMPLE_KEYS_FILENAME), 'r', encoding='utf-8') as f:
+            keys = json.load(f)
+        df_submissions = pd.read_parquet(os.path.join(directory, SAMPLE_SUBMISSIONS_FILENAME))
+    except (OSError, ValueError):
+        return None
+    return keys, df_submissions
@@ -1,11 +1,28 @@
 """
 Export Servisi
 CSV ve Excel export fonksiyonları
+
+Analiz sonucu tek bir kanonik Parquet dosyası olarak saklanır. CSV, Excel,
+kategori CSV'leri ve gzip/zip paketleri ilk indirme isteğinde üretilir ve
+kaynak verinin içerik hash'i altında diske cache'lenir.
 """
 
 import pandas as pd
 import os
+import re
+import gzip
+import json
+import shutil
+import hashlib
+import zlib
+import zipfile
+import threading
 from datetime import datetime
+from functools import lru_cache
+
+from app.services.index_service import build_csv_index, INDEX_SUFFIX
+from app.utils.metrics import record_cache
+from app.utils.query_profile import QUERY_PROFILE_FILENAME
 
 
 def export_to_csv(df, filename, output_dir='data/output'):
@@ -58,9 +75,38 @@ def export_to_excel(df_dict, filename, output_dir='data/output'):
     return filepath
 
 
+CANONICAL_EXT = '.parquet'
+CACHE_DIRNAME = 'cache'
+MANIFEST_FILENAME = 'manifest.json'
+INTERNAL_FILES = {'results.json', 'edits.jsonl', 'summary.json', QUERY_PROFILE_FILENAME}
+
+# Tüm veriden türetilen indirilebilir formatlar ve dosya sonekleri
+EXPORT_FORMATS = {
+    'csv': '.csv',
+    'excel': '.xlsx',
+    'csv_gz': '.csv.gz',
+    'zip': '.zip',
+}
+
+
+def _arrow_safe(df):
+    """Karışık tipli object sütunlarını Parquet'e yazılabilir hale getir"""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            inferred = pd.api.types.infer_dtype(df[col], skipna=True)
+            if inferred.startswith('mixed') or inferred == 'empty':
+                df[col] = df[col].map(lambda x: str(x) if pd.notna(x) else None)
+    return df
+
+
 def create_campaign_export(df_categorized, campaign_name, output_dir='data/output/final'):
     """
-    Kampanya için export dosyalarını oluştur (Sadece 2 dosya)
+    5. ADIM: Kanonik analiz sonucunu (Parquet) kaydet
+    
+    CSV/Excel dosyaları burada üretilmez; ilk indirme isteğinde
+    get_export_path tarafından oluşturulur. Önceki sonucun düzenleme log'u
+    ve checkpoint'leri arşivlenir (bkz. edit_service.replace_result).
     
     Args:
         df_categorized: Kategorilere ayrılmış DataFrame
@@ -76,24 +122,77 @@ def create_campaign_export(df_categorized, campaign_name, output_dir='data/outpu
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     safe_name = campaign_name.replace(' ', '_').replace('/', '_')
     
-    exported_files = {}
+    from app.services.edit_service import replace_result
     
-    print("\n📦 Export dosyaları oluşturuluyor...")
+    print("\n📦 Analiz sonucu kaydediliyor...")
     
-    # 1. TEK CSV - Tüm kategoriler (filtrelenebilir)
-    print("   📄 CSV dosyası oluşturuluyor...")
-    combined_filename = f"{safe_name}_ANALIZ_{timestamp}.csv"
-    combined_filepath = os.path.join(output_dir, combined_filename)
-    df_categorized.to_csv(combined_filepath, index=False, encoding='utf-8-sig')
-    exported_files['csv'] = combined_filepath
-    print(f"   ✅ CSV: {combined_filename}")
+    result_filename = f"{safe_name}_ANALIZ_{timestamp}{CANONICAL_EXT}"
+    result_filepath = os.path.join(output_dir, result_filename)
+    # Geçici ad .parquet ile bitmez (find_result_file görmesin); yayınlanırken
+    # önceki sonucun düzenlemeleri arşivlenir
+    tmp_path = os.path.join(output_dir, f".tmp{os.getpid()}_{result_filename}.part")
+    _arrow_safe(df_categorized).to_parquet(tmp_path, index=False)
+    replace_result(output_dir, tmp_path, result_filepath)
     
-    # 2. TEK EXCEL - Kategori bazında sheet'ler
-    print("   📊 Excel dosyası oluşturuluyor...")
-    excel_filename = f"{safe_name}_ANALIZ_{timestamp}.xlsx"
-    excel_filepath = os.path.join(output_dir, excel_filename)
+    print(f"   ✅ Sonuç: {result_filename} ({len(df_categorized)} kayıt)")
+    print("   ℹ️  CSV/Excel dosyaları ilk indirmede oluşturulacak")
+    
+    return {'result': result_filepath}
+
+
+def find_result_file(output_dir):
+    """En son kanonik sonuç dosyasının yolunu döndür (yoksa None)"""
+    if not os.path.isdir(output_dir):
+        return None
+    
+    files = [f for f in os.listdir(output_dir) if f.endswith(CANONICAL_EXT)]
+    if not files:
+        return None
+    
+    files.sort(reverse=True)
+    return os.path.join(output_dir, files[0])
+
+
+def load_result(output_dir, columns=None):
+    """Kanonik analiz sonucunu (düzenlemeler uygulanmış haliyle) DataFrame olarak oku"""
+    from app.services.edit_service import materialize
+    return materialize(output_dir, columns=columns)
+
+
+def result_signature(output_dir):
+    """
+    Kaynak verinin ucuz imzası (sonuç dosyası adı, boyut, mtime + düzenleme log'u).
+    İmza değişmedikçe hash'ler yeniden hesaplanmaz.
+    """
+    from app.services.edit_service import edit_log_signature
     
-    with pd.ExcelWriter(excel_filepath, engine='openpyxl') as writer:
+    result_file = find_result_file(output_dir)
+    if result_file is None:
+        return None
+    st = os.stat(result_file)
+    return f"{os.path.basename(result_file)}:{st.st_size}:{st.st_mtime_ns}:{edit_log_signature(output_dir)}"
+
+
+def content_hash(df):
+    """DataFrame içeriğinin (sütunlar + değerler) sha256 hash'i"""
+    h = hashlib.sha256()
+    h.update('\x1f'.join(map(str, df.columns)).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def category_slug(category):
+    """Kategori adını dosya adına uygun hale getir: 'REKLAM (Meta)' -> 'REKLAM_Meta'"""
+    return re.sub(r'[^\w]+', '_', str(category), flags=re.UNICODE).strip('_')
+
+
+def _write_csv(df, filepath):
+    df.to_csv(filepath, index=False, encoding='utf-8-sig')
+
+
+def _write_excel(df_categorized, filepath):
+    """Kategori bazında sheet'ler içeren Excel dosyası"""
+    with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
         # Tüm veriyi ilk sheet'e ekle
         df_categorized.to_excel(writer, sheet_name='TÜM VERİ', index=False)
         
@@ -102,12 +201,344 @@ def create_campaign_export(df_categorized, campaign_name, output_dir='data/outpu
             df_category = df_categorized[df_categorized['kategori'] == category]
             clean_sheet_name = category[:31].replace('/', '_').replace('(', '').replace(')', '')
             df_category.to_excel(writer, sheet_name=clean_sheet_name, index=False)
-            print(f"      • {category}: {len(df_category)} kayıt")
+
+
+def _write_csv_gz(df, filepath):
+    with gzip.open(filepath, 'wt', encoding='utf-8-sig', newline='') as f:
+        df.to_csv(f, index=False)
+
+
+def _load_manifest(cache_dir):
+    path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _build_manifest(output_dir, signature, df=None):
+    """
+    Export planını çıkar: her indirilebilir dosya adı için format ve
+    kaynak verinin hash'i. Kategori CSV'leri sadece kendi alt kümelerinin
+    hash'ine bağlıdır; böylece bir düzenleme yalnızca etkilenen dosyaları geçersiz kılar.
+    """
+    if df is None:
+        df = load_result(output_dir)
+    
+    stem = os.path.basename(find_result_file(output_dir))[:-len(CANONICAL_EXT)]
+    full_hash = content_hash(df)
+    
+    exports = {}
+    for fmt, suffix in EXPORT_FORMATS.items():
+        exports[f"{stem}{suffix}"] = {'format': fmt, 'category': None, 'hash': full_hash}
+    
+    for category in sorted(df['kategori'].dropna().unique()):
+        df_category = df[df['kategori'] == category]
+        exports[f"{stem}_{category_slug(category)}.csv"] = {
+            'format': 'category_csv',
+            'category': category,
+            'hash': content_hash(df_category)
+        }
+    
+    return {'signature': signature, 'stem': stem, 'exports': exports}
+
+
+def _get_manifest(output_dir, df=None):
+    """Güncel manifest'i döndür, kaynak değiştiyse yeniden oluştur ve eski cache'i temizle"""
+    signature = result_signature(output_dir)
+    if signature is None:
+        return None
     
-    exported_files['excel'] = excel_filepath
-    print(f"   ✅ Excel: {excel_filename}")
+    cache_dir = os.path.join(output_dir, CACHE_DIRNAME)
+    manifest = _load_manifest(cache_dir)
+    if manifest and manifest.get('signature') == signature:
+        return manifest
     
-    print(f"\n✅ {len(exported_files)} dosya oluşturuldu!")
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = _build_manifest(output_dir, signature, df=df)
+    _save_manifest(cache_dir, manifest)
+    
+    # Artık referans edilmeyen hash dizinlerini sil
+    live_hashes = {entry['hash'] for entry in manifest['exports'].values()}
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path) and name not in live_hashes:
+            shutil.rmtree(path, ignore_errors=True)
+    
+    return manifest
+
+
+def _cache_path(output_dir, filename, entry):
+    return os.path.join(output_dir, CACHE_DIRNAME, entry['hash'], filename)
+
+
+def _generate_export(output_dir, filename, entry, manifest, df=None):
+    """Tek bir export dosyasını üret ve cache'e atomik olarak yaz"""
+    filepath = _cache_path(output_dir, filename, entry)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    # Uzantı korunur (openpyxl uzantıya bakıyor)
+    tmp_path = os.path.join(os.path.dirname(filepath), f".tmp{os.getpid()}.{threading.get_ident()}_{filename}")
+    
+    fmt = entry['format']
+    print(f"   📄 {filename} oluşturuluyor...")
+    
+    try:
+        if fmt == 'zip':
+            # Paket: diğer tüm export'ları (cache'den veya üreterek) ekle
+            with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                for member, member_entry in manifest['exports'].items():
+                    if member_entry['format'] in ('zip', 'csv_gz'):
+                        continue
+                    member_path = _ensure_export(output_dir, member, member_entry, manifest)
+                    zf.write(member_path, arcname=member)
+        else:
+            if df is None:
+                df = load_result(output_dir)
+            if fmt == 'csv':
+                _write_csv(df, tmp_path)
+            elif fmt == 'excel':
+                _write_excel(df, tmp_path)
+            elif fmt == 'csv_gz':
+                _write_csv_gz(df, tmp_path)
+            elif fmt == 'category_csv':
+                _write_csv(df[df['kategori'] == entry['category']], tmp_path)
+            else:
+                raise ValueError(f"Bilinmeyen export formatı: {fmt}")
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    os.replace(tmp_path, filepath)
+    
+    # CSV'ler için satır indeksi (sayfalı önizleme)
+    if fmt in ('csv', 'category_csv'):
+        build_csv_index(filepath)
+    
+    print(f"   ✅ {filename} hazır")
+    return filepath
+
+
+def _ensure_export(output_dir, filename, entry, manifest):
+    """Export'u cache'ten döndür, yoksa üret (indirme, önizleme ve paket yolları)"""
+    from app.services.summary_service import mark_file_generated
     
-    return exported_files
+    filepath = _cache_path(output_dir, filename, entry)
+    exists = os.path.exists(filepath)
+    record_cache('export', exists)
+    if exists:
+        return filepath
+    filepath = _generate_export(output_dir, filename, entry, manifest)
+    # Özet (summary.json) üretilen dosyanın boyutunu göstersin
+    mark_file_generated(output_dir, filename, os.path.getsize(filepath))
+    return filepath
+
+
+def _is_internal_file(filename):
+    """Çıktı dizinindeki indirilemeyen iç dosyalar (sonuç, indeks, log, rapor)"""
+    return (filename in INTERNAL_FILES
+            or filename.endswith(CANONICAL_EXT)
+            or filename.endswith(INDEX_SUFFIX))
+
+
+def safe_output_path(output_dir, filename):
+    """
+    Dosya adını çıktı dizini içinde kalacak şekilde birleştir.
+    Dizin dışına çıkan ('../', mutlak yol, alt dizin) adlar için None döner.
+    """
+    if not filename or filename in ('.', '..') or '/' in filename or '\\' in filename or '\x00' in filename:
+        return None
+    
+    root = os.path.realpath(output_dir)
+    path = os.path.realpath(os.path.join(root, filename))
+    if os.path.dirname(path) != root:
+        return None
+    return path
+
+
+def get_export_path(output_dir, filename):
+    """
+    İndirilecek dosyanın yolunu döndür, gerekiyorsa üret.
+    
+    Önce çıktı dizinindeki gerçek dosyalara (eski kampanyalar, düzenlenmiş CSV'ler)
+    bakar, sonra kanonik sonuçtan türetilen export'lara.
+    
+    Returns:
+        str: Dosya yolu (bulunamazsa None)
+    """
+    direct_path = safe_output_path(output_dir, filename)
+    if direct_path is None:
+        return None
+    
+    if os.path.isfile(direct_path) and not _is_internal_file(filename):
+        return direct_path
+    
+    manifest = _get_manifest(output_dir)
+    if manifest is None or filename not in manifest['exports']:
+        return None
+    
+    return _ensure_export(output_dir, filename, manifest['exports'][filename], manifest)
+
+
+def export_name(output_dir, fmt='csv', category=None):
+    """
+    Kanonik sonuçtan türetilen export'un dosya adı
+    (örn. fmt='category_csv', category='ORGANİK'). Bulunamazsa None.
+    """
+    manifest = _get_manifest(output_dir)
+    if manifest is None:
+        return None
+    for filename, entry in manifest['exports'].items():
+        if entry['format'] == fmt and entry['category'] == category:
+            return filename
+    return None
+
+
+def list_exports(output_dir):
+    """
+    İndirilebilir dosyaları listele.
+    
+    Henüz üretilmemiş export'lar size=None ile döner.
+    
+    Returns:
+        list: [{'filename', 'size', 'created', 'generated'}]
+    """
+    files = []
+    if not os.path.isdir(output_dir):
+        return files
+    
+    for filename in sorted(os.listdir(output_dir)):
+        filepath = os.path.join(output_dir, filename)
+        if _is_internal_file(filename) or not os.path.isfile(filepath):
+            continue
+        files.append({
+            'filename': filename,
+            'size': os.path.getsize(filepath),
+            'created': datetime.fromtimestamp(os.path.getctime(filepath)).isoformat(),
+            'generated': True
+        })
+    
+    manifest = _get_manifest(output_dir)
+    if manifest:
+        for filename, entry in manifest['exports'].items():
+            filepath = _cache_path(output_dir, filename, entry)
+            generated = os.path.exists(filepath)
+            files.append({
+                'filename': filename,
+                'size': os.path.getsize(filepath) if generated else None,
+                'created': datetime.fromtimestamp(os.path.getctime(filepath)).isoformat() if generated else None,
+                'generated': generated
+            })
+    
+    return files
+
+
+@lru_cache(maxsize=512)
+def _file_sha256(filepath, size, mtime_ns):
+    h = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_content_hash(filepath):
+    """
+    Dosya içeriğinin sha256 hash'i (strong ETag için).
+    Dosya boyutu/mtime değişmedikçe hesap tekrarlanmaz.
+    """
+    st = os.stat(filepath)
+    return _file_sha256(filepath, st.st_size, st.st_mtime_ns)
+
+
+def iter_gzip(filepath, chunk_size=256 * 1024):
+    """Dosyayı geçici dosya oluşturmadan gzip olarak parça parça sıkıştır"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = gzip header
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+    yield compressor.flush()
+
+
+class _ZipStreamBuffer:
+    """zipfile'ın yazdığı byte'ları toplayan, seek edilemeyen çıktı"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip_bundle(members, chunk_size=256 * 1024):
+    """
+    Dosyaları geçici dosya oluşturmadan zip olarak stream et.
+    
+    Args:
+        members: [(arcname, filepath)] listesi
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for arcname, filepath in members:
+            with open(filepath, 'rb') as src, zf.open(arcname, 'w', force_zip64=True) as dst:
+                for chunk in iter(lambda: src.read(chunk_size), b''):
+                    dst.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    yield buffer.drain()
+
+
+def bundle_members(output_dir):
+    """
+    Kampanya paketine girecek dosyalar: [(arcname, filepath)].
+    Sıkıştırılmış türevler (.zip, .csv.gz) tekrar eklenmez; eksik export'lar üretilir.
+    """
+    members = []
+    for file_info in list_exports(output_dir):
+        filename = file_info['filename']
+        if filename.endswith('.zip') or filename.endswith('.gz'):
+            continue
+        filepath = get_export_path(output_dir, filename)
+        if filepath:
+            members.append((filename, filepath))
+    return members
+
 
+def bundle_etag(members):
+    """Paket ETag'i: üye dosya adları ve içerik hash'lerinden türetilir"""
+    h = hashlib.sha256()
+    for arcname, filepath in members:
+        h.update(arcname.encode('utf-8'))
+        h.update(file_content_hash(filepath).encode('ascii'))
+    return h.hexdigest()
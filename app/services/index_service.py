@@ -0,0 +1,148 @@
+"""
+CSV Satır İndeksi Servisi
+Çıktı CSV'leri için yan dosya (sidecar) indeksi: satır sayısı, sütunlar ve
+her N. satırın byte offset'i. Önizleme ve veri endpoint'leri dosyanın tamamını
+okumadan istenen sayfaya seek ederek ulaşır.
+"""
+
+import io
+import os
+import json
+import codecs
+import threading
+import pandas as pd
+
+INDEX_SUFFIX = '.idx.json'
+INDEX_STRIDE = 1000
+INDEX_VERSION = 1
+
+
+def index_path(filepath):
+    """CSV dosyasının indeks dosyası yolu"""
+    return f"{filepath}{INDEX_SUFFIX}"
+
+
+def _iter_records(f):
+    """
+    Binary dosyadan CSV kayıtlarını (byte offset, ham satır) olarak oku.
+    Tırnak içindeki satır sonları kaydı bölmez (tırnak sayısı çift olunca kayıt biter).
+    """
+    while True:
+        start = f.tell()
+        line = f.readline()
+        if not line:
+            return
+        record = line
+        while record.count(b'"') % 2 == 1:
+            more = f.readline()
+            if not more:
+                break
+            record += more
+        yield start, record
+
+
+def build_csv_index(filepath, stride=INDEX_STRIDE):
+    """
+    CSV dosyasını bir kez tarayıp indeksini oluştur ve yan dosyaya yaz
+
+    Returns:
+        dict: İndeks (columns, row_count, stride, offsets, data_offset)
+    """
+    st = os.stat(filepath)
+
+    with open(filepath, 'rb') as f:
+        bom = f.read(len(codecs.BOM_UTF8))
+        if bom != codecs.BOM_UTF8:
+            f.seek(0)
+
+        records = _iter_records(f)
+        header = next(records, None)
+        columns = []
+        if header is not None:
+            columns = pd.read_csv(io.BytesIO(header[1]), nrows=0).columns.tolist()
+        data_offset = f.tell()
+
+        offsets = []
+        row_count = 0
+        for start, record in records:
+            if record.strip() == b'':
+                continue
+            if row_count % stride == 0:
+                offsets.append(start)
+            row_count += 1
+
+    index = {
+        'version': INDEX_VERSION,
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'columns': columns,
+        'row_count': row_count,
+        'stride': stride,
+        'data_offset': data_offset,
+        'offsets': offsets
+    }
+
+    tmp_path = f"{index_path(filepath)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path(filepath))
+
+    return index
+
+
+def load_csv_index(filepath):
+    """
+    İndeksi yükle; yoksa veya CSV değiştiyse yeniden oluştur
+    (eski kampanyaların dosyaları ilk istekte indekslenir).
+    """
+    st = os.stat(filepath)
+    path = index_path(filepath)
+
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if (index.get('version') == INDEX_VERSION
+                    and index.get('size') == st.st_size
+                    and index.get('mtime_ns') == st.st_mtime_ns):
+                return index
+        except (OSError, ValueError):
+            pass
+
+    return build_csv_index(filepath)
+
+
+def read_csv_page(filepath, offset=0, limit=50):
+    """
+    CSV'den [offset, offset+limit) satırlarını seek ederek oku
+
+    Returns:
+        tuple: (DataFrame, index)
+    """
+    index = load_csv_index(filepath)
+    columns = index['columns']
+    offset = max(0, int(offset))
+    limit = max(0, int(limit))
+
+    if offset >= index['row_count'] or limit == 0:
+        return pd.DataFrame(columns=columns), index
+
+    stride = index['stride']
+    checkpoint = offset // stride
+    skip = offset - checkpoint * stride
+
+    chunks = []
+    with open(filepath, 'rb') as f:
+        f.seek(index['offsets'][checkpoint])
+        for _, record in _iter_records(f):
+            if record.strip() == b'':
+                continue
+            if skip > 0:
+                skip -= 1
+                continue
+            chunks.append(record)
+            if len(chunks) >= limit:
+                break
+
+    df = pd.read_csv(io.BytesIO(b''.join(chunks)), header=None, names=columns)
+    return df, index
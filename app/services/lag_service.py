@@ -0,0 +1,230 @@
+"""
+Satın Alma → Form Gecikme (Lag) Analizi
+Müşteri dosyasındaki satın alma tarihi (örn. DATE: 04.11.2025 22:10:13)
+okunur ve her satın alma, normalize email üzerinden merge_asof ile kendisinden
+önceki en son form kaydına bağlanır. Kaynak/adset bazında gecikme dağılımları
+hesaplanır. Sıralama + as-of join ile O(n log n) çalışır.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from app.services.attribution_service import ATTRIBUTION_DIRNAME, apply_adset_names
+
+LAG_FILENAME = 'purchase_lag.parquet'
+PURCHASE_DATE_COLUMNS = ['DATE', 'Date', 'date', 'TARİH', 'Tarih', 'tarih', 'SATIŞ TARİHİ', 'purchase_date']
+PURCHASE_DATE_FORMAT = '%d.%m.%Y %H:%M:%S'
+LAG_GROUP_COLUMNS = ['utm_source', 'utm_campaign', 'utm_term', 'adset_name']
+LAG_BUCKETS = [
+    ('< 1 saat', 0, 1),
+    ('1-24 saat', 1, 24),
+    ('1-7 gün', 24, 24 * 7),
+    ('7-30 gün', 24 * 7, 24 * 30),
+    ('30+ gün', 24 * 30, np.inf)
+]
+
+
+def find_purchase_date_column(df):
+    """Müşteri dosyasındaki satın alma tarihi sütunu (yoksa None)"""
+    for col in PURCHASE_DATE_COLUMNS:
+        if col in df.columns:
+            return col
+    return None
+
+
+def _parse_fixed_format(values):
+    """
+    'GG.AA.YYYY SS:DD:ss' metinlerini byte matrisi üzerinden vektörel parse et
+    (strptime'dan çok daha hızlı). Formata uymayanlar NaT döner; ASCII
+    olmayan metinler (örn. '4 Kasım 2025') byte matrisine alınmaz, onlar da
+    NaT döner ve serbest parse'a kalır.
+    """
+    ascii_ok = values.map(str.isascii).to_numpy(dtype=bool)
+    raw = np.where(ascii_ok, values.to_numpy(dtype=str), '').astype('S19')
+    chars = np.frombuffer(raw.tobytes(), dtype=np.uint8).reshape(len(raw), 19).astype(np.int64)
+    digits = chars - ord('0')
+
+    def number(start, width):
+        result = np.zeros(len(raw), dtype=np.int64)
+        for i in range(start, start + width):
+            result = result * 10 + digits[:, i]
+        return result
+
+    separators_ok = ((chars[:, 2] == ord('.')) & (chars[:, 5] == ord('.')) & (chars[:, 10] == ord(' '))
+                     & (chars[:, 13] == ord(':')) & (chars[:, 16] == ord(':')))
+    digit_positions = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15, 17, 18]
+    digits_ok = ((digits[:, digit_positions] >= 0) & (digits[:, digit_positions] <= 9)).all(axis=1)
+    lengths_ok = values.str.len().to_numpy() == 19
+    ok = ascii_ok & separators_ok & digits_ok & lengths_ok
+
+    day, month, year = number(0, 2), number(3, 2), number(6, 4)
+    hour, minute, second = number(11, 2), number(14, 2), number(17, 2)
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (hour < 24) & (minute < 60) & (second < 60)
+
+    months = ((np.where(ok, year, 1970) - 1970) * 12 + np.where(ok, month, 1) - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (np.where(ok, day, 1) - 1)
+    # Ay taşması (örn. 31.02) geçersiz sayılır
+    ok &= dates.astype('datetime64[M]') == months
+    stamps = (dates.astype('datetime64[s]')
+              + (hour * 3600 + minute * 60 + second).astype('timedelta64[s]')).astype('datetime64[ns]')
+    return pd.Series(np.where(ok, stamps, np.datetime64('NaT')), index=values.index, dtype='datetime64[ns]')
+
+
+def parse_purchase_dates(values):
+    """
+    Satın alma tarihlerini parse et: önce sabit format (hızlı yol),
+    tutmayanlar için gün-önce (dayfirst) serbest parse
+    """
+    values = values.astype(str).str.strip()
+    parsed = _parse_fixed_format(values)
+    missing = parsed.isna() & values.ne('') & values.ne('nan')
+    if missing.any():
+        parsed[missing] = pd.to_datetime(values[missing], dayfirst=True, errors='coerce', format='mixed')
+    return parsed
+
+
+def _email_keys(*email_series):
+    """
+    Birden fazla email serisi için ortak tamsayı anahtarlar (strip + lower).
+    Normalizasyon sadece tekil değerlere uygulanır.
+    """
+    combined = pd.concat(email_series, ignore_index=True)
+    codes, uniques = pd.factorize(combined)
+    normalized = pd.Series(uniques).astype(str).str.strip().str.lower()
+    normalized_codes, _ = pd.factorize(normalized)
+    keys = normalized_codes[codes]
+
+    result, start = [], 0
+    for series in email_series:
+        result.append(keys[start:start + len(series)])
+        start += len(series)
+    return result
+
+
+def match_purchases(df_customers, email_column, date_column, df_all_records, adset_names=None):
+    """
+    Her satın almayı kendisinden önceki en son form kaydına bağla
+
+    Args:
+        df_customers: Müşteri (satın alan) dosyası
+        email_column, date_column: Müşteri dosyasındaki sütunlar
+        df_all_records: collect_utm_data çıktısı (tüm form kayıtları)
+        adset_names: utm_term (adset_id) → adset_name eşlemesi (opsiyonel)
+
+    Returns:
+        DataFrame: email, purchased_at, created_at, lag_hours ve UTM alanları
+            (eşleşmeyen satın almalarda form alanları boş)
+    """
+    purchases = pd.DataFrame({
+        'email': df_customers[email_column],
+        'purchased_at': parse_purchase_dates(df_customers[date_column])
+    })
+    purchases = purchases[purchases['email'].notna() & purchases['purchased_at'].notna()]
+    purchases['purchased_at'] = purchases['purchased_at'].astype('datetime64[ns]')
+
+    utm_columns = [c for c in ['utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term']
+                   if c in df_all_records.columns]
+    submissions = df_all_records[['email', 'created_at'] + utm_columns].copy()
+    submissions['created_at'] = pd.to_datetime(submissions['created_at'], errors='coerce').astype('datetime64[ns]')
+    submissions = submissions[submissions['created_at'].notna()]
+
+    purchase_keys, submission_keys = _email_keys(purchases['email'], submissions.pop('email'))
+    purchases['email_key'] = purchase_keys
+    submissions['email_key'] = submission_keys
+    purchases = purchases.sort_values('purchased_at', kind='mergesort')
+    submissions = submissions.sort_values('created_at', kind='mergesort')
+
+    matched = pd.merge_asof(
+        purchases, submissions,
+        left_on='purchased_at', right_on='created_at',
+        by='email_key', direction='backward', allow_exact_matches=True
+    )
+
+    matched['lag_hours'] = (matched['purchased_at'] - matched['created_at']).dt.total_seconds() / 3600
+    if 'utm_term' in matched.columns:
+        matched['utm_term'] = matched['utm_term'].astype(str).where(matched['utm_term'].notna(), None)
+    return apply_adset_names(matched.drop(columns=['email_key']).reset_index(drop=True), adset_names)
+
+
+def summarize_lag(matched, group_by=('utm_source',), limit=None):
+    """
+    Gecikme dağılımları (saat)
+
+    Returns:
+        dict: purchases, matched, unmatched, overall, rows
+            [{...group_by, count, mean, p25, median, p75, p90, buckets}]
+    """
+    group_by = list(group_by)
+    lagged = matched[matched['lag_hours'].notna()]
+
+    def describe(frame):
+        lag = frame['lag_hours']
+        quantiles = lag.quantile([0.25, 0.5, 0.75, 0.9]).round(1).tolist() if len(lag) else [None] * 4
+        return {
+            'count': int(len(lag)),
+            'mean': round(float(lag.mean()), 1) if len(lag) else None,
+            'p25': quantiles[0], 'median': quantiles[1], 'p75': quantiles[2], 'p90': quantiles[3]
+        }
+
+    bins = [low for _, low, _ in LAG_BUCKETS] + [np.inf]
+    labels = [name for name, _, _ in LAG_BUCKETS]
+    bucket = pd.cut(lagged['lag_hours'], bins=bins, labels=labels, right=False)
+
+    frame = lagged[group_by + ['lag_hours']].copy()
+    for label in labels:
+        frame[label] = (bucket == label).to_numpy()
+
+    grouped = frame.groupby(group_by, dropna=False, sort=False)
+    table = grouped['lag_hours'].agg(['count', 'mean'])
+    quantiles = grouped['lag_hours'].quantile([0.25, 0.5, 0.75, 0.9]).unstack()
+    quantiles.columns = ['p25', 'median', 'p75', 'p90']
+    table = table.join(quantiles).join(grouped[labels].sum())
+    table = table.sort_values('count', ascending=False, kind='mergesort')
+    if limit is not None:
+        table = table.head(limit)
+
+    rows = []
+    for key, row in table.iterrows():
+        key = key if isinstance(key, tuple) else (key,)
+        rows.append({
+            **{col: (None if pd.isna(value) else value) for col, value in zip(group_by, key)},
+            'count': int(row['count']),
+            **{stat: round(row[stat], 1) for stat in ('mean', 'p25', 'median', 'p75', 'p90')},
+            'buckets': {label: int(row[label]) for label in labels}
+        })
+
+    overall = describe(lagged)
+    overall['buckets'] = {label: int(n) for label, n in bucket.value_counts().reindex(labels, fill_value=0).items()}
+    return {
+        'purchases': int(len(matched)),
+        'matched': int(len(lagged)),
+        'unmatched': int(len(matched) - len(lagged)),
+        'overall': overall,
+        'rows': rows
+    }
+
+
+def _lag_path(output_dir):
+    return os.path.join(output_dir, ATTRIBUTION_DIRNAME, LAG_FILENAME)
+
+
+def write_lag(output_dir, matched):
+    """Eşleşme tablosunu atıf verilerinin yanına yaz"""
+    from app.services.export_service import _arrow_safe
+
+    path = _lag_path(output_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".tmp{os.getpid()}_{LAG_FILENAME}")
+    _arrow_safe(matched).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_lag(output_dir):
+    """Eşleşme tablosunu oku (yoksa None)"""
+    path = _lag_path(output_dir)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
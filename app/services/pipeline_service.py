@@ -0,0 +1,338 @@
+"""
+Analiz Pipeline Servisi
+Tek kampanya ve çoklu kampanya (batch) analizinin ortak akışı:
+1. UTM verilerini topla → 2. Netleştir → 3. Reklam detayları → 4. Kategoriler
+→ 4.5 Kalite kontrol → 5. Export + atıf, gecikme, özet ve rollup.
+Akış, bağımsız aşamaları eşzamanlı çalıştıran küçük bir DAG olarak tanımlıdır.
+
+Batch analizde kampanyaların email birleşimi ve tarih aralıklarının zarfı için
+form kayıtları bir kez getirilir; her kampanya kendi email'leri ve aralığı ile
+yerelde süzülür (tek tek analizle aynı çıktı).
+"""
+
+import os
+import json
+
+import pandas as pd
+import pyarrow as pa
+
+from app.models import campaign_output_dir
+from app.services.utm_service import fetch_form_submissions, build_utm_records, process_utm_details
+from app.services.reklam_service import enrich_with_ad_details
+from app.services.analysis_service import categorize_customers
+from app.services.export_service import create_campaign_export, result_signature
+from app.services.validation_service import validate_analysis
+from app.services.summary_service import write_summary
+from app.services.attribution_service import compute_attribution, adset_name_map, apply_adset_names, write_attribution
+from app.services.lag_service import find_purchase_date_column, match_purchases, summarize_lag, write_lag
+from app.services.rollup_service import aggregate_rollup
+from app.utils.dag import Stage, run_dag
+from app.utils.cancellation import AnalysisCancelled
+from app.utils.metrics import track_run, observe_analysis
+from app.utils.query_profile import profile_queries, write_query_profile
+
+EMAIL_COLUMNS = ['email', 'Email', 'EMAIL', 'MAİL ADRESİ', 'Mail']
+
+
+class CustomerFileError(ValueError):
+    """Müşteri dosyası analiz edilemiyor (örn. email sütunu yok)"""
+
+    def __init__(self, message, columns=None):
+        self.columns = columns
+        super().__init__(message)
+
+
+def read_customer_file(customer_file):
+    """
+    Müşteri dosyasını oku ve email sütununu bul
+
+    Returns:
+        tuple: (df_customers, email_column, email_list)
+    """
+    df_customers = pd.read_csv(customer_file)
+
+    email_column = None
+    for col in EMAIL_COLUMNS:
+        if col in df_customers.columns:
+            email_column = col
+            break
+
+    if not email_column:
+        raise CustomerFileError('Email sütunu bulunamadı', columns=df_customers.columns.tolist())
+
+    email_list = df_customers[email_column].dropna().unique().tolist()
+    return df_customers, email_column, email_list
+
+
+def _init_arrow_pandas():
+    """
+    pyarrow'un pandas entegrasyonu ilk kullanımda tembel yüklenir ve bu yükleme
+    thread güvenli değil: yükleme sürerken başka bir thread Series'i düz liste
+    gibi okuyabiliyor. Eşzamanlı aşamalardan önce çağıran thread'de yüklenir.
+    """
+    pa.Table.from_pandas(pd.DataFrame())
+
+
+def _collect_stage(campaign, email_list, df_submissions, prefetched):
+    print("\n" + "="*80)
+    print("🔄 STEP 1: UTM VERİLERİ TOPLANIYOR")
+    print(f"📧 Email Sayısı: {len(email_list)}")
+    print(f"📅 Tarih Aralığı: {campaign.start_date} - {campaign.end_date}")
+    print("="*80)
+
+    if df_submissions is None:
+        df_submissions = fetch_form_submissions(email_list, campaign.start_date, campaign.end_date,
+                                                prefetched=prefetched)
+    df_all_records, stats1 = build_utm_records(
+        email_list, df_submissions, campaign.start_date, campaign.end_date
+    )
+
+    print(f"✅ STEP 1 TAMAMLANDI: {len(df_all_records)} kayıt toplandı")
+    return df_all_records, stats1
+
+
+def _utm_details_stage(df_all_records):
+    print("\n=== STEP 2: UTM DETAYLARI NETLEŞTİRİLİYOR ===")
+    return process_utm_details(df_all_records)
+
+
+def _ad_details_stage(df_utm_details):
+    print("\n=== STEP 3: REKLAM DETAYLARI EKLENİYOR ===")
+    df_reklam_detay, stats3 = enrich_with_ad_details(df_utm_details)
+    return df_reklam_detay, stats3, adset_name_map(df_reklam_detay)
+
+
+def _categorize_stage(df_reklam_detay):
+    print("\n=== STEP 4: KATEGORİLERE AYRILIYOR ===")
+    return categorize_customers(df_reklam_detay)
+
+
+def _validation_stage(customer_file, df_categorized, email_column):
+    print("\n=== STEP 4.5: KALİTE KONTROL ===")
+    return validate_analysis(
+        input_file=customer_file,
+        output_df=df_categorized,
+        email_column=email_column
+    )
+
+
+def _export_stage(campaign, df_categorized, output_dir):
+    print("\n=== STEP 5: DOSYALAR OLUŞTURULUYOR ===")
+    return create_campaign_export(df_categorized, campaign.name, output_dir)
+
+
+def _touches_stage(df_all_records):
+    # adset adları 3. adımdan sonra eklenir; hesap veritabanı beklenirken yapılır
+    return compute_attribution(df_all_records)
+
+
+def _attribution_stage(touches, adset_names, output_dir):
+    touches = apply_adset_names(touches, adset_names)
+    write_attribution(output_dir, touches)
+    return {
+        'touches': len(touches),
+        'emails': int(touches['email'].nunique())
+    }
+
+
+def _lag_match_stage(df_customers, email_column, df_all_records):
+    date_column = find_purchase_date_column(df_customers)
+    if not date_column:
+        return None
+    return match_purchases(df_customers, email_column, date_column, df_all_records)
+
+
+def _lag_stage(lag_matched, adset_names, output_dir):
+    if lag_matched is None:
+        return None
+    matched = apply_adset_names(lag_matched, adset_names)
+    write_lag(output_dir, matched)
+    lag_summary = summarize_lag(matched)
+    print(f"⏱️  Gecikme analizi: {lag_summary['matched']}/{lag_summary['purchases']} satın alma eşleşti")
+    return {k: lag_summary[k] for k in ('purchases', 'matched', 'unmatched', 'overall')}
+
+
+def _rollup_stage(campaign, rollup_store, df_categorized, output_dir, exported_files):
+    if rollup_store is None:
+        return
+    rollup_store.replace_campaign(campaign, aggregate_rollup(df_categorized), result_signature(output_dir))
+
+
+# Analiz DAG'ı: atıf/gecikme ön hesapları 2-3. adımlarla, kategori sonrası
+# kalite kontrol, export, atıf, gecikme ve rollup eşzamanlı çalışır
+ANALYSIS_STAGES = [
+    Stage('collect', _collect_stage, ('campaign', 'email_list', 'df_submissions', 'prefetched'),
+          ('df_all_records', 'stats1')),
+    Stage('utm_details', _utm_details_stage, ('df_all_records',), ('df_utm_details', 'stats2')),
+    Stage('ad_details', _ad_details_stage, ('df_utm_details',), ('df_reklam_detay', 'stats3', 'adset_names')),
+    Stage('categorize', _categorize_stage, ('df_reklam_detay',), ('df_categorized', 'stats4')),
+    Stage('validation', _validation_stage, ('customer_file', 'df_categorized', 'email_column'),
+          ('validation',), optional=True),
+    Stage('export', _export_stage, ('campaign', 'df_categorized', 'output_dir'), ('exported_files',)),
+    Stage('touches', _touches_stage, ('df_all_records',), ('touches',), optional=True),
+    Stage('attribution', _attribution_stage, ('touches', 'adset_names', 'output_dir'),
+          ('attribution',), optional=True),
+    Stage('lag_match', _lag_match_stage, ('df_customers', 'email_column', 'df_all_records'),
+          ('lag_matched',), optional=True),
+    Stage('lag', _lag_stage, ('lag_matched', 'adset_names', 'output_dir'),
+          ('lag',), optional=True),
+    Stage('rollup', _rollup_stage, ('campaign', 'rollup_store', 'df_categorized', 'output_dir', 'exported_files'),
+          optional=True),
+]
+RESULT_KEYS = ['step1', 'step2', 'step3', 'step4', 'validation', 'exported_files', 'attribution', 'lag']
+STAGE_WORKERS = 4
+
+
+def run_analysis(campaign, customer_file, output_dir, rollup_store=None,
+                 customer_data=None, df_submissions=None, prefetched=None):
+    """
+    Bir kampanyanın analizini baştan sona çalıştır (ANALYSIS_STAGES DAG'ı)
+
+    Args:
+        campaign: Campaign
+        customer_file: Müşteri CSV yolu
+        output_dir: Kampanya çıktı dizini
+        rollup_store: Verilirse kampanyalar arası rollup güncellenir
+        customer_data: read_customer_file çıktısı (batch'te tekrar okunmasın diye)
+        df_submissions: Önceden getirilmiş form kayıtları (batch); verilmezse
+            kampanyanın email'leri ve aralığı için veritabanından getirilir
+        prefetched: Hızlı tahmin örnekleminin kayıtları (estimate_service.
+            load_sample_submissions); bu email'ler tekrar sorgulanmaz
+
+    Returns:
+        dict: results.json içeriği (aşama süreleri/hataları 'pipeline',
+            sorgu/cache/bellek ölçümleri 'metrics' altında; DB_PROFILE açıksa
+            sorgu profili özeti 'query_profile' altında, detayı
+            query_profile.json'da)
+    """
+    df_customers, email_column, email_list = customer_data or read_customer_file(customer_file)
+
+    _init_arrow_pandas()
+    with track_run() as run, profile_queries() as profile:
+        try:
+            context, report = run_dag(ANALYSIS_STAGES, {
+                'campaign': campaign,
+                'customer_file': customer_file,
+                'output_dir': output_dir,
+                'rollup_store': rollup_store,
+                'df_customers': df_customers,
+                'email_column': email_column,
+                'email_list': email_list,
+                'df_submissions': df_submissions,
+                'prefetched': prefetched
+            }, max_workers=STAGE_WORKERS)
+        except AnalysisCancelled:
+            observe_analysis(run.to_dict()['duration_seconds'], len(email_list), 'cancelled')
+            raise
+        except Exception:
+            observe_analysis(run.to_dict()['duration_seconds'], len(email_list), 'error')
+            raise
+        finally:
+            # Hatalı analizde de rapor yazılır (yavaş sorgu teşhisi için)
+            query_profile = write_query_profile(output_dir, profile) if profile else None
+        metrics = run.to_dict(email_count=len(email_list))
+
+    stats_keys = {'step1': 'stats1', 'step2': 'stats2', 'step3': 'stats3', 'step4': 'stats4'}
+    results = {}
+    for key in RESULT_KEYS:
+        value = context.get(stats_keys.get(key, key))
+        if value is not None:
+            results[key] = value
+
+    # Prepare Final Stats for Frontend
+    stats4 = results['step4']
+    final_stats = {
+        'total_emails': len(email_list),
+        'match_rate': round(stats4.get('REKLAM (Meta)', {}).get('percentage', 0), 1),
+        **{k: v['count'] for k, v in stats4.items()}
+    }
+    results['final_stats'] = final_stats
+    results['pipeline'] = report
+    results['metrics'] = metrics
+    if query_profile:
+        results['query_profile'] = {
+            'queries': query_profile['queries'],
+            'total_ms': query_profile['total_ms'],
+            'slow_queries': query_profile['slow_queries'],
+            'fingerprints': len(query_profile['fingerprints'])
+        }
+
+    # Save Results to JSON file
+    results_file = os.path.join(output_dir, 'results.json')
+    with open(results_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    # Kampanya özeti (liste ve dosya ekranları bunu okur)
+    write_summary(output_dir, results)
+
+    observe_analysis(metrics['duration_seconds'], len(email_list), 'completed')
+    return results
+
+
+def run_batch_analysis(campaigns, upload_folder, output_root, campaign_store, rollup_store=None):
+    """
+    Birden fazla kampanyayı tek veritabanı geçişiyle analiz et
+
+    Kampanyalar 'processing' durumunda gelmelidir; her biri bitince
+    'completed' veya 'error' olarak işaretlenir. Bir kampanyanın hatası
+    diğerlerini durdurmaz; iptal (AnalysisCancelled) batch'i durdurur ve
+    kalan kampanyalar 'processing' durumunda bırakılır (çağıran işaretler).
+
+    Returns:
+        dict: {campaign_id: {'success': bool, 'results' | 'error': ...}}
+    """
+    outcomes = {}
+    customer_data = {}
+
+    for campaign in campaigns:
+        customer_file = os.path.join(upload_folder, campaign.customer_file)
+        try:
+            customer_data[campaign.id] = read_customer_file(customer_file)
+        except Exception as e:
+            print(f"❌ {campaign.id}: {e}")
+            campaign_store.update_status(campaign.id, 'error')
+            outcomes[campaign.id] = {'success': False, 'error': str(e)}
+
+    ready = [c for c in campaigns if c.id in customer_data]
+    if not ready:
+        return outcomes
+
+    # Email birleşimi ve tarih zarfı için tek geçiş
+    all_emails = [email for c in ready for email in customer_data[c.id][2]]
+    start_date = min(c.start_date for c in ready)
+    end_date = max(c.end_date for c in ready)
+
+    print("\n" + "="*80)
+    print(f"📦 BATCH ANALİZ: {len(ready)} kampanya")
+    print(f"📧 Toplam Email: {len(all_emails)} (tekil: {len(set(e.strip().lower() for e in map(str, all_emails)))})")
+    print(f"📅 Tarih Zarfı: {start_date} - {end_date}")
+    print("="*80)
+
+    try:
+        df_submissions = fetch_form_submissions(all_emails, start_date, end_date)
+    except Exception as e:
+        for campaign in ready:
+            campaign_store.update_status(campaign.id, 'error')
+            outcomes[campaign.id] = {'success': False, 'error': str(e)}
+        return outcomes
+
+    for campaign in ready:
+        print(f"\n📁 Kampanya: {campaign.name} ({campaign.id})")
+        try:
+            results = run_analysis(
+                campaign,
+                os.path.join(upload_folder, campaign.customer_file),
+                campaign_output_dir(output_root, campaign.id),
+                rollup_store=rollup_store,
+                customer_data=customer_data[campaign.id],
+                df_submissions=df_submissions
+            )
+            campaign_store.update_status(campaign.id, 'completed')
+            outcomes[campaign.id] = {'success': True, 'results': results}
+        except Exception as e:
+            print(f"❌ {campaign.id}: {e}")
+            campaign_store.update_status(campaign.id, 'error')
+            outcomes[campaign.id] = {'success': False, 'error': str(e)}
+
+    print(f"\n=== BATCH TAMAMLANDI: {sum(o['success'] for o in outcomes.values())}/{len(campaigns)} başarılı ===\n")
+    return outcomes
@@ -0,0 +1,220 @@
+"""
+Sorgu Servisi
+Kanonik analiz sonucu üzerinde filtreleme, sıralama, sütun seçimi ve
+keyset sayfalama. Sonuç tablosu bir kez okunup bellekte (LRU) tutulur;
+sorgular vektörel maske + önbelleklenmiş sıralama dizileri ile cevaplanır.
+"""
+
+import json
+import base64
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from app.services.export_service import load_result, result_signature
+from app.utils.metrics import record_cache
+
+ROW_ID_COLUMN = '_row_id'
+FILTER_COLUMNS = ['kategori', 'durum', 'utm_source']
+SEARCH_COLUMN = 'email'
+MAX_CACHED_TABLES = 4
+
+
+class QueryError(ValueError):
+    """Geçersiz sorgu parametresi"""
+
+
+class _ResultTable:
+    """Bellekteki sonuç tablosu ve ona ait sıralama/arama önbellekleri"""
+
+    def __init__(self, df):
+        df = df.reset_index(drop=True)
+        self.columns = [c for c in df.columns if c != ROW_ID_COLUMN]
+        self.df = df
+        self.row_ids = np.arange(len(df))
+
+        # Düşük kardinaliteli filtre sütunları: kategorik (isin kod üzerinden çalışır)
+        self.filter_values = {}
+        for col in FILTER_COLUMNS:
+            if col in df.columns:
+                self.filter_values[col] = df[col].astype('category')
+
+        self.search_values = None
+        if SEARCH_COLUMN in df.columns:
+            self.search_values = pa.array(df[SEARCH_COLUMN].astype(str).str.lower(), type=pa.string())
+
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    def order(self, column, descending):
+        """
+        Sütuna göre sıralı satır ID'leri ve her satırın sıradaki pozisyonu.
+        Eşit değerlerde satır ID'si belirleyicidir; boşlar her zaman sonda.
+        """
+        key = (column, descending)
+        with self._lock:
+            cached = self._orders.get(key)
+        record_cache('query_order', cached is not None)
+        if cached is not None:
+            return cached
+
+        values = self.df[column]
+        if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) != 'string':
+            values = values.map(lambda x: str(x) if pd.notna(x) else None)
+        # Sıralı factorize: kod sırası değer sırasıdır, boşlar -1
+        codes, _ = pd.factorize(values, sort=True)
+        sort_key = np.where(codes < 0, np.iinfo(np.int64).max, -codes if descending else codes)
+        ordered = np.lexsort((self.row_ids, sort_key))
+
+        rank = np.empty(len(ordered), dtype=np.int64)
+        rank[ordered] = np.arange(len(ordered))
+
+        with self._lock:
+            self._orders[key] = (ordered, rank)
+        return ordered, rank
+
+
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+
+
+def get_table(output_dir):
+    """Kampanyanın sonuç tablosunu önbellekten getir (kaynak değiştiyse yeniden yükle)"""
+    signature = result_signature(output_dir)
+    if signature is None:
+        return None
+
+    key = (output_dir, signature)
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is not None:
+            _tables.move_to_end(key)
+    record_cache('query_table', table is not None)
+    if table is not None:
+        return table
+
+    df = load_result(output_dir)
+    if df is None:
+        return None
+    table = _ResultTable(df)
+
+    with _tables_lock:
+        # Aynı kampanyanın eski sürümlerini at
+        for old_key in [k for k in _tables if k[0] == output_dir]:
+            del _tables[old_key]
+        _tables[key] = table
+        while len(_tables) > MAX_CACHED_TABLES:
+            _tables.popitem(last=False)
+    return table
+
+
+def encode_cursor(sort, descending, row_id):
+    payload = json.dumps({'s': sort, 'd': descending, 'r': int(row_id)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return payload['s'], bool(payload['d']), int(payload['r'])
+    except (ValueError, KeyError, TypeError):
+        raise QueryError('Geçersiz cursor')
+
+
+def query_result(output_dir, filters=None, search=None, sort=None, descending=False,
+                 columns=None, limit=100, cursor=None):
+    """
+    Sonuç tablosunu sorgula
+
+    Args:
+        output_dir: Kampanya çıktı dizini
+        filters: {sütun: [değerler]} (kategori, durum, utm_source)
+        search: Email içinde aranacak metin (büyük/küçük harf duyarsız)
+        sort: Sıralama sütunu (None: satır sırası)
+        descending: Azalan sıralama
+        columns: Döndürülecek sütunlar (None: hepsi)
+        limit: Sayfa boyutu
+        cursor: Önceki sayfanın next_cursor değeri
+
+    Returns:
+        dict: columns, data, total_rows, matched_rows, next_cursor (None ise veri yok)
+    """
+    table = get_table(output_dir)
+    if table is None:
+        return None
+
+    if columns:
+        unknown = [c for c in columns if c not in table.columns]
+        if unknown:
+            raise QueryError(f"Bilinmeyen sütun: {', '.join(unknown)}")
+    else:
+        columns = table.columns
+
+    if sort is not None and sort not in table.columns:
+        raise QueryError(f"Bilinmeyen sıralama sütunu: {sort}")
+
+    # Filtre maskesi
+    mask = np.ones(len(table), dtype=bool)
+    for col, values in (filters or {}).items():
+        if col not in FILTER_COLUMNS:
+            raise QueryError(f"Bu sütuna göre filtrelenemez: {col}")
+        if not values:
+            continue
+        if col not in table.filter_values:
+            mask[:] = False
+            continue
+        mask &= table.filter_values[col].isin(values).to_numpy()
+
+    if search:
+        if table.search_values is None:
+            mask[:] = False
+        else:
+            matches = pc.match_substring(table.search_values, search.lower())
+            mask &= matches.to_numpy(zero_copy_only=False)
+
+    # Sıralama (önbellekli) ve keyset başlangıcı
+    if sort is None:
+        ordered, rank = table.row_ids, table.row_ids
+    else:
+        ordered, rank = table.order(sort, descending)
+
+    start = 0
+    if cursor:
+        cursor_sort, cursor_desc, cursor_row = decode_cursor(cursor)
+        if cursor_sort != sort or cursor_desc != descending:
+            raise QueryError('Cursor farklı bir sıralamaya ait')
+        if not 0 <= cursor_row < len(table):
+            raise QueryError('Geçersiz cursor')
+        start = rank[cursor_row] + 1
+
+    matched_in_order = ordered[start:][mask[ordered[start:]]]
+    page_ids = matched_in_order[:limit]
+
+    page = table.df.iloc[page_ids][list(columns)]
+    for col in page.columns:
+        if pd.api.types.is_datetime64_any_dtype(page[col]):
+            page[col] = page[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+    page = page.astype(object).where(pd.notna(page), None)
+    data = page.to_dict('records')
+    for record, row_id in zip(data, page_ids):
+        record[ROW_ID_COLUMN] = int(row_id)
+
+    next_cursor = None
+    if len(matched_in_order) > limit:
+        next_cursor = encode_cursor(sort, descending, page_ids[-1])
+
+    return {
+        'columns': list(columns),
+        'data': data,
+        'total_rows': len(table),
+        'matched_rows': int(mask.sum()),
+        'showing': len(data),
+        'next_cursor': next_cursor
+    }
@@ -7,15 +7,24 @@ import pandas as pd
 import sys
 import os
 
-from app.utils.db_connection import DatabaseConnection
+from app.utils.data_source import get_data_source
+from app.utils.cancellation import check_cancelled
 
 
-def enrich_with_ad_details(df_utm_details):
+def _has_adset_id(utm_term):
+    return bool(utm_term) and utm_term not in ('nan', 'None')
+
+
+def enrich_with_ad_details(df_utm_details, source=None):
     """
     3. ADIM: UTM detaylarına Meta reklam bilgilerini ekle
     
+    Adset adları (utm_term = meta_adsets.adset_id) tekil id'ler için tek
+    seferde veri kaynağından alınır.
+    
     Args:
         df_utm_details: process_utm_details'den dönen DataFrame
+        source: Açık DataSource (verilmezse DATA_SOURCE'a göre açılıp kapatılır)
     
     Returns:
         DataFrame: Reklam detayları eklenmiş DataFrame
@@ -33,17 +42,23 @@ def enrich_with_ad_details(df_utm_details):
     df_utm_var = df[df['durum'] == 'UTM VAR'].copy()
     
     if len(df_utm_var) == 0:
+        # Küçük listelerde / örneklemde olağan: sütunlar yine eklenir, sorgu yapılmaz
         print("⚠️  UTM bilgisi olan müşteri yok!")
-        return df
-    
-    print(f"✅ {len(df_utm_var)} müşteri için reklam detayları alınacak")
-    
-    # Database bağlantısı
-    db = DatabaseConnection()
-    if not db.connect():
-        raise Exception("❌ Veritabanına bağlanılamadı! Lütfen bağlantı bilgilerini kontrol edin.")
-    
-    db.create_engine()  # Engine'i oluştur
+    else:
+        print(f"✅ {len(df_utm_var)} müşteri için reklam detayları alınacak")
+    
+    # Veri kaynağından adset adları
+    adset_ids = {str(t).strip() for t in df_utm_var['utm_term']}
+    adset_ids = sorted(t for t in adset_ids if _has_adset_id(t))
+    own_connection = source is None and bool(adset_ids)
+    if own_connection:
+        source = get_data_source()
+        source.open()
+    try:
+        adset_names = source.adset_names(adset_ids) if adset_ids else {}
+    finally:
+        if own_connection:
+            source.close()
     
     # Yeni sütunlar ekle
     df['campaign_name'] = df['utm_campaign']  # Form'dan
@@ -54,36 +69,25 @@ def enrich_with_ad_details(df_utm_details):
     fail_count = 0
     
     for idx, row in df_utm_var.iterrows():
+        check_cancelled()
         email = row['email']
         utm_term = str(row['utm_term']).strip()
         
         print(f"[{idx+1}/{len(df_utm_var)}] {email}... ", end='', flush=True)
         
-        if not utm_term or utm_term == 'nan' or utm_term == 'None':
+        if not _has_adset_id(utm_term):
             print("⚠️  UTM Term boş")
             fail_count += 1
             continue
         
-        # utm_term = meta_adsets.adset_id (numeric)
-        query = f"""
-        SELECT name as adset_name
-        FROM meta_adsets
-        WHERE adset_id = '{utm_term}'
-        LIMIT 1
-        """
-        
-        result = db.execute_query(query)
-        
-        if result and len(result) > 0:
-            df.at[idx, 'adset_name'] = result[0].get('adset_name')
+        if utm_term in adset_names:
+            df.at[idx, 'adset_name'] = adset_names[utm_term]
             print("✅")
             success_count += 1
         else:
             print("❌")
             fail_count += 1
     
-    db.close()
-    
     # utm_term sütununu yeniden adlandır
     df = df.rename(columns={'utm_term': 'utm_term(adset_id)'})
     
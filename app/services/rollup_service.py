@@ -0,0 +1,268 @@
+"""
+Kampanyalar Arası Özet (Rollup) Servisi
+Her kampanyanın analiz sonucu (kampanya, kategori, utm_source, utm_campaign,
+adset_name, gün) kırılımında sayılarak küçük bir SQLite tablosuna yazılır.
+Dashboard sorguları kampanya çıktılarını tekrar okumadan bu tablodan cevaplanır.
+"""
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+ROLLUP_DB_FILENAME = 'rollups.db'
+DIMENSIONS = ['kategori', 'utm_source', 'utm_campaign', 'adset_name', 'day']
+LEGACY_RESULT_PATTERN = '_TUM_KATEGORILER_'
+
+
+def aggregate_rollup(df):
+    """
+    Analiz sonucunu rollup satırlarına indir
+
+    Returns:
+        DataFrame: DIMENSIONS + buyers (her satır bir alıcı/email)
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(index=df.index)
+    for col in DIMENSIONS[:-1]:
+        if col in df.columns:
+            values = df[col].astype(object)
+            frame[col] = values.where(pd.notna(values) & (values.astype(str).str.strip() != ''), None)
+        else:
+            frame[col] = None
+
+    if 'created_at' in df.columns:
+        frame['day'] = pd.to_datetime(df['created_at'], errors='coerce').dt.strftime('%Y-%m-%d')
+    else:
+        frame['day'] = None
+    frame = frame.astype(object).where(pd.notna(frame), None)
+
+    rollup = frame.groupby(DIMENSIONS, dropna=False, sort=False).size().reset_index(name='buyers')
+    return rollup.astype(object).where(pd.notna(rollup), None)
+
+
+def _legacy_result_csv(output_dir):
+    """Parquet sonucu olmayan eski kampanyaların son analiz CSV'si"""
+    if not os.path.isdir(output_dir):
+        return None
+    files = sorted(
+        (f for f in os.listdir(output_dir) if LEGACY_RESULT_PATTERN in f and f.endswith('.csv')),
+        reverse=True
+    )
+    return os.path.join(output_dir, files[0]) if files else None
+
+
+def load_rollup_source(output_dir):
+    """
+    Rollup için kampanya sonucunu ve imzasını oku (parquet + düzenlemeler, yoksa eski CSV)
+
+    Returns:
+        tuple: (DataFrame, signature) veya (None, None)
+    """
+    import pandas as pd
+    from app.services.export_service import load_result, result_signature
+
+    signature = result_signature(output_dir)
+    if signature is not None:
+        return load_result(output_dir), signature
+
+    legacy = _legacy_result_csv(output_dir)
+    if legacy is None:
+        return None, None
+    st = os.stat(legacy)
+    usecols = lambda col: col in DIMENSIONS or col == 'created_at'
+    df = pd.read_csv(legacy, usecols=usecols, encoding='utf-8-sig')
+    return df, f"{os.path.basename(legacy)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class RollupStore:
+    """
+    Kampanya rollup'larının SQLite deposu (campaigns.db ile aynı dizinde).
+    Bir kampanyanın satırları tek transaction içinde silinip yeniden yazılır;
+    diğer kampanyalara dokunulmaz.
+    """
+
+    def __init__(self, store_path='data/campaigns'):
+        os.makedirs(store_path, exist_ok=True)
+        self.db_path = os.path.join(store_path, ROLLUP_DB_FILENAME)
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA busy_timeout = 30000')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS rollup_campaigns (
+                    campaign_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    created_at TEXT NOT NULL,
+                    total_buyers INTEGER NOT NULL,
+                    source_signature TEXT,
+                    updated_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_rollup_campaigns_created_at
+                    ON rollup_campaigns (created_at DESC);
+                CREATE TABLE IF NOT EXISTS rollup_rows (
+                    campaign_id TEXT NOT NULL,
+                    kategori TEXT,
+                    utm_source TEXT,
+                    utm_campaign TEXT,
+                    adset_name TEXT,
+                    day TEXT,
+                    buyers INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_rollup_rows_campaign ON rollup_rows (campaign_id);
+            """)
+
+    def signature(self, campaign_id):
+        """Kampanyanın rollup'ı hangi sonuçtan üretildi (yoksa None)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT source_signature FROM rollup_campaigns WHERE campaign_id = ?", (campaign_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def replace_campaign(self, campaign, rollup, signature=None):
+        """Kampanyanın rollup satırlarını değiştir"""
+        rows = [(campaign.id, *values) for values in rollup[DIMENSIONS + ['buyers']].itertuples(index=False)]
+        total = int(rollup['buyers'].sum()) if len(rollup) else 0
+
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute("DELETE FROM rollup_rows WHERE campaign_id = ?", (campaign.id,))
+                conn.executemany(
+                    f"INSERT INTO rollup_rows (campaign_id, {', '.join(DIMENSIONS)}, buyers) "
+                    f"VALUES ({', '.join('?' * (len(DIMENSIONS) + 2))})",
+                    [(cid, *dims[:-1], int(dims[-1])) for cid, *dims in rows]
+                )
+                conn.execute(
+                    "INSERT INTO rollup_campaigns (campaign_id, name, created_at, total_buyers, source_signature, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(campaign_id) DO UPDATE SET name = excluded.name, created_at = excluded.created_at, "
+                    "total_buyers = excluded.total_buyers, source_signature = excluded.source_signature, "
+                    "updated_at = excluded.updated_at",
+                    (campaign.id, campaign.name, campaign.created_at.isoformat(), total,
+                     signature, datetime.now().isoformat())
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def top(self, group_by=('adset_name',), last=10, kategori=None, utm_source=None, limit=20):
+        """
+        Son N kampanyada kırılım bazında alıcı sayıları
+
+        Args:
+            group_by: DIMENSIONS içinden gruplanacak sütunlar
+            last: Dahil edilecek en yeni kampanya sayısı
+            kategori, utm_source: Opsiyonel filtre listeleri
+
+        Returns:
+            dict: campaigns, total_buyers, rows [{...group_by, buyers, campaigns, share}]
+        """
+        group_by = list(group_by)
+        params = [last]
+        where = []
+        for col, values in (('kategori', kategori), ('utm_source', utm_source)):
+            if values:
+                where.append(f"r.{col} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ''
+        dims_sql = ', '.join(f"r.{col}" for col in group_by)
+
+        with self._connect() as conn:
+            conn.execute('BEGIN')
+            try:
+                recent = conn.execute(
+                    "SELECT campaign_id, name, created_at, total_buyers FROM rollup_campaigns "
+                    "ORDER BY created_at DESC LIMIT ?", (last,)
+                ).fetchall()
+                rows = conn.execute(
+                    f"""
+                    WITH recent AS (
+                        SELECT campaign_id FROM rollup_campaigns ORDER BY created_at DESC LIMIT ?
+                    )
+                    SELECT {dims_sql}, SUM(r.buyers) AS buyers, COUNT(DISTINCT r.campaign_id) AS campaigns
+                    FROM rollup_rows r JOIN recent USING (campaign_id)
+                    {where_sql}
+                    GROUP BY {dims_sql}
+                    ORDER BY buyers DESC
+                    LIMIT ?
+                    """,
+                    (*params, limit)
+                ).fetchall()
+            finally:
+                conn.execute('COMMIT')
+
+        total = sum(row['total_buyers'] for row in recent)
+        return {
+            'campaigns': [dict(row) for row in recent],
+            'total_buyers': total,
+            'rows': [
+                {**dict(row), 'share': round(row['buyers'] / total * 100, 1) if total else 0}
+                for row in rows
+            ]
+        }
+
+
+def refresh_campaign_rollup(store, campaign, output_dir, force=True):
+    """
+    Kampanyanın rollup'ını sonucundan yeniden üret
+
+    Args:
+        force: False ise kaynak imzası değişmediyse atlanır
+
+    Returns:
+        bool: Rollup yazıldı mı
+    """
+    from app.services.export_service import result_signature
+
+    if not force:
+        signature = result_signature(output_dir)
+        if signature is not None and store.signature(campaign.id) == signature:
+            return False
+
+    df, signature = load_rollup_source(output_dir)
+    if df is None:
+        return False
+
+    store.replace_campaign(campaign, aggregate_rollup(df), signature)
+    return True
+
+
+def backfill_rollups(store, campaign_store, output_root, force=False):
+    """
+    Tamamlanmış tüm kampanyaların rollup'larını mevcut çıktılarından doldur
+
+    Returns:
+        dict: updated, skipped, failed
+    """
+    print("\n📊 Rollup backfill başlıyor...")
+    summary = {'updated': 0, 'skipped': 0, 'failed': 0}
+
+    for campaign in campaign_store.list_page(status='completed'):
+        output_dir = os.path.join(output_root, 'final', campaign.id)
+        try:
+            if refresh_campaign_rollup(store, campaign, output_dir, force=force):
+                summary['updated'] += 1
+            else:
+                summary['skipped'] += 1
+        except Exception as e:
+            print(f"   ❌ {campaign.id}: {e}")
+            summary['failed'] += 1
+
+    print(f"   ✅ {summary['updated']} güncellendi, {summary['skipped']} atlandı, {summary['failed']} hata")
+    return summary
@@ -0,0 +1,717 @@
+"""
+Analiz Zamanlayıcı (Scheduler)
+/analyze istekleri analizi doğrudan çalıştırmaz; işi kuyruğa alır. Kuyruk
+data/campaigns/jobs.db'dedir, böylece tüm gunicorn worker'ları aynı kuyruğu
+ve aynı sınırları görür. Her worker'daki dağıtıcı thread boş yer oldukça
+sıradaki işi atomik olarak alır (BEGIN IMMEDIATE) ve çalıştırır.
+
+Kurallar:
+- Genel üst sınır: aynı anda en fazla ANALYSIS_MAX_CONCURRENT analiz
+  (her biri kendi veritabanı bağlantısını / SSH tunnel'ını açar)
+- Küçük işlere ayrılmış yer: büyük işler (ANALYSIS_SMALL_JOB_EMAILS üstü)
+  en fazla sınır - ANALYSIS_SMALL_SLOTS yeri kullanır; hızlı kontroller 100k
+  emaillik bir backfill'in arkasında beklemez
+- Kullanıcılar arası adalet (round-robin): sıradaki iş, çalışan işi en az olan
+  ve en uzun süredir iş başlatılmamış kullanıcıdan seçilir
+- Kullanıcının kendi kuyruğunda küçük işler önce, sonra geliş sırası; uzun
+  süre (LARGE_JOB_AGING_SECONDS) bekleyen büyük iş küçük sayılır
+- Kabul kontrolü: kuyruk doluysa iş reddedilir; kabul edilen işe tahmini sıra
+  ve başlama zamanı döner (geçmiş işlerin email başına süresinden)
+
+İptal ve izleme:
+- Sıradaki iş iptal edilince hemen 'cancelled' olur; çalışan iş için iptal
+  isteği kaydedilir, işi çalıştıran süreç bunu görüp belirteci (CancelToken)
+  iptal eder ve pipeline ilk kontrol noktasında durur
+- Çalışan işler ANALYSIS_HEARTBEAT_SECONDS'da bir heartbeat yazar; worker
+  ölürse (heartbeat ANALYSIS_HEARTBEAT_TIMEOUT'tan eski) iş herhangi bir
+  sürecin izleyicisi (watchdog) tarafından 'error' yapılır
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from app.utils.cancellation import AnalysisCancelled, CancelToken, cancellation_scope
+
+JOBS_DB_FILENAME = 'jobs.db'
+
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_SMALL_JOB_EMAILS = 5000
+DEFAULT_SMALL_SLOTS = 1
+DEFAULT_MAX_QUEUE = 50
+DEFAULT_MAX_QUEUED_PER_USER = 10
+LARGE_JOB_AGING_SECONDS = 900
+POLL_SECONDS = 1.0
+DEFAULT_HEARTBEAT_SECONDS = 10
+DEFAULT_HEARTBEAT_TIMEOUT = 120
+
+# Süre tahmini: geçmiş yoksa bu değerler, varsa son HISTORY_JOBS işin oranı
+JOB_OVERHEAD_SECONDS = 5.0
+DEFAULT_SECONDS_PER_EMAIL = 0.002
+HISTORY_JOBS = 50
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+class QueueFullError(Exception):
+    """Kuyruk (veya kullanıcının kuyruğu) dolu; retry_after saniye sonra tekrar denenebilir"""
+
+    def __init__(self, message, retry_after=None, per_user=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.per_user = per_user
+
+
+class SchedulerConfig:
+    """Zamanlayıcı sınırları (ortam değişkenlerinden)"""
+
+    def __init__(self, max_concurrent=None, small_job_emails=None, small_slots=None,
+                 max_queue=None, max_queued_per_user=None, heartbeat_seconds=None, heartbeat_timeout=None):
+        self.max_concurrent = max(1, max_concurrent or _env_int('ANALYSIS_MAX_CONCURRENT', DEFAULT_MAX_CONCURRENT))
+        self.small_job_emails = small_job_emails or _env_int('ANALYSIS_SMALL_JOB_EMAILS', DEFAULT_SMALL_JOB_EMAILS)
+        small_slots = _env_int('ANALYSIS_SMALL_SLOTS', DEFAULT_SMALL_SLOTS) if small_slots is None else small_slots
+        # Tek yer varsa ayrılamaz
+        self.small_slots = min(max(0, small_slots), self.max_concurrent - 1)
+        self.max_queue = max_queue or _env_int('ANALYSIS_MAX_QUEUE', DEFAULT_MAX_QUEUE)
+        self.max_queued_per_user = max_queued_per_user or _env_int('ANALYSIS_MAX_QUEUED_PER_USER',
+                                                                   DEFAULT_MAX_QUEUED_PER_USER)
+        self.heartbeat_seconds = max(1, heartbeat_seconds or _env_int('ANALYSIS_HEARTBEAT_SECONDS',
+                                                                      DEFAULT_HEARTBEAT_SECONDS))
+        # Birkaç heartbeat kaçırılmadan iş ölü sayılmasın
+        self.heartbeat_timeout = max(3 * self.heartbeat_seconds,
+                                     heartbeat_timeout or _env_int('ANALYSIS_HEARTBEAT_TIMEOUT',
+                                                                   DEFAULT_HEARTBEAT_TIMEOUT))
+
+    @property
+    def large_slots(self):
+        return self.max_concurrent - self.small_slots
+
+    def to_dict(self):
+        return {
+            'max_concurrent': self.max_concurrent,
+            'small_job_emails': self.small_job_emails,
+            'small_slots': self.small_slots,
+            'max_queue': self.max_queue,
+            'max_queued_per_user': self.max_queued_per_user,
+            'heartbeat_seconds': self.heartbeat_seconds,
+            'heartbeat_timeout': self.heartbeat_timeout
+        }
+
+
+def is_small(job, config):
+    return job['size'] <= config.small_job_emails
+
+
+def _ordered_small(job, config, now):
+    """Kullanıcı kuyruğunda önce mi (küçük iş veya uzun süredir bekleyen büyük iş)"""
+    return is_small(job, config) or now - job['enqueued_at'] >= LARGE_JOB_AGING_SECONDS
+
+
+def pick_next(queued, running, last_started, config, now):
+    """
+    Boş bir yer için sıradaki işi seç (kuyruk ve plan simülasyonu aynı kuralı kullanır)
+
+    Args:
+        queued: Bekleyen işler [{'id', 'user_id', 'size', 'enqueued_at'}]
+        running: Çalışan işler [{'user_id', 'size'}]
+        last_started: {user_id: son iş başlatma zamanı}
+
+    Returns:
+        dict | None: Seçilen iş; yer yoksa veya uygun iş yoksa None
+    """
+    if len(running) >= config.max_concurrent or not queued:
+        return None
+
+    large_running = sum(1 for job in running if not is_small(job, config))
+    if large_running >= config.large_slots:
+        eligible = [job for job in queued if is_small(job, config)]
+    else:
+        eligible = queued
+    if not eligible:
+        return None
+
+    by_user = {}
+    for job in eligible:
+        by_user.setdefault(job['user_id'], []).append(job)
+    running_by_user = {}
+    for job in running:
+        running_by_user[job['user_id']] = running_by_user.get(job['user_id'], 0) + 1
+
+    user = min(by_user, key=lambda u: (
+        running_by_user.get(u, 0),
+        last_started.get(u, 0.0),
+        min(job['enqueued_at'] for job in by_user[u])
+    ))
+    return min(by_user[user], key=lambda job: (
+        0 if _ordered_small(job, config, now) else 1,
+        job['enqueued_at']
+    ))
+
+
+class JobQueue:
+    """
+    Analiz işlerinin SQLite kuyruğu (campaigns.db ile aynı dizinde).
+    Bütün durum geçişleri tek ifadelik veya BEGIN IMMEDIATE transaction'larıdır;
+    birden fazla süreç aynı kuyruğu güvenle paylaşır.
+    """
+
+    def __init__(self, store_path='data/campaigns', config=None):
+        os.makedirs(store_path, exist_ok=True)
+        self.db_path = os.path.join(store_path, JOBS_DB_FILENAME)
+        self.config = config or SchedulerConfig()
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA busy_timeout = 30000')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS analysis_jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    campaign_id TEXT,
+                    payload TEXT,
+                    user_id TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    error TEXT,
+                    heartbeat_at REAL,
+                    cancel_requested_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_status ON analysis_jobs (status, enqueued_at);
+                CREATE INDEX IF NOT EXISTS idx_jobs_campaign ON analysis_jobs (campaign_id, enqueued_at DESC);
+                CREATE INDEX IF NOT EXISTS idx_jobs_user ON analysis_jobs (user_id, started_at DESC);
+            """)
+            # Heartbeat/iptal sütunları olmadan oluşturulmuş kuyruklar
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(analysis_jobs)")}
+            for column in ('heartbeat_at', 'cancel_requested_at'):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE analysis_jobs ADD COLUMN {column} REAL")
+
+    @staticmethod
+    def _row(row):
+        job = dict(row)
+        job['payload'] = json.loads(job['payload']) if job.get('payload') else None
+        return job
+
+    def _active(self, conn):
+        rows = conn.execute(
+            "SELECT * FROM analysis_jobs WHERE status IN ('queued', 'running') ORDER BY enqueued_at"
+        ).fetchall()
+        jobs = [self._row(row) for row in rows]
+        return [j for j in jobs if j['status'] == 'queued'], [j for j in jobs if j['status'] == 'running']
+
+    def _last_started(self, conn, users):
+        if not users:
+            return {}
+        users = list(users)
+        rows = conn.execute(
+            f"SELECT user_id, MAX(started_at) FROM analysis_jobs "
+            f"WHERE user_id IN ({', '.join('?' * len(users))}) AND started_at IS NOT NULL GROUP BY user_id",
+            users
+        ).fetchall()
+        return {user: started for user, started in rows}
+
+    def submit(self, user_id, size, campaign_id=None, kind='analyze', payload=None):
+        """
+        İşi kuyruğa al (kabul kontrolüyle)
+
+        Raises:
+            QueueFullError: Kuyruk veya kullanıcının kuyruğu dolu
+
+        Returns:
+            dict: İş + tahmini sıra / başlama zamanı (bkz. plan)
+        """
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._transaction() as conn:
+            queued, _ = self._active(conn)
+            if len(queued) >= self.config.max_queue:
+                raise QueueFullError('Analiz kuyruğu dolu, lütfen daha sonra tekrar deneyin',
+                                     retry_after=self._retry_after(conn))
+            if sum(1 for job in queued if job['user_id'] == user_id) >= self.config.max_queued_per_user:
+                raise QueueFullError('Sırada bekleyen analiz sayınız sınırda',
+                                     retry_after=self._retry_after(conn), per_user=True)
+            conn.execute(
+                "INSERT INTO analysis_jobs (id, kind, campaign_id, payload, user_id, size, status, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, kind, campaign_id, json.dumps(payload) if payload is not None else None,
+                 user_id, int(size), now)
+            )
+        return self.get(job_id)
+
+    def _retry_after(self, conn):
+        """Kuyruk doluyken: en erken bitmesi beklenen çalışan işe kadar (sn)"""
+        _, running = self._active(conn)
+        now = time.time()
+        rate = self._seconds_per_email(conn)
+        remaining = [max(1.0, job['started_at'] + self._estimate(job, rate) - now) for job in running]
+        return int(min(remaining)) if remaining else int(POLL_SECONDS) + 1
+
+    def claim(self, owner):
+        """
+        Yer varsa sıradaki işi al ve 'running' yap
+
+        Returns:
+            dict | None
+        """
+        # Kuyruk boşken yazma kilidi alınmasın
+        with self._connect() as conn:
+            if not conn.execute("SELECT 1 FROM analysis_jobs WHERE status = 'queued' LIMIT 1").fetchone():
+                return None
+
+        now = time.time()
+        with self._transaction() as conn:
+            queued, running = self._active(conn)
+            last_started = self._last_started(conn, {job['user_id'] for job in queued})
+            job = pick_next(queued, running, last_started, self.config, now)
+            if job is None:
+                return None
+            conn.execute(
+                "UPDATE analysis_jobs SET status = 'running', started_at = ?, heartbeat_at = ?, owner = ? "
+                "WHERE id = ?",
+                (now, now, owner, job['id'])
+            )
+        job.update(status='running', started_at=now, heartbeat_at=now, owner=owner)
+        return job
+
+    def finish(self, job_id, status, error=None):
+        """
+        Çalışan işi bitir (completed, error, cancelled)
+
+        Returns:
+            bool: İş hâlâ 'running' idiyse True (izleyici bu arada 'error' yaptıysa False)
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE analysis_jobs SET status = ?, finished_at = ?, error = ? "
+                "WHERE id = ? AND status = 'running'",
+                (status, time.time(), error, job_id)
+            )
+        return cursor.rowcount == 1
+
+    def cancel(self, job_id):
+        """
+        İşi iptal et: sıradaysa hemen 'cancelled', çalışıyorsa iptal isteği kaydedilir
+
+        Returns:
+            str | None: 'cancelled', 'requested' veya iş aktif değilse None
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row['status'] not in ACTIVE_STATUSES:
+                return None
+            if row['status'] == 'queued':
+                conn.execute(
+                    "UPDATE analysis_jobs SET status = 'cancelled', finished_at = ?, cancel_requested_at = ?, "
+                    "error = 'İptal edildi' WHERE id = ?",
+                    (now, now, job_id)
+                )
+                return 'cancelled'
+            conn.execute(
+                "UPDATE analysis_jobs SET cancel_requested_at = COALESCE(cancel_requested_at, ?) WHERE id = ?",
+                (now, job_id)
+            )
+            return 'requested'
+
+    def heartbeat(self, job_ids):
+        """
+        Çalışan işlerin heartbeat'ini yaz
+
+        Returns:
+            set: Durması gereken işler (iptal istenmiş veya artık 'running' olmayan)
+        """
+        job_ids = list(job_ids)
+        if not job_ids:
+            return set()
+        placeholders = ', '.join('?' * len(job_ids))
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE analysis_jobs SET heartbeat_at = ? WHERE id IN ({placeholders}) AND status = 'running'",
+                [time.time(), *job_ids]
+            )
+        return self.stop_requested(job_ids)
+
+    def stop_requested(self, job_ids):
+        """job_ids içinden iptal istenmiş veya artık 'running' olmayan işler (yalnızca okuma)"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return set()
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id FROM analysis_jobs WHERE id IN ({', '.join('?' * len(job_ids))}) "
+                f"AND (status != 'running' OR cancel_requested_at IS NOT NULL)",
+                job_ids
+            ).fetchall()
+        return {row['id'] for row in rows}
+
+    def reap_stale(self, timeout=None):
+        """
+        Heartbeat'i timeout saniyeden eski çalışan işleri 'error' yap (ölü worker)
+
+        Returns:
+            list: 'error' yapılan işler
+        """
+        timeout = timeout or self.config.heartbeat_timeout
+        now = time.time()
+        with self._connect() as conn:
+            if not conn.execute(
+                "SELECT 1 FROM analysis_jobs WHERE status = 'running' "
+                "AND COALESCE(heartbeat_at, started_at) < ? LIMIT 1", (now - timeout,)
+            ).fetchone():
+                return []
+
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT * FROM analysis_jobs WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < ?",
+                (now - timeout,)
+            ).fetchall()
+            jobs = [self._row(row) for row in rows]
+            for job in jobs:
+                error = f"Heartbeat zaman aşımı ({timeout} sn; worker {job['owner']})"
+                conn.execute(
+                    "UPDATE analysis_jobs SET status = 'error', finished_at = ?, error = ? WHERE id = ?",
+                    (now, error, job['id'])
+                )
+                job.update(status='error', finished_at=now, error=error)
+        return jobs
+
+    def get(self, job_id):
+        """İş (aktifse tahmini sıra ve başlama zamanıyla); yoksa None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._with_plan(self._row(row)) if row else None
+
+    def latest_for_campaign(self, campaign_id, kind='analyze'):
+        """Kampanyanın verilen türdeki son işi (batch işleri dahil değil); yoksa None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM analysis_jobs WHERE campaign_id = ? AND kind = ? ORDER BY enqueued_at DESC LIMIT 1",
+                (campaign_id, kind)
+            ).fetchone()
+        return self._with_plan(self._row(row)) if row else None
+
+    def _with_plan(self, job):
+        if job['status'] in ACTIVE_STATUSES:
+            plan = self.plan()
+            job.update(plan['jobs'].get(job['id'], {}))
+        return job
+
+    def _seconds_per_email(self, conn):
+        rows = conn.execute(
+            "SELECT size, finished_at - started_at FROM analysis_jobs "
+            "WHERE status = 'completed' AND started_at IS NOT NULL AND size > 0 "
+            "ORDER BY finished_at DESC LIMIT ?", (HISTORY_JOBS,)
+        ).fetchall()
+        emails = sum(size for size, _ in rows)
+        seconds = sum(max(0.0, duration - JOB_OVERHEAD_SECONDS) for _, duration in rows)
+        return seconds / emails if emails and seconds else DEFAULT_SECONDS_PER_EMAIL
+
+    @staticmethod
+    def _estimate(job, seconds_per_email):
+        return JOB_OVERHEAD_SECONDS + job['size'] * seconds_per_email
+
+    def plan(self):
+        """
+        Kuyruğun tahmini çalışma planı: çalışan işlerin tahmini bitişleri ve
+        pick_next kuralıyla hangi işin ne zaman başlayacağı simüle edilir
+
+        Returns:
+            dict: {'running', 'queued', 'seconds_per_email',
+                   'jobs': {job_id: {'position', 'eta_seconds', 'estimated_start', 'estimated_seconds'}}}
+        """
+        now = time.time()
+        with self._connect() as conn:
+            queued, running = self._active(conn)
+            last_started = self._last_started(conn, {job['user_id'] for job in queued})
+            rate = self._seconds_per_email(conn)
+
+        jobs = {}
+        # Simülasyondaki çalışan işler: (tahmini bitiş, iş)
+        active = []
+        for job in running:
+            estimate = self._estimate(job, rate)
+            finish = max(now + 1.0, job['started_at'] + estimate)
+            active.append((finish, job))
+            jobs[job['id']] = {
+                'position': 0,
+                'eta_seconds': 0,
+                'estimated_start': datetime.fromtimestamp(job['started_at']).isoformat(),
+                'estimated_seconds': round(estimate, 1),
+                'estimated_finish': datetime.fromtimestamp(finish).isoformat()
+            }
+
+        pending = list(queued)
+        clock = now
+        position = 0
+        while pending:
+            job = pick_next(pending, [j for _, j in active], last_started, self.config, clock)
+            if job is None:
+                if not active:
+                    break
+                # Bir yer boşalana kadar ilerle
+                active.sort(key=lambda item: item[0])
+                clock, _ = active.pop(0)
+                continue
+            position += 1
+            estimate = self._estimate(job, rate)
+            pending.remove(job)
+            active.append((clock + estimate, job))
+            last_started[job['user_id']] = clock
+            jobs[job['id']] = {
+                'position': position,
+                'eta_seconds': round(clock - now),
+                'estimated_start': datetime.fromtimestamp(clock).isoformat(),
+                'estimated_seconds': round(estimate, 1),
+                'estimated_finish': datetime.fromtimestamp(clock + estimate).isoformat()
+            }
+
+        return {
+            'running': len(running),
+            'queued': len(queued),
+            'seconds_per_email': round(rate, 6),
+            'jobs': jobs
+        }
+
+    def snapshot(self):
+        """Kuyruk görünümü: ayarlar + aktif işler (tahmini sırayla)"""
+        plan = self.plan()
+        with self._connect() as conn:
+            queued, running = self._active(conn)
+        active = []
+        for job in running + queued:
+            job.update(plan['jobs'].get(job['id'], {}))
+            active.append(job)
+        active.sort(key=lambda job: (job['status'] != 'running', job.get('position', 0)))
+        return {
+            'config': self.config.to_dict(),
+            'running': plan['running'],
+            'queued': plan['queued'],
+            'seconds_per_email': plan['seconds_per_email'],
+            'jobs': active
+        }
+
+
+class AnalysisScheduler:
+    """
+    Süreç içi dağıtıcı: kuyruktan iş alıp thread'de çalıştırır. Her süreç
+    (gunicorn worker'ı) ilk istekte kendi dağıtıcısını başlatır; fork
+    sonrası yeniden başlatılır. Genel sınırı kuyruk uygular.
+
+    Dağıtıcı ayrıca bu süreçte çalışan işlerin heartbeat'ini yazar, iptal
+    isteklerini yoklar ve ölü worker'ların işlerini 'error' yapar.
+    """
+
+    def __init__(self, queue, runner, poll_seconds=POLL_SECONDS, on_stale=None):
+        """
+        Args:
+            runner: runner(job) işi çalıştırır (iptal için check_cancelled
+                kapsamında); exception fırlatırsa iş 'error', AnalysisCancelled
+                fırlatırsa 'cancelled' olur
+            on_stale: on_stale(job) heartbeat'i kesilip 'error' yapılan her iş için
+        """
+        self.queue = queue
+        self.runner = runner
+        self.poll_seconds = poll_seconds
+        self.on_stale = on_stale
+        self.app = None
+        self.owner = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._tokens = {}  # Bu süreçte çalışan işler: {job_id: CancelToken}
+        self._tokens_pid = None
+        self._tokens_lock = threading.Lock()
+
+    def ensure_started(self, app=None):
+        """
+        Bu süreçte dağıtıcı çalışmıyorsa başlat
+
+        Args:
+            app: Verilirse işler bu Flask uygulamasının bağlamında çalışır
+        """
+        if app is not None:
+            self.app = app
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wake, self._stop = threading.Event(), threading.Event()
+            if self._tokens_pid != self._pid:
+                self._tokens = {}  # Fork öncesi süreçten kalanlar bu süreçte çalışmıyor
+                self._tokens_pid = self._pid
+                # Yorumlayıcı kapanırken (gunicorn worker'ı dahil) non-daemon analiz
+                # thread'leri beklenmeden önce dağıtıcı yeni iş almayı bırakır
+                register_atexit = getattr(threading, '_register_atexit', None)
+                if register_atexit is not None:
+                    register_atexit(self.stop)
+            self.owner = f"{socket.gethostname()}:{self._pid}"
+            threading.Thread(target=self._loop, args=(self._wake, self._stop),
+                             name='analysis-dispatcher', daemon=True).start()
+
+    def stop(self):
+        """
+        Dağıtıcıyı durdur: yeni iş alınmaz, bu süreçte çalışan işler biter
+        (bitene kadar heartbeat'leri yazılır). Sonraki ensure_started
+        yeniden başlatır.
+        """
+        with self._lock:
+            self._stop.set()
+            self._wake.set()
+            self._pid = None
+
+    def submit(self, user_id, size, campaign_id=None, kind='analyze', payload=None):
+        """İşi kuyruğa al ve dağıtıcıyı uyandır (QueueFullError fırlatabilir)"""
+        self.ensure_started()
+        job = self.queue.submit(user_id, size, campaign_id=campaign_id, kind=kind, payload=payload)
+        self._wake.set()
+        return job
+
+    def cancel(self, job_id):
+        """
+        İşi iptal et (bkz. JobQueue.cancel). İş bu süreçte çalışıyorsa
+        belirteç hemen iptal edilir; başka süreçteyse oradaki dağıtıcı
+        iptal isteğini bir sonraki yoklamada görür.
+        """
+        state = self.queue.cancel(job_id)
+        if state == 'requested':
+            self._cancel_local({job_id})
+        return state
+
+    def _cancel_local(self, job_ids, reason='Analiz iptal edildi'):
+        with self._tokens_lock:
+            tokens = [self._tokens[job_id] for job_id in job_ids if job_id in self._tokens]
+        for token in tokens:
+            token.cancel(reason)
+
+    def _maintain(self, heartbeat):
+        """İptal isteklerini yokla; heartbeat=True ise heartbeat yaz ve ölü işleri topla"""
+        with self._tokens_lock:
+            running = list(self._tokens)
+        if heartbeat:
+            self._cancel_local(self.queue.heartbeat(running))
+            for job in self.queue.reap_stale():
+                print(f"💀 Analiz işinin heartbeat'i kesildi: {job['id']} ({job['error']})")
+                if self.on_stale is not None:
+                    try:
+                        self.on_stale(job)
+                    except Exception as e:
+                        print(f"⚠️ {job['id']} kampanya durumu güncellenemedi: {e}")
+        elif running:
+            self._cancel_local(self.queue.stop_requested(running))
+
+    def _draining(self, stop):
+        """Durdurulmuş dağıtıcı, yerine yenisi başlamadıysa çalışan işlere bakmaya devam eder"""
+        with self._tokens_lock:
+            return bool(self._tokens) and self._stop is stop
+
+    def _loop(self, wake, stop):
+        last_heartbeat = 0.0
+        while not stop.is_set() or self._draining(stop):
+            heartbeat = time.monotonic() - last_heartbeat >= self.queue.config.heartbeat_seconds
+            try:
+                self._maintain(heartbeat)
+                if heartbeat:
+                    last_heartbeat = time.monotonic()
+                # Kapanan süreç yalnızca elindeki işleri bitirir
+                job = None if stop.is_set() else self.queue.claim(self.owner)
+            except Exception as e:
+                print(f"⚠️ Analiz kuyruğu okunamadı: {e}")
+                job = None
+            if job is not None:
+                with self._tokens_lock:
+                    self._tokens[job['id']] = CancelToken()
+                # Analiz sürerken worker kapanırsa thread beklenir (daemon değil; açıkça
+                # verilmezse daemon dağıtıcı thread'inden daemon olarak miras alınır)
+                threading.Thread(target=self._run, args=(job,), name=f"analysis-{job['id']}",
+                                 daemon=False).start()
+                continue
+            wake.wait(self.poll_seconds)
+            wake.clear()
+
+    def _run(self, job):
+        started = time.perf_counter()
+        with self._tokens_lock:
+            token = self._tokens.setdefault(job['id'], CancelToken())
+        print(f"▶️ Analiz işi başladı: {job['id']} ({job['kind']}, {job['size']} email, kullanıcı {job['user_id']})")
+        try:
+            with self.app.app_context() if self.app is not None else nullcontext(), cancellation_scope(token):
+                self.runner(job)
+        except AnalysisCancelled as e:
+            self.queue.finish(job['id'], 'cancelled', str(e))
+            print(f"⏹️ Analiz işi iptal edildi: {job['id']} ({time.perf_counter() - started:.1f} sn)")
+        except Exception as e:
+            self.queue.finish(job['id'], 'error', str(e))
+            print(f"❌ Analiz işi hata ile bitti: {job['id']}: {e}")
+        else:
+            self.queue.finish(job['id'], 'completed')
+            print(f"✅ Analiz işi bitti: {job['id']} ({time.perf_counter() - started:.1f} sn)")
+        finally:
+            with self._tokens_lock:
+                self._tokens.pop(job['id'], None)
+            # Boşalan yer için sıradakini hemen al
+            self._wake.set()
+
+
+def job_to_dict(job):
+    """İşin API görünümü (zamanlar ISO formatında)"""
+    if job is None:
+        return None
+    view = {k: job.get(k) for k in ('id', 'kind', 'campaign_id', 'user_id', 'size', 'status', 'error',
+                                     'position', 'eta_seconds', 'estimated_start', 'estimated_seconds',
+                                     'estimated_finish')}
+    if job.get('payload'):
+        view['campaign_ids'] = job['payload'].get('campaign_ids')
+    view['cancel_requested'] = bool(job.get('cancel_requested_at'))
+    for key in ('enqueued_at', 'started_at', 'finished_at', 'heartbeat_at'):
+        view[key] = datetime.fromtimestamp(job[key]).isoformat() if job.get(key) else None
+    return view
+
+
+def count_csv_rows(path):
+    """CSV satır sayısı (başlık hariç; boyut tahmini için, dosyayı parse etmez)"""
+    with open(path, 'rb') as f:
+        lines = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b''))
+    return max(0, lines - 1)
@@ -0,0 +1,142 @@
+"""
+Kampanya Özet Servisi
+Analiz tamamlandığında ve her düzenlemede kampanya özeti (final istatistikler,
+dosya listesi, kalite kontrol durumu) summary.json'a yazılır. Okumalar
+mtime ile doğrulanan süreç içi LRU cache'ten yapılır.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+from collections import OrderedDict
+
+from app.utils.metrics import record_cache
+
+SUMMARY_FILENAME = 'summary.json'
+RESULTS_FILENAME = 'results.json'
+MAX_CACHED_SUMMARIES = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _summary_path(output_dir):
+    return os.path.join(output_dir, SUMMARY_FILENAME)
+
+
+def _load_results(output_dir):
+    path = os.path.join(output_dir, RESULTS_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error reading results.json: {e}")
+        return None
+
+
+def build_summary(output_dir, results=None):
+    """
+    Kampanya özetini oluştur
+
+    Args:
+        output_dir: Kampanya çıktı dizini
+        results: Analiz sonuç dict'i (verilmezse results.json okunur)
+
+    Returns:
+        dict: final_stats, validation, files, version, updated_at, etag
+    """
+    from app.services.export_service import list_exports
+    from app.services.edit_service import current_version
+
+    if results is None:
+        results = _load_results(output_dir) or {}
+
+    summary = {
+        'final_stats': results.get('final_stats'),
+        'validation': results.get('validation'),
+        'files': list_exports(output_dir),
+        'version': current_version(output_dir),
+        'updated_at': datetime.now().isoformat()
+    }
+
+    content = json.dumps(
+        {k: v for k, v in summary.items() if k != 'updated_at'},
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    summary['etag'] = hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]
+    return summary
+
+
+def write_summary(output_dir, results=None):
+    """Özeti oluşturup summary.json'a atomik olarak yaz"""
+    os.makedirs(output_dir, exist_ok=True)
+    summary = build_summary(output_dir, results=results)
+
+    path = _summary_path(output_dir)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+    with _cache_lock:
+        _cache.pop(output_dir, None)
+    return summary
+
+
+def get_summary(output_dir):
+    """
+    Kampanya özetini getir (tek stat + cache).
+    Özet yoksa ama analiz sonucu varsa (eski kampanyalar) bir kez oluşturulur.
+
+    Returns:
+        dict veya None
+    """
+    path = _summary_path(output_dir)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        record_cache('summary', False)
+        if os.path.exists(os.path.join(output_dir, RESULTS_FILENAME)):
+            return write_summary(output_dir)
+        return None
+
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(output_dir)
+        hit = bool(cached and cached[0] == stamp)
+        if hit:
+            _cache.move_to_end(output_dir)
+    record_cache('summary', hit)
+    if hit:
+        return cached[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        summary = json.load(f)
+
+    with _cache_lock:
+        _cache[output_dir] = (stamp, summary)
+        _cache.move_to_end(output_dir)
+        while len(_cache) > MAX_CACHED_SUMMARIES:
+            _cache.popitem(last=False)
+    return summary
+
+
+def mark_file_generated(output_dir, filename, size):
+    """Lazy üretilen bir export'un boyutunu özete işle"""
+    summary = get_summary(output_dir)
+    if summary is None:
+        return
+
+    for file_info in summary['files']:
+        if file_info['filename'] == filename:
+            if file_info.get('size') == size:
+                return
+            break
+    else:
+        return
+
+    write_summary(output_dir)
@@ -8,105 +8,127 @@ import os
 from datetime import datetime
 import sys
 
-# Database bağlantısı
-from app.utils.db_connection import DatabaseConnection
+# Veri kaynağı (DATA_SOURCE: mysql / sqlite)
+from app.utils.data_source import get_data_source, normalize_email, UTM_FIELDS, SUBMISSION_COLUMNS
+from app.utils.cancellation import check_cancelled
 
 
-def collect_utm_data(email_list, start_date, end_date, campaign_id):
+RECORD_COLUMNS = ['email', 'kayit_sayisi', 'durum', 'created_at'] + UTM_FIELDS
+
+# Form kayıtları kaç email'lik gruplar halinde sorgulanır
+EMAIL_CHUNK_SIZE = 500
+
+
+def fetch_form_submissions(email_list, start_date, end_date, source=None, prefetched=None):
     """
-    1. ADIM: Email listesi için veritabanından UTM bilgilerini topla
+    Email listesinin tarih aralığındaki tüm form kayıtlarını veritabanından getir
+    
+    Normalize email'ler EMAIL_CHUNK_SIZE'lık gruplar halinde tek sorguyla
+    istenir; sonuç parça parça (MySQL'de sunucu tarafı cursor ile) tipli
+    DataFrame'ler olarak okunur. Böylece ham satırlar bellekte birikmez.
+    İptal her grup ve her parça arasında kontrol edilir.
+    Dönen her kayıt, eşleştiği normalize email ile (email_key, istenen
+    anahtarlardan biri; bkz. data_source.key_rows) etiketlenir.
     
     Args:
-        email_list: Liste veya email adresleri
-        start_date: Başlangıç tarihi (YYYY-MM-DD)
-        end_date: Bitiş tarihi (YYYY-MM-DD)
-        campaign_id: Kampanya ID (dosya adı için)
+        email_list: Email adresleri
+        start_date, end_date: Tarih aralığı (YYYY-MM-DD)
+        source: Açık DataSource (verilmezse DATA_SOURCE'a göre açılıp kapatılır)
+        prefetched: (normalize email'ler, DataFrame) — aynı aralık için daha
+            önce getirilmiş kayıtlar (örn. hızlı tahmin örneklemi); bu
+            email'ler veritabanına tekrar sorulmaz
     
     Returns:
-        DataFrame: Tüm form kayıtları
+        DataFrame: email_key, created_at, utm_* sütunları (email sırası,
+            email içinde created_at artan)
     """
+    email_keys = list(dict.fromkeys(normalize_email(e) for e in email_list))
     
-    print(f"📂 {len(email_list)} email için UTM bilgileri toplanıyor...")
-    print(f"📅 Tarih Aralığı: {start_date} - {end_date}")
+    frames = []
+    query_keys = email_keys
+    if prefetched is not None:
+        known_keys, df_known = prefetched
+        known = set(known_keys).intersection(email_keys)
+        if known:
+            rows = df_known[df_known['email_key'].isin(known)]
+            if len(rows):
+                frames.append(rows)
+            query_keys = [key for key in email_keys if key not in known]
+            print(f"♻️  {len(known)} email önceden getirilmiş kayıtlardan alındı")
     
-    # Database bağlantısı
-    db = DatabaseConnection()
-    if not db.connect():
-        raise Exception("❌ Veritabanına bağlanılamadı! Lütfen bağlantı bilgilerini kontrol edin.")
+    own_connection = source is None and bool(query_keys)
+    if own_connection:
+        source = get_data_source()
+        source.open()
     
-    db.create_engine()  # Engine'i oluştur
+    try:
+        for offset in range(0, len(query_keys), EMAIL_CHUNK_SIZE):
+            check_cancelled()
+            chunk = query_keys[offset:offset + EMAIL_CHUNK_SIZE]
+            print(f"[{offset + len(chunk)}/{len(query_keys)}] {len(chunk)} email sorgulanıyor... ", end='', flush=True)
+            
+            found = 0
+            for batch in source.fetch_submissions(chunk, start_date, end_date):
+                check_cancelled()
+                found += len(batch)
+                frames.append(batch)
+            print(f"✅ {found} kayıt")
+    finally:
+        if own_connection:
+            source.close()
     
-    all_results = []
+    if not frames:
+        return pd.DataFrame(columns=SUBMISSION_COLUMNS)
     
-    for idx, email in enumerate(email_list, 1):
-        email = str(email).strip()
-        
-        print(f"[{idx}/{len(email_list)}] {email}... ", end='', flush=True)
-        
-        # Bu email için form kayıtlarını getir
-        query = f"""
-        SELECT 
-            email,
-            created_at,
-            utm_source,
-            utm_medium,
-            utm_campaign,
-            utm_content,
-            utm_term
-        FROM iframe_form_submissions
-        WHERE LOWER(TRIM(email)) = LOWER(TRIM('{email}'))
-          AND created_at >= '{start_date} 00:00:00'
-          AND created_at <= '{end_date} 23:59:59'
-        ORDER BY created_at ASC
-        """
-        
-        df_forms = db.query_to_dataframe(query)
-        
-        if df_forms is None or df_forms.empty:
-            print("❌ Kayıt yok")
-            # Kayıt yok da listeye ekle
-            all_results.append({
-                'email': email,
-                'kayit_sayisi': 0,
-                'durum': 'KAYIT YOK',
-                'created_at': None,
-                'utm_source': None,
-                'utm_medium': None,
-                'utm_campaign': None,
-                'utm_content': None,
-                'utm_term': None
-            })
-        else:
-            # Her kaydı ekle
-            for _, row in df_forms.iterrows():
-                # UTM durumu kontrol et
-                has_utm = False
-                utm_fields = ['utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term']
-                
-                for field in utm_fields:
-                    val = row[field]
-                    if pd.notna(val) and str(val).strip() != '' and str(val).strip().lower() != 'nan':
-                        has_utm = True
-                        break
-                
-                all_results.append({
-                    'email': email,
-                    'kayit_sayisi': len(df_forms),
-                    'durum': 'UTM VAR' if has_utm else 'BOŞ',
-                    'created_at': row['created_at'],
-                    'utm_source': row['utm_source'],
-                    'utm_medium': row['utm_medium'],
-                    'utm_campaign': row['utm_campaign'],
-                    'utm_content': row['utm_content'],
-                    'utm_term': row['utm_term']
-                })
-            
-            print(f"✅ {len(df_forms)} kayıt")
+    df_forms = pd.concat(frames, ignore_index=True)
+    
+    # Email sırası, email içinde created_at (stable: sunucu sırası korunur)
+    order = {key: i for i, key in enumerate(email_keys)}
+    df_forms['_order'] = df_forms['email_key'].map(order)
+    df_forms = df_forms.sort_values(['_order', 'created_at'], kind='mergesort')
+    return df_forms.drop(columns=['_order']).reset_index(drop=True)
+
+
+def build_utm_records(email_list, df_submissions, start_date, end_date):
+    """
+    Getirilmiş form kayıtlarından 1. adım çıktısını üret
+    
+    Kayıtlar email'in tarih aralığına göre süzülür; böylece daha geniş bir
+    aralık için bir kez getirilmiş kayıtlar birden fazla kampanyada kullanılabilir.
+    Çıktı, aynı email listesi ve aralık için collect_utm_data ile aynıdır.
+    
+    Returns:
+        tuple: (DataFrame, stats)
+    """
+    window_start = pd.Timestamp(f"{start_date} 00:00:00")
+    window_end = pd.Timestamp(f"{end_date} 23:59:59")
+    
+    forms = df_submissions.copy()
+    forms['created_at'] = pd.to_datetime(forms['created_at'])
+    forms = forms[(forms['created_at'] >= window_start) & (forms['created_at'] <= window_end)]
+    
+    emails = pd.DataFrame({'email': [str(e).strip() for e in email_list]})
+    emails['email_key'] = emails['email'].map(normalize_email)
+    emails['_order'] = range(len(emails))
     
-    db.close()
+    df_results = emails.merge(forms, on='email_key', how='left')
+    df_results = df_results.sort_values(['_order', 'created_at'], kind='mergesort', na_position='last')
     
-    # DataFrame oluştur
-    df_results = pd.DataFrame(all_results)
+    found = df_results['created_at'].notna()
+    counts = df_results[found].groupby('_order').size()
+    df_results['kayit_sayisi'] = df_results['_order'].map(counts).fillna(0).astype(int)
+    
+    # UTM durumu: herhangi bir UTM alanı dolu mu
+    has_utm = pd.Series(False, index=df_results.index)
+    for field in UTM_FIELDS:
+        val = df_results[field].astype(str).str.strip()
+        has_utm |= df_results[field].notna() & (val != '') & (val.str.lower() != 'nan')
+    df_results['durum'] = 'BOŞ'
+    df_results.loc[has_utm, 'durum'] = 'UTM VAR'
+    df_results.loc[~found, 'durum'] = 'KAYIT YOK'
+    
+    df_results = df_results[RECORD_COLUMNS].reset_index(drop=True)
+    df_results[UTM_FIELDS] = df_results[UTM_FIELDS].astype(object).where(df_results[UTM_FIELDS].notna(), None)
     
     # İstatistikler
     total = len(df_results)
@@ -127,6 +149,27 @@ def collect_utm_data(email_list, start_date, end_date, campaign_id):
     return df_results, stats
 
 
+def collect_utm_data(email_list, start_date, end_date, campaign_id):
+    """
+    1. ADIM: Email listesi için veritabanından UTM bilgilerini topla
+    
+    Args:
+        email_list: Liste veya email adresleri
+        start_date: Başlangıç tarihi (YYYY-MM-DD)
+        end_date: Bitiş tarihi (YYYY-MM-DD)
+        campaign_id: Kampanya ID (dosya adı için)
+    
+    Returns:
+        DataFrame: Tüm form kayıtları
+    """
+    
+    print(f"📂 {len(email_list)} email için UTM bilgileri toplanıyor...")
+    print(f"📅 Tarih Aralığı: {start_date} - {end_date}")
+    
+    df_submissions = fetch_form_submissions(email_list, start_date, end_date)
+    return build_utm_records(email_list, df_submissions, start_date, end_date)
+
+
 def process_utm_details(df_all_records):
     """
     2. ADIM: Çoklu kayıtları netleştir, her email için en doğru UTM kaydını seç
@@ -189,10 +232,13 @@ def process_utm_details(df_all_records):
     # Her email için en iyi kaydı seç
     result_list = []
     for email, group in df_all_records.groupby('email'):
+        check_cancelled()
         best_record = select_best_utm_record(group)
         result_list.append(best_record)
     
-    df_result = pd.DataFrame(result_list)
+    # Satırlar grup içi konumlarını index olarak taşır; reklam detayları
+    # index ile yazıldığı için tekil index şart
+    df_result = pd.DataFrame(result_list).reset_index(drop=True)
     
     # İstatistikler
     total = len(df_result)
@@ -0,0 +1,75 @@
+"""
+İşbirlikçi İptal (Cancellation)
+Çalışan bir analiz zorla durdurulmaz; pipeline aşamaları parçalar arasında
+check_cancelled() çağırır ve iptal istenmişse AnalysisCancelled fırlatılır.
+
+Belirteç (CancelToken) metrics.track_run gibi contextvar ile taşınır:
+zamanlayıcı işi cancellation_scope(token) içinde çalıştırır, DAG aşamaları
+çağıranın context kopyasında çalıştığı için aynı belirteci görür. Kapsam
+dışında (CLI, benchmark) check_cancelled() hiçbir şey yapmaz.
+
+AnalysisCancelled, asyncio.CancelledError gibi BaseException'dan türer:
+servislerdeki "except Exception" blokları iptali hata sanıp yutmaz.
+"""
+
+import threading
+import contextvars
+from contextlib import contextmanager
+
+_current_token = contextvars.ContextVar('cancel_token', default=None)
+
+
+class AnalysisCancelled(BaseException):
+    """Analiz iptal edildi (bkz. CancelToken)"""
+
+    def __init__(self, message='Analiz iptal edildi'):
+        super().__init__(message)
+        self.report = None  # run_dag aşama raporu (varsa)
+
+
+class CancelToken:
+    """Thread'ler arası iptal bayrağı"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    def cancel(self, reason='Analiz iptal edildi'):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """İptal istenmişse AnalysisCancelled fırlat"""
+        if self._event.is_set():
+            raise AnalysisCancelled(self.reason)
+
+
+@contextmanager
+def cancellation_scope(token):
+    """Kapsam içindeki (ve DAG aşamalarındaki) check_cancelled() çağrıları token'a bakar"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def current_token():
+    return _current_token.get()
+
+
+def is_cancelled():
+    token = _current_token.get()
+    return token is not None and token.cancelled
+
+
+def check_cancelled():
+    """Aktif belirteç iptal edilmişse AnalysisCancelled fırlat (kapsam dışında no-op)"""
+    token = _current_token.get()
+    if token is not None:
+        token.check()
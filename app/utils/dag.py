@@ -0,0 +1,201 @@
+"""
+Küçük Pipeline DAG Yürütücüsü
+Her aşama (Stage) adını, okuduğu girdileri ve ürettiği çıktıları bildirir.
+Bağımlılıklar girdi/çıktı adlarından çıkarılır; girdileri hazır olan aşamalar
+thread havuzunda eşzamanlı çalışır. Aşama süreleri ve hataları raporlanır.
+Opsiyonel bir aşamanın hatası diğer aşamaların sonuçlarını kaybettirmez;
+ona bağlı aşamalar atlanır. Aşamalar girdilerini değiştirmemelidir; aynı
+nesne eşzamanlı çalışan başka aşamalara da verilir. İptal (bkz. cancellation)
+her aşamanın başında kontrol edilir; iptal edilen aşamadan sonra yeni aşama
+başlatılmaz ve AnalysisCancelled (sarmalanmadan) fırlatılır.
+"""
+
+import time
+import contextvars
+from dataclasses import dataclass, field
+from typing import Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from app.utils.metrics import measure_stage, record_rows
+from app.utils.cancellation import AnalysisCancelled, check_cancelled
+
+
+@dataclass
+class Stage:
+    """
+    Pipeline aşaması
+
+    func, inputs'taki adlarla keyword argüman olarak çağrılır. Tek çıktılı
+    aşamada dönüş değeri, çok çıktılıda tuple sırasıyla çıktılara atanır.
+    """
+    name: str
+    func: Callable
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    optional: bool = False
+    after: Tuple[str, ...] = field(default=())  # Sadece sıralama bağımlılıkları (aşama adları)
+
+
+class StageError(RuntimeError):
+    """Zorunlu bir aşama başarısız oldu veya çalıştırılamadı"""
+
+    def __init__(self, stage, message, report=None):
+        self.stage = stage
+        self.report = report
+        super().__init__(f"{stage}: {message}")
+
+
+def _dependencies(stages, initial):
+    """Her aşamanın bağlı olduğu aşama adları (girdi üreticileri + after)"""
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in producers or output in initial:
+                raise ValueError(f"'{output}' birden fazla kez üretiliyor")
+            producers[output] = stage.name
+
+    names = {stage.name for stage in stages}
+    deps = {}
+    for stage in stages:
+        deps[stage.name] = set(stage.after)
+        for name in stage.after:
+            if name not in names:
+                raise ValueError(f"{stage.name}: bilinmeyen aşama '{name}'")
+        for name in stage.inputs:
+            if name in producers:
+                deps[stage.name].add(producers[name])
+            elif name not in initial:
+                raise ValueError(f"{stage.name}: '{name}' girdisini üreten aşama yok")
+
+    # Döngü kontrolü (Kahn)
+    remaining = {name: set(d) for name, d in deps.items()}
+    while remaining:
+        ready = [name for name, d in remaining.items() if not d]
+        if not ready:
+            raise ValueError(f"Döngüsel bağımlılık: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for d in remaining.values():
+            d.difference_update(ready)
+    return deps
+
+
+def _rows(value):
+    """DataFrame benzeri değerlerin satır sayısı (diğerleri 0)"""
+    return len(value) if hasattr(value, 'columns') else 0
+
+
+def _run_stage(stage, context):
+    check_cancelled()
+    inputs = {name: context[name] for name in stage.inputs}
+    with measure_stage(stage.name) as stats:
+        value = stage.func(**inputs)
+    outputs = value if len(stage.outputs) > 1 else (value,)
+    stats['rows_in'] = sum(_rows(v) for v in inputs.values())
+    stats['rows_out'] = sum(_rows(v) for v in outputs)
+    record_rows(stage.name, stats['rows_in'], stats['rows_out'])
+    return value, stats
+
+
+def run_dag(stages, context=None, max_workers=4):
+    """
+    Aşamaları bağımlılık sırasıyla, bağımsız olanları eşzamanlı çalıştır
+
+    Args:
+        stages: Stage listesi
+        context: Başlangıç değerleri (ad → değer)
+        max_workers: Thread havuzu boyutu
+
+    Returns:
+        tuple: (context, report)
+            report: {'stages': {ad: {'status', 'seconds', 'error'?, ...}}, 'total_seconds'}
+            status: ok, failed, skipped, cancelled. Başarılı aşamalarda ayrıca cpu_seconds,
+            rows_in, rows_out, db_queries, db_seconds, peak_rss_mb (bkz. metrics)
+
+    Raises:
+        StageError: Zorunlu bir aşama başarısız olduysa (çalışan aşamalar bitince)
+        AnalysisCancelled: Bir aşama iptal edildiyse (çalışan aşamalar bitince)
+    """
+    context = dict(context or {})
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Aşama adları tekil olmalı")
+    deps = _dependencies(stages, context)
+
+    report = {'stages': {}, 'total_seconds': 0.0}
+    started = time.perf_counter()
+    pending = [stage.name for stage in stages]
+    running = {}
+    failure = None
+
+    def finish(name, status, stats=None, error=None):
+        stats = dict(stats or {})
+        seconds = stats.pop('seconds', None)
+        entry = {'status': status, 'seconds': round(seconds, 3) if seconds is not None else None, **stats}
+        if error is not None:
+            entry['error'] = error
+        report['stages'][name] = entry
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # Bağımlılığı başarısız/atlanmış aşamaları (zincirleme) atla
+            changed = True
+            while changed:
+                changed = False
+                for name in list(pending):
+                    blocked = sorted(d for d in deps[name]
+                                     if report['stages'].get(d, {}).get('status') in ('failed', 'skipped'))
+                    if blocked:
+                        pending.remove(name)
+                        changed = True
+                        message = f"bağımlılık tamamlanmadı: {', '.join(blocked)}"
+                        finish(name, 'skipped', error=message)
+                        if not by_name[name].optional and failure is None:
+                            failure = StageError(name, message)
+
+            if failure is None:
+                for name in list(pending):
+                    if all(report['stages'].get(d, {}).get('status') == 'ok' for d in deps[name]):
+                        pending.remove(name)
+                        # Her aşama çağıranın context kopyasında (metrik kapsamı taşınır)
+                        ctx = contextvars.copy_context()
+                        running[pool.submit(ctx.run, _run_stage, by_name[name], context)] = name
+
+            if not running:
+                # Zorunlu hata sonrası kalan aşamalar çalıştırılmaz
+                for name in pending:
+                    finish(name, 'skipped', error='pipeline durduruldu')
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                stage = by_name[name]
+                try:
+                    value, stats = future.result()
+                except AnalysisCancelled as e:
+                    finish(name, 'cancelled', error=str(e))
+                    if not isinstance(failure, AnalysisCancelled):
+                        failure = e
+                    continue
+                except Exception as e:
+                    finish(name, 'failed', error=str(e))
+                    if stage.optional:
+                        print(f"⚠️  {name} aşaması başarısız: {e}")
+                    elif failure is None:
+                        failure = StageError(name, str(e))
+                        failure.__cause__ = e
+                    continue
+
+                if len(stage.outputs) == 1:
+                    context[stage.outputs[0]] = value
+                elif stage.outputs:
+                    for output, item in zip(stage.outputs, value):
+                        context[output] = item
+                finish(name, 'ok', stats)
+
+    report['total_seconds'] = round(time.perf_counter() - started, 3)
+    if failure is not None:
+        failure.report = report
+        raise failure
+    return context, report
@@ -0,0 +1,381 @@
+"""
+Veri Kaynağı Arayüzü
+Pipeline'ın veritabanından ihtiyaç duyduğu iki işlem: tarih aralığındaki form
+kayıtları ve adset adları. DATA_SOURCE ile seçilir:
+- mysql (varsayılan): SSH + MySQL (DatabaseConnection)
+- sqlite: DATA_SOURCE_PATH'teki yerel dosya (aynı tablo ve sütunlarla);
+  üretim bilgileri olmadan geliştirme, test ve ölçüm için
+"""
+
+import os
+import time
+import sqlite3
+import unicodedata
+
+from app.utils.db_connection import DatabaseConnection, statement_timeout_setting
+from app.utils.metrics import record_query
+from app.utils.query_profile import active_profile
+from app.utils.cancellation import AnalysisCancelled, current_token, check_cancelled
+
+UTM_FIELDS = ['utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term']
+SUBMISSION_COLUMNS = ['email_key', 'created_at'] + UTM_FIELDS
+SUBMISSION_DTYPES = {'created_at': 'datetime64[ns]', **{field: object for field in UTM_FIELDS}}
+
+DEFAULT_SQLITE_PATH = 'data/source.db'
+
+# Adset adları kaç id'lik gruplar halinde sorgulanır
+ADSET_CHUNK_SIZE = 500
+
+# SQLite sorgusu kaç VM adımında bir süre sınırı / iptal için yoklanır
+SQLITE_PROGRESS_STEPS = 10000
+
+
+def normalize_email(email):
+    """Eşleştirme anahtarı (strip + lower); istenen ve dönen email'ler aynı fonksiyonla anahtarlanır"""
+    return str(email).strip().lower()
+
+
+def _fold_email(email):
+    """Büyük/küçük harf ve aksan duyarsız anahtar (MySQL *_ci collation'larına yakın)"""
+    text = unicodedata.normalize('NFKD', str(email).strip())
+    return ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+def _sqlite_email_key(email):
+    """SQLite'a kayıtlı normalize_email (SQLite'ın LOWER()'ı yalnızca ASCII küçültür)"""
+    return None if email is None else normalize_email(email)
+
+
+def key_rows(batch, email_keys):
+    """
+    Dönen kayıtları (ham 'email' sütunu) istenen normalize email'lere bağla
+
+    MySQL sorgusu LOWER(TRIM(email)) ile ve collation kurallarıyla eşleşir; bu,
+    Python'un lower()'ından farklı olabilir (ör. 'İ'). Önce aynı
+    normalizasyon, tutmazsa harf/aksan duyarsız karşılaştırma denenir.
+
+    Returns:
+        DataFrame: SUBMISSION_COLUMNS (hiçbir isteğe bağlanamayan satırlar atılır)
+    """
+    requested = set(email_keys)
+    keys = batch['email'].astype(str).str.strip().str.lower()
+    unmatched = ~keys.isin(requested)
+    if unmatched.any():
+        folded = {}
+        for key in email_keys:
+            folded.setdefault(_fold_email(key), key)
+        keys = keys.where(~unmatched, batch['email'].map(lambda e: folded.get(_fold_email(e))))
+    batch = batch.assign(email_key=keys)
+    return batch[batch['email_key'].notna()][SUBMISSION_COLUMNS]
+
+
+def _window(start_date, end_date):
+    return f"{start_date} 00:00:00", f"{end_date} 23:59:59"
+
+
+class DataSource:
+    """
+    Veri kaynağı temel sınıfı. Bağlam yöneticisi olarak açılır:
+
+        with get_data_source() as source:
+            for batch in source.fetch_submissions(email_keys, start, end): ...
+    """
+
+    name = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def fetch_submissions(self, email_keys, start_date, end_date):
+        """
+        Normalize email'lerin (strip + lower) tarih aralığındaki form kayıtları
+
+        Yields:
+            DataFrame: SUBMISSION_COLUMNS (email_key = istenen anahtarlardan
+                biri, bkz. key_rows), created_at artan sırada parçalar halinde
+        """
+        raise NotImplementedError
+
+    def adset_names(self, adset_ids):
+        """
+        Returns:
+            dict: {adset_id (str): adset adı}; bulunamayanlar yer almaz
+        """
+        raise NotImplementedError
+
+    def ping(self):
+        """Açık kaynağa ucuz bir yoklama (hata varsa exception)"""
+        raise NotImplementedError
+
+
+class MySQLDataSource(DataSource):
+    """Üretim veritabanı (SSH tunnel + MySQL)"""
+
+    name = 'mysql'
+
+    SUBMISSIONS_QUERY = f"""
+    SELECT
+        email,
+        created_at,
+        {', '.join(UTM_FIELDS)}
+    FROM iframe_form_submissions
+    WHERE LOWER(TRIM(email)) IN %(emails)s
+      AND created_at >= %(start)s
+      AND created_at <= %(end)s
+    ORDER BY created_at ASC
+    """
+
+    ADSETS_QUERY = """
+    SELECT adset_id, name as adset_name
+    FROM meta_adsets
+    WHERE adset_id IN %(ids)s
+    """
+
+    def __init__(self, db=None):
+        self.db = db
+        self._own_connection = db is None
+
+    def open(self):
+        if self.db is None:
+            self.db = DatabaseConnection()
+        if self._own_connection and not self.db.connect():
+            raise Exception("❌ Veritabanına bağlanılamadı! Lütfen bağlantı bilgilerini kontrol edin.")
+
+    def close(self):
+        if self._own_connection and self.db is not None:
+            self.db.close()
+
+    def fetch_submissions(self, email_keys, start_date, end_date):
+        start, end = _window(start_date, end_date)
+        # Sunucu tarafı cursor: sonuç belleğe toplu alınmaz (bkz. stream_query)
+        batches = self.db.stream_query(self.SUBMISSIONS_QUERY, params={
+            'emails': tuple(email_keys),
+            'start': start,
+            'end': end
+        }, dtypes=SUBMISSION_DTYPES)
+        for batch in batches:
+            yield key_rows(batch, email_keys)
+
+    def adset_names(self, adset_ids):
+        ids = list(dict.fromkeys(str(i) for i in adset_ids))
+        names = {}
+        for offset in range(0, len(ids), ADSET_CHUNK_SIZE):
+            check_cancelled()
+            chunk = ids[offset:offset + ADSET_CHUNK_SIZE]
+            for row in self.db.execute_query(self.ADSETS_QUERY, {'ids': tuple(chunk)}) or []:
+                names.setdefault(str(row['adset_id']), row.get('adset_name'))
+        return names
+
+    def ping(self):
+        self.db.ping()
+
+
+class SQLiteDataSource(DataSource):
+    """
+    Yerel dosya veri kaynağı. Tablolar MySQL ile aynıdır:
+    iframe_form_submissions(email, created_at, utm_*) ve
+    meta_adsets(adset_id, name). created_at 'YYYY-MM-DD HH:MM:SS' metnidir.
+    Dosya write() ile (veya başka bir araçla) doldurulur.
+
+    write() form kayıtlarına indeksli bir email_key sütunu (normalize_email)
+    ekler ve sorgular bu sütunla eşleşir: SQLite'ın LOWER()'ı yalnızca ASCII
+    harfleri küçülttüğünden 'ÖZGE@X.COM' normalize 'özge@x.com' ile
+    bulunamazdı. email_key'i olmayan dosyalarda aynı fonksiyon SQLite'a
+    kaydedilip indekssiz kullanılır.
+
+    Sorgular DB_STATEMENT_TIMEOUT süre sınırıyla çalışır ve iptal edilen
+    analizde sorgunun ortasında kesilir (progress handler).
+    """
+
+    name = 'sqlite'
+
+    # SQLite parametre sınırının (999) altında kalmak için
+    MAX_PARAMS = 900
+
+    def __init__(self, path=None, batch_size=5000, statement_timeout=None):
+        self.path = path or os.environ.get('DATA_SOURCE_PATH', DEFAULT_SQLITE_PATH)
+        self.batch_size = batch_size
+        self.statement_timeout = statement_timeout_setting(statement_timeout)
+        self.conn = None
+        self._key_expr = 'email_key'
+
+    def open(self):
+        if not os.path.exists(self.path):
+            raise Exception(f"❌ Yerel veri kaynağı bulunamadı: {self.path}")
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.create_function('normalize_email', 1, _sqlite_email_key, deterministic=True)
+        if self._has_email_key(self.conn):
+            self._key_expr = 'email_key'
+        else:
+            self._key_expr = 'normalize_email(email)'
+            print(f"⚠️ {self.path}: email_key sütunu yok, email eşleşmesi indekssiz yapılacak "
+                  "(dosyayı load-data-source ile yeniden yazın)")
+
+    @staticmethod
+    def _has_email_key(conn):
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(iframe_form_submissions)")]
+        return 'email_key' in columns
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _guard(self):
+        """
+        Sıradaki sorgu için süre sınırı ve iptal kontrolünü kur
+
+        Returns:
+            callable: Sorgu hatasını çevirir (iptal → AnalysisCancelled,
+                süre aşımı → TimeoutError, diğerleri olduğu gibi)
+        """
+        token = current_token()
+        deadline = time.monotonic() + self.statement_timeout if self.statement_timeout else None
+
+        def expired():
+            return deadline is not None and time.monotonic() > deadline
+
+        def interrupt():
+            return 1 if (token is not None and token.cancelled) or expired() else 0
+
+        self.conn.set_progress_handler(interrupt, SQLITE_PROGRESS_STEPS)
+
+        def translate(error):
+            if token is not None and token.cancelled:
+                return AnalysisCancelled(token.reason)
+            if expired():
+                return TimeoutError(f"Sorgu zaman aşımı ({self.statement_timeout:g} sn)")
+            return error
+        return translate
+
+    def _observe(self, kind, query, params, started, rows, ok=True):
+        seconds = time.perf_counter() - started
+        record_query(kind, seconds, rows, ok)
+        profile = active_profile()
+        if profile is not None:
+            def explain():
+                cursor = self.conn.execute(f"EXPLAIN QUERY PLAN {query}", params)
+                return [dict(zip([c[0] for c in cursor.description], row)) for row in cursor.fetchall()]
+            profile.record(query, seconds, rows, ok, explain=explain)
+
+    def fetch_submissions(self, email_keys, start_date, end_date):
+        import pandas as pd
+
+        start, end = _window(start_date, end_date)
+        email_keys = list(email_keys)
+        for offset in range(0, len(email_keys), self.MAX_PARAMS):
+            chunk = email_keys[offset:offset + self.MAX_PARAMS]
+            query = f"""
+            SELECT email, created_at, {', '.join(UTM_FIELDS)}
+            FROM iframe_form_submissions
+            WHERE {self._key_expr} IN ({', '.join('?' * len(chunk))})
+              AND created_at >= ? AND created_at <= ?
+            ORDER BY created_at ASC
+            """
+            params = [*chunk, start, end]
+            started = time.perf_counter()
+            rows = 0
+            translate = self._guard()
+            try:
+                for batch in pd.read_sql_query(query, self.conn, params=params, chunksize=self.batch_size):
+                    rows += len(batch)
+                    batch['created_at'] = pd.to_datetime(batch['created_at'])
+                    yield key_rows(batch, chunk)
+            except Exception as e:
+                self.conn.set_progress_handler(None, 0)
+                self._observe('stream', query, params, started, rows, ok=False)
+                error = translate(e)
+                if error is e:
+                    raise
+                raise error from e
+            self.conn.set_progress_handler(None, 0)
+            self._observe('stream', query, params, started, rows)
+
+    def adset_names(self, adset_ids):
+        ids = list(dict.fromkeys(str(i) for i in adset_ids))
+        names = {}
+        for offset in range(0, len(ids), self.MAX_PARAMS):
+            chunk = ids[offset:offset + self.MAX_PARAMS]
+            query = f"SELECT adset_id, name FROM meta_adsets WHERE adset_id IN ({', '.join('?' * len(chunk))})"
+            started = time.perf_counter()
+            translate = self._guard()
+            try:
+                result = self.conn.execute(query, chunk).fetchall()
+            except Exception as e:
+                self.conn.set_progress_handler(None, 0)
+                self._observe('execute', query, chunk, started, 0, ok=False)
+                error = translate(e)
+                if error is e:
+                    raise
+                raise error from e
+            self.conn.set_progress_handler(None, 0)
+            self._observe('execute', query, chunk, started, len(result))
+            for adset_id, name in result:
+                names.setdefault(str(adset_id), name)
+        return names
+
+    def ping(self):
+        self.conn.execute('SELECT 1').fetchone()
+
+    def write(self, df_forms, df_adsets=None, replace=True):
+        """
+        Form kayıtlarını (email, created_at, utm_*) ve adset'leri
+        (adset_id, name) dosyaya yaz; email_key sütununu ve indeksleri oluştur
+        """
+        import pandas as pd
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        forms = df_forms[['email', 'created_at'] + UTM_FIELDS].copy()
+        forms['created_at'] = pd.to_datetime(forms['created_at']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        forms['email_key'] = forms['email'].map(_sqlite_email_key, na_action='ignore')
+        if_exists = 'replace' if replace else 'append'
+
+        conn = sqlite3.connect(self.path)
+        conn.create_function('normalize_email', 1, _sqlite_email_key, deterministic=True)
+        try:
+            table_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'iframe_form_submissions'"
+            ).fetchone() is not None
+            if not replace and table_exists and not self._has_email_key(conn):
+                # email_key'den önce yazılmış dosya: sütunu ekle ve doldur
+                conn.execute("ALTER TABLE iframe_form_submissions ADD COLUMN email_key TEXT")
+                conn.execute("UPDATE iframe_form_submissions SET email_key = normalize_email(email)")
+            forms.to_sql('iframe_form_submissions', conn, if_exists=if_exists, index=False, chunksize=10000)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_forms_email_key ON iframe_form_submissions (email_key, created_at)")
+            if df_adsets is not None:
+                adsets = df_adsets[['adset_id', 'name']].astype({'adset_id': str})
+                adsets.to_sql('meta_adsets', conn, if_exists=if_exists, index=False)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_adsets_id ON meta_adsets (adset_id)")
+            conn.commit()
+        finally:
+            conn.close()
+        return len(forms)
+
+
+DATA_SOURCES = {
+    MySQLDataSource.name: MySQLDataSource,
+    SQLiteDataSource.name: SQLiteDataSource
+}
+
+
+def get_data_source(name=None):
+    """
+    DATA_SOURCE (veya name) ayarına göre veri kaynağı oluştur (açılmamış)
+
+    Raises:
+        ValueError: Bilinmeyen kaynak adı
+    """
+    name = (name or os.environ.get('DATA_SOURCE') or MySQLDataSource.name).strip().lower()
+    if name not in DATA_SOURCES:
+        raise ValueError(f"Bilinmeyen veri kaynağı: {name} (seçenekler: {', '.join(DATA_SOURCES)})")
+    return DATA_SOURCES[name]()
@@ -3,10 +3,11 @@ MySQL Veritabanı Bağlantı Modülü (SSH Tunnel Desteği ile)
 """
 
 import os
-import pandas as pd
-import pymysql
-from sqlalchemy import create_engine
-from sshtunnel import SSHTunnelForwarder
+import time
+import threading
+
+from app.utils.metrics import record_query, record_connect
+from app.utils.query_profile import QueryProfile, active_profile
 
 # .env dosyasından environment variables'ları yükle (opsiyonel)
 try:
@@ -15,14 +16,85 @@ try:
 except Exception:
     pass  # .env yüklenemezse devam et (hardcoded değerler kullanılacak)
 
+# stream_query varsayılan parça boyutu (satır)
+STREAM_BATCH_ROWS = 5000
+
+# Zaman aşımları (sn; 0 = sınırsız). Ortam değişkenleri veya DatabaseConnection
+# argümanlarıyla değiştirilir. Sorgu (statement) süresi sunucuda kesilir
+# (MySQL max_execution_time / MariaDB max_statement_time); okuma zaman aşımı
+# sunucudan veri beklerken istemcide uygulanır.
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 300
+DEFAULT_STATEMENT_TIMEOUT = 600
+
+# Aynı anda açık bağlantı sınırı (toplu analizde süreçler arası ortak semafor)
+_connection_limiter = None
+
+# Süreçte açık bağlantı / SSH tunnel sayısı (/readyz raporu için)
+_open_counts = {'connections': 0, 'tunnels': 0}
+_open_lock = threading.Lock()
+
+
+def _count_open(connections, tunnels):
+    with _open_lock:
+        _open_counts['connections'] += connections
+        _open_counts['tunnels'] += tunnels
+
+
+def connection_stats():
+    """Bu süreçte açık veritabanı bağlantısı ve SSH tunnel sayısı"""
+    with _open_lock:
+        return dict(_open_counts, limited=_connection_limiter is not None)
+
+
+def _env_seconds(name, default):
+    try:
+        return max(0.0, float(os.environ.get(name, default)))
+    except ValueError:
+        return float(default)
+
+
+def statement_timeout_setting(value=None):
+    """Sorgu zaman aşımı (sn): verilen değer, yoksa DB_STATEMENT_TIMEOUT; 0 → None"""
+    if value is None:
+        value = _env_seconds('DB_STATEMENT_TIMEOUT', DEFAULT_STATEMENT_TIMEOUT)
+    return value or None
+
+
+def set_connection_limiter(limiter):
+    """
+    Açık veritabanı bağlantılarını sınırlayan semaforu ayarla.
+    connect() bir yer alır, close() bırakır. None: sınırsız.
+    """
+    global _connection_limiter
+    _connection_limiter = limiter
+
 
 class DatabaseConnection:
     """MySQL veritabanına SSH tunnel üzerinden bağlantı sağlayan sınıf"""
     
-    def __init__(self, use_ssh_tunnel=True):
-        """Veritabanı bağlantı parametrelerini ayarla"""
+    def __init__(self, use_ssh_tunnel=True, profile=False, connect_timeout=None,
+                 read_timeout=None, statement_timeout=None):
+        """
+        Veritabanı bağlantı parametrelerini ayarla
+
+        Args:
+            profile: True ise sorgular bu bağlantıya ait query_profile'a da
+                kaydedilir (analiz dışı ayar çalışmaları için; analizlerde
+                DB_PROFILE ile açılan kapsam kullanılır)
+            connect_timeout: Bağlantı zaman aşımı (sn; varsayılan DB_CONNECT_TIMEOUT)
+            read_timeout: Sunucudan okuma zaman aşımı (sn; varsayılan DB_READ_TIMEOUT)
+            statement_timeout: Sorgu başına süre sınırı (sn; varsayılan
+                DB_STATEMENT_TIMEOUT). 0: sınırsız
+        """
         self.use_ssh_tunnel = use_ssh_tunnel
+        self.connect_timeout = connect_timeout if connect_timeout is not None else \
+            _env_seconds('DB_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)
+        self.read_timeout = read_timeout if read_timeout is not None else \
+            _env_seconds('DB_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)
+        self.statement_timeout = statement_timeout_setting(statement_timeout)
         self.tunnel = None
+        self.query_profile = QueryProfile() if profile else None
         
         # SSH bilgileri
         self.ssh_host = os.getenv('SSH_HOST')
@@ -42,12 +114,22 @@ class DatabaseConnection:
         self.engine = None
         self.host = '127.0.0.1'  # SSH tunnel üzerinden localhost
         self.port = None  # SSH tunnel başlatıldığında ayarlanacak
+        self._limiter = None  # connect() ile alınan bağlantı hakkı
+        self._counted = False  # connection_stats'a sayıldı mı
     
     def connect(self):
         """SSH tunnel ve veritabanına bağlan"""
+        if _connection_limiter is not None and self._limiter is None:
+            _connection_limiter.acquire()
+            self._limiter = _connection_limiter
+        started = time.perf_counter()
         try:
+            # Sürücüler ilk bağlantıda yüklenir (web worker açılışını yavaşlatmasın)
+            import pymysql
+
             # SSH Tunnel başlat
             if self.use_ssh_tunnel:
+                from sshtunnel import SSHTunnelForwarder
                 print("🔐 SSH Tunnel açılıyor...")
                 self.tunnel = SSHTunnelForwarder(
                     (self.ssh_host, self.ssh_port),
@@ -71,24 +153,56 @@ class DatabaseConnection:
                 password=self.db_password,
                 database=self.database,
                 charset='utf8mb4',
-                cursorclass=pymysql.cursors.DictCursor
+                cursorclass=pymysql.cursors.DictCursor,
+                connect_timeout=self.connect_timeout or None,
+                read_timeout=self.read_timeout or None,
+                write_timeout=self.read_timeout or None
             )
+            self._apply_statement_timeout()
             print(f"✓ Veritabanına başarıyla bağlanıldı: {self.database}\n")
+            record_connect(time.perf_counter() - started)
+            _count_open(1, 1 if self.tunnel else 0)
+            self._counted = True
             return True
         except Exception as e:
             print(f"✗ Bağlantı hatası: {str(e)}")
             if self.tunnel:
                 self.tunnel.stop()
+            self._release_limiter()
             return False
     
+    def _apply_statement_timeout(self):
+        """
+        Oturumun sorgu süre sınırını ayarla. MySQL (max_execution_time, ms)
+        denenir, desteklenmezse MariaDB (max_statement_time, sn). Komut
+        bağlantının init_command'ı olur; ping(reconnect=True) sonrası da geçerlidir.
+        """
+        if not self.statement_timeout:
+            return
+        for command in (f"SET SESSION max_execution_time = {int(self.statement_timeout * 1000)}",
+                        f"SET SESSION max_statement_time = {float(self.statement_timeout)}"):
+            try:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(command)
+            except Exception:
+                continue
+            self.connection.init_command = command
+            return
+        print("⚠️  Sunucu sorgu süre sınırını desteklemiyor; yalnızca okuma zaman aşımı geçerli")
+
     def create_engine(self):
         """SQLAlchemy engine oluştur (pandas ile kullanmak için)"""
         try:
+            from sqlalchemy import create_engine
+
             if not self.port:
                 raise Exception("Önce connect() metodunu çağırın!")
             
             connection_string = f"mysql+pymysql://{self.db_user}:{self.db_password}@{self.host}:{self.port}/{self.database}"
-            self.engine = create_engine(connection_string)
+            connect_args = {'connect_timeout': self.connect_timeout or None, 'read_timeout': self.read_timeout or None}
+            if self.connection is not None and self.connection.init_command:
+                connect_args['init_command'] = self.connection.init_command  # Sorgu süre sınırı
+            self.engine = create_engine(connection_string, connect_args=connect_args)
             print(f"✓ SQLAlchemy engine oluşturuldu")
             return self.engine
         except Exception as e:
@@ -97,28 +211,92 @@ class DatabaseConnection:
     
     def execute_query(self, query, params=None):
         """SQL sorgusu çalıştır ve sonuçları döndür"""
+        started = time.perf_counter()
         try:
             with self.connection.cursor() as cursor:
                 cursor.execute(query, params)
                 result = cursor.fetchall()
-                return result
+            self._observe('execute', query, params, time.perf_counter() - started, len(result))
+            return result
         except Exception as e:
+            self._observe('execute', query, params, time.perf_counter() - started, ok=False)
             print(f"✗ Sorgu çalıştırma hatası: {str(e)}")
             return None
     
     def query_to_dataframe(self, query, params=None):
         """SQL sorgusunu çalıştır ve pandas DataFrame olarak döndür"""
+        started = time.perf_counter()
         try:
             if self.engine is None:
                 self.create_engine()
             
+            import pandas as pd
+
             df = pd.read_sql(query, self.engine, params=params)
+            self._observe('dataframe', query, params, time.perf_counter() - started, len(df))
             print(f"✓ Sorgu başarılı: {len(df)} satır getirildi")
             return df
         except Exception as e:
+            self._observe('dataframe', query, params, time.perf_counter() - started, ok=False)
             print(f"✗ DataFrame oluşturma hatası: {str(e)}")
             return None
     
+    def stream_query(self, query, params=None, batch_size=STREAM_BATCH_ROWS, dtypes=None):
+        """
+        SQL sorgusunu sunucu tarafı (unbuffered, SSCursor) cursor ile çalıştır
+        ve sonucu batch_size satırlık DataFrame parçaları olarak üret
+
+        Sonuç kümesi belleğe toplu alınmaz; satırlar sunucudan parça parça
+        okunur. Akış bitene (veya generator kapanana) kadar aynı bağlantıda
+        başka sorgu çalıştırılamaz. Ölçülen süre tüketim süresini de içerir.
+
+        Args:
+            dtypes: {sütun: dtype}; datetime64 sütunları pd.to_datetime ile çevrilir
+
+        Yields:
+            DataFrame: Sorgu sütunlarıyla, en fazla batch_size satır
+        """
+        from pymysql.cursors import SSCursor
+
+        started = time.perf_counter()
+        rows = 0
+        failed = False
+        cursor = self.connection.cursor(SSCursor)
+        try:
+            cursor.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                rows += len(batch)
+                yield _typed_frame(batch, columns, dtypes)
+        except Exception as e:
+            failed = True
+            print(f"✗ Akış sorgusu hatası: {str(e)}")
+            raise
+        finally:
+            cursor.close()  # Okunmamış satırlar sunucudan boşaltılır
+            self._observe('stream', query, params, time.perf_counter() - started, rows, not failed)
+    
+    def _observe(self, kind, query, params, seconds, rows=0, ok=True):
+        """Sorgu ölçümünü metriklere ve (açıksa) sorgu profiline işle"""
+        record_query(kind, seconds, rows, ok)
+        profiles = [p for p in (active_profile(), self.query_profile) if p is not None]
+        if not profiles:
+            return
+
+        def explain():
+            if kind == 'dataframe':
+                import pandas as pd
+                return pd.read_sql(f"EXPLAIN {query}", self.engine, params=params).to_dict('records')
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN {query}", params)
+                return cursor.fetchall()
+
+        for profile in profiles:
+            profile.record(query, seconds, rows, ok, explain=explain)
+    
     def get_table_list(self):
         """Veritabanındaki tüm tabloları listele"""
         query = "SHOW TABLES"
@@ -141,6 +319,20 @@ class DatabaseConnection:
             return result[0]['count']
         return 0
     
+    def ping(self):
+        """
+        Açık bağlantıyı yokla (yeni SSH tunnel açmaz). MySQL bağlantısı
+        kopmuşsa aynı tunnel üzerinden yeniden bağlanır.
+
+        Raises:
+            Exception: Bağlantı yok, tunnel kapalı veya sunucu cevap vermiyor
+        """
+        if not self.connection:
+            raise Exception("Bağlantı açık değil")
+        if self.tunnel is not None and not self.tunnel.is_active:
+            raise Exception("SSH tunnel kapalı")
+        self.connection.ping(reconnect=True)
+
     def close(self):
         """Veritabanı ve SSH tunnel bağlantısını kapat"""
         if self.connection:
@@ -149,6 +341,30 @@ class DatabaseConnection:
         if self.tunnel:
             self.tunnel.stop()
             print("✓ SSH Tunnel kapatıldı")
+        if self._counted:
+            _count_open(-1, -1 if self.tunnel else 0)
+            self._counted = False
+        self._release_limiter()
+
+    def _release_limiter(self):
+        if self._limiter is not None:
+            self._limiter.release()
+            self._limiter = None
+
+
+def _typed_frame(rows, columns, dtypes=None):
+    """Tuple satırlarından tipli DataFrame parçası"""
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    for column, dtype in (dtypes or {}).items():
+        if column not in df.columns:
+            continue
+        if str(dtype).startswith('datetime64'):
+            df[column] = pd.to_datetime(df[column])
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
 
 
 # Test fonksiyonu
@@ -0,0 +1,135 @@
+"""
+Sağlık ve Hazırlık Kontrolleri
+- /healthz: süreç ayakta mı (G/Ç yok)
+- /readyz: veri dizinleri yazılabilir mi, kampanya deposu okunuyor mu, iş
+  kuyruğu ne durumda, veri kaynağı cevap veriyor mu
+
+Veri kaynağı yoklaması süreç başına tek bir açık bağlantı üzerinden yapılır ve
+sonucu READYZ_DB_TTL saniye önbellekte tutulur: sık gelen yoklamalar her
+seferinde yeni SSH tunnel açmaz. Yoklama sürerken gelen istekler son sonucu
+alır (aynı anda tek yoklama).
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+
+from app.utils.db_connection import connection_stats
+
+DEFAULT_DB_TTL = 10.0
+
+_probe = {'source': None, 'result': None, 'checked_at': 0.0}
+_probe_lock = threading.Lock()
+
+
+def db_check_enabled():
+    return os.environ.get('READYZ_DB', '1').lower() in ('1', 'true', 'yes')
+
+
+def db_ttl():
+    try:
+        return float(os.environ.get('READYZ_DB_TTL', DEFAULT_DB_TTL))
+    except ValueError:
+        return DEFAULT_DB_TTL
+
+
+def check_folders(folders):
+    """
+    Args:
+        folders: {ad: dizin}
+
+    Returns:
+        dict: {'ok', 'paths': {ad: yazılabilir mi}}
+    """
+    paths = {name: os.path.isdir(path) and os.access(path, os.W_OK | os.X_OK)
+             for name, path in folders.items()}
+    return {'ok': all(paths.values()), 'paths': paths}
+
+
+def check_jobs(campaign_store):
+    """Kampanya deposu okunabilir mi; bekleyen / sıradaki / çalışan analiz sayısı"""
+    try:
+        counts = campaign_store.status_counts()
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+    return {
+        'ok': True,
+        'processing': counts.get('processing', 0),
+        'queued': counts.get('queued', 0),
+        'pending': counts.get('pending', 0)
+    }
+
+
+def _ping():
+    """Önbellek süresi dolduysa probe bağlantısını yokla (kilit altında çağrılır)"""
+    from app.utils.data_source import get_data_source
+
+    started = time.perf_counter()
+    source = _probe['source']
+    try:
+        if source is None:
+            source = get_data_source()
+            source.open()
+            _probe['source'] = source
+        source.ping()
+        result = {'ok': True, 'source': source.name,
+                  'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as e:
+        # Bağlantı bir sonraki yoklamada (TTL sonrası) yeniden kurulur
+        if source is not None:
+            try:
+                source.close()
+            except Exception:
+                pass
+        _probe['source'] = None
+        result = {'ok': False, 'source': getattr(source, 'name', None) or os.environ.get('DATA_SOURCE', 'mysql'),
+                  'error': str(e)}
+    result['checked_at'] = datetime.now().isoformat()
+    _probe['result'] = result
+    _probe['checked_at'] = time.monotonic()
+    return result
+
+
+def check_database(ttl=None):
+    """
+    Veri kaynağı yoklaması (önbellekli)
+
+    Returns:
+        dict: {'ok', 'source', 'latency_ms' | 'error', 'checked_at',
+               'age_seconds', 'connections': connection_stats()}
+    """
+    ttl = db_ttl() if ttl is None else ttl
+
+    def fresh():
+        return _probe['result'] is not None and time.monotonic() - _probe['checked_at'] < ttl
+
+    if not fresh():
+        # Başka bir istek yokluyorsa beklemeden son sonucu kullan
+        blocking = _probe['result'] is None
+        if _probe_lock.acquire(blocking=blocking):
+            try:
+                if not fresh():
+                    _ping()
+            finally:
+                _probe_lock.release()
+
+    result = dict(_probe['result'])
+    result['age_seconds'] = round(time.monotonic() - _probe['checked_at'], 1)
+    result['connections'] = connection_stats()
+    return result
+
+
+def readiness(folders, campaign_store):
+    """
+    Returns:
+        tuple: (rapor, hazır mı)
+    """
+    checks = {
+        'folders': check_folders(folders),
+        'jobs': check_jobs(campaign_store)
+    }
+    if db_check_enabled():
+        checks['database'] = check_database()
+    ready = all(check['ok'] for check in checks.values())
+    return {'status': 'ready' if ready else 'not_ready', 'checks': checks}, ready
@@ -0,0 +1,330 @@
+"""
+Metrik Modülü
+Analiz aşamalarının süre/CPU/satır sayıları, veritabanı sorgu sayısı ve
+gecikmeleri, cache isabet oranları ve tepe bellek ölçülür. Değerler iki yere
+yazılır:
+- Süreç içi kayıt (REGISTRY): /metrics uç noktasında Prometheus metin formatında
+- Analiz bazında RunMetrics: results.json'a (track_run ile açılan kapsam)
+
+Kapsam ContextVar ile taşınır; DAG aşamaları kendi context kopyalarında
+çalıştığından aşama thread'lerindeki sorgular doğru aşamaya yazılır.
+"""
+
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+ANALYSIS_BUCKETS = (5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 3600.0)
+SIZE_BUCKETS = [(1000, '<1k'), (10000, '1k-10k'), (100000, '10k-100k'), (None, '100k+')]
+
+_current_run = ContextVar('metrics_run', default=None)
+_current_stage = ContextVar('metrics_stage', default=None)
+
+
+def _label_text(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_value(self, key, state):
+        counts, total, count = state
+        lines = []
+        for bound, bucket_count in zip(self.buckets, counts):
+            labels = _label_text(self.labelnames + ('le',), key + (_format_value(bound),))
+            lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+        labels = _label_text(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Süreç içi metrik kaydı"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, func):
+        """Render öncesi çağrılacak fonksiyon (örn. anlık gauge'ları güncellemek için)"""
+        self._collectors.append(func)
+
+    def render(self):
+        for collect in self._collectors:
+            collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+ANALYSES = REGISTRY.register(Counter(
+    'satis_analyses_total', 'Biten analiz sayısı', ['status']))
+ANALYSIS_SECONDS = REGISTRY.register(Histogram(
+    'satis_analysis_duration_seconds', 'Analiz süresi (email sayısı grubuna göre)', ['size'], ANALYSIS_BUCKETS))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'satis_stage_duration_seconds', 'Pipeline aşaması süresi', ['stage'], STAGE_BUCKETS))
+STAGE_CPU_SECONDS = REGISTRY.register(Counter(
+    'satis_stage_cpu_seconds_total', 'Pipeline aşamalarının thread CPU süresi', ['stage']))
+STAGE_ROWS = REGISTRY.register(Counter(
+    'satis_stage_rows_total', 'Pipeline aşamalarına giren/çıkan satırlar', ['stage', 'direction']))
+DB_QUERIES = REGISTRY.register(Counter(
+    'satis_db_queries_total', 'Veritabanı sorgu sayısı', ['kind', 'status']))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    'satis_db_query_duration_seconds', 'Veritabanı sorgu gecikmesi', ['kind'], LATENCY_BUCKETS))
+DB_CONNECT_SECONDS = REGISTRY.register(Histogram(
+    'satis_db_connect_duration_seconds', 'SSH tunnel + MySQL bağlantı süresi', [], LATENCY_BUCKETS))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'satis_cache_requests_total', 'Cache istekleri', ['cache', 'result']))
+PEAK_RSS = REGISTRY.register(Gauge(
+    'satis_process_peak_rss_bytes', 'Sürecin tepe bellek kullanımı (RSS)'))
+
+REGISTRY.add_collector(lambda: PEAK_RSS.set(peak_rss_bytes() or 0))
+
+
+def peak_rss_bytes():
+    """Sürecin şimdiye kadarki tepe RSS'i (desteklenmiyorsa None)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def size_bucket(count):
+    """Email sayısının histogram etiketi"""
+    for limit, label in SIZE_BUCKETS:
+        if limit is None or count < limit:
+            return label
+
+
+class RunMetrics:
+    """Tek bir analizin metrikleri (results.json'a yazılır)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.db = {'queries': 0, 'errors': 0, 'seconds': 0.0, 'rows': 0, 'connects': 0, 'connect_seconds': 0.0}
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.stage_db = {}
+        self.caches = {}
+
+    def record_query(self, stage, seconds, rows, ok):
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        with self._lock:
+            self.db['queries'] += 1
+            self.db['errors'] += 0 if ok else 1
+            self.db['seconds'] += seconds
+            self.db['rows'] += rows
+            self.latency_counts[index] += 1
+            if stage is not None:
+                entry = self.stage_db.setdefault(stage, {'db_queries': 0, 'db_seconds': 0.0})
+                entry['db_queries'] += 1
+                entry['db_seconds'] += seconds
+
+    def record_connect(self, seconds):
+        with self._lock:
+            self.db['connects'] += 1
+            self.db['connect_seconds'] += seconds
+
+    def record_cache(self, cache, hit):
+        with self._lock:
+            entry = self.caches.setdefault(cache, {'hits': 0, 'misses': 0})
+            entry['hits' if hit else 'misses'] += 1
+
+    def stage_db_stats(self, stage):
+        with self._lock:
+            entry = dict(self.stage_db.get(stage, {'db_queries': 0, 'db_seconds': 0.0}))
+        entry['db_seconds'] = round(entry['db_seconds'], 3)
+        return entry
+
+    def to_dict(self, email_count=None):
+        with self._lock:
+            db = dict(self.db)
+            latency = {
+                _format_value(bound): count
+                for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), self.latency_counts)
+            }
+            caches = {
+                name: {**entry, 'hit_rate': round(entry['hits'] / (entry['hits'] + entry['misses']), 3)}
+                for name, entry in self.caches.items()
+            }
+        db['seconds'] = round(db['seconds'], 3)
+        db['connect_seconds'] = round(db['connect_seconds'], 3)
+        db['mean_ms'] = round(db['seconds'] / db['queries'] * 1000, 2) if db['queries'] else None
+        db['latency_histogram'] = latency
+        peak = peak_rss_bytes()
+        return {
+            'duration_seconds': round(time.perf_counter() - self.started, 3),
+            'process_cpu_seconds': round(time.process_time() - self.cpu_started, 3),
+            'size_bucket': size_bucket(email_count) if email_count is not None else None,
+            'db': db,
+            'caches': caches,
+            'peak_rss_mb': round(peak / 1024 / 1024, 1) if peak else None
+        }
+
+
+@contextmanager
+def track_run():
+    """Bir analizin metrik kapsamını aç"""
+    run = RunMetrics()
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def observe_analysis(seconds, email_count, status):
+    """Biten analizi süreç metriklerine işle"""
+    ANALYSES.inc(status=status)
+    if status == 'completed':
+        ANALYSIS_SECONDS.observe(seconds, size=size_bucket(email_count))
+
+
+@contextmanager
+def measure_stage(name):
+    """
+    Bir pipeline aşamasını ölç (aşamanın kendi thread'inde çağrılmalı)
+
+    Yields:
+        dict: Çıkışta seconds, cpu_seconds, db_queries, db_seconds, peak_rss_mb ile doldurulur
+    """
+    stats = {}
+    token = _current_stage.set(name)
+    started, cpu_started = time.perf_counter(), time.thread_time()
+    try:
+        yield stats
+    finally:
+        _current_stage.reset(token)
+        stats['seconds'] = time.perf_counter() - started
+        stats['cpu_seconds'] = round(time.thread_time() - cpu_started, 3)
+        STAGE_SECONDS.observe(stats['seconds'], stage=name)
+        STAGE_CPU_SECONDS.inc(stats['cpu_seconds'], stage=name)
+        run = _current_run.get()
+        if run is not None:
+            stats.update(run.stage_db_stats(name))
+        peak = peak_rss_bytes()
+        stats['peak_rss_mb'] = round(peak / 1024 / 1024, 1) if peak else None
+
+
+def record_rows(stage, rows_in, rows_out):
+    STAGE_ROWS.inc(rows_in, stage=stage, direction='in')
+    STAGE_ROWS.inc(rows_out, stage=stage, direction='out')
+
+
+def record_query(kind, seconds, rows=0, ok=True):
+    """DatabaseConnection sorgusu"""
+    DB_QUERIES.inc(kind=kind, status='ok' if ok else 'error')
+    DB_QUERY_SECONDS.observe(seconds, kind=kind)
+    run = _current_run.get()
+    if run is not None:
+        run.record_query(_current_stage.get(), seconds, rows, ok)
+
+
+def record_connect(seconds):
+    """Tunnel + MySQL bağlantı süresi"""
+    DB_CONNECT_SECONDS.observe(seconds)
+    run = _current_run.get()
+    if run is not None:
+        run.record_connect(seconds)
+
+
+def record_cache(cache, hit):
+    """Cache isabeti/ıskası"""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+    run = _current_run.get()
+    if run is not None:
+        run.record_cache(cache, hit)
+
+
+def render_prometheus():
+    """Prometheus metin formatı (text/plain; version=0.0.4)"""
+    return REGISTRY.render()
@@ -0,0 +1,214 @@
+"""
+Sorgu Profilleme (opsiyonel)
+DB_PROFILE=1 ile açılır. Her sorgu süresi normalize SQL parmak izi
+(fingerprint) bazında toplanır, eşiği (DB_SLOW_QUERY_MS) aşanlar loglanır ve
+her parmak izi için EXPLAIN çıktısı süreç başına bir kez alınır. Analiz
+kapsamındaki rapor kampanya çıktısına (query_profile.json) yazılır.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+QUERY_PROFILE_FILENAME = 'query_profile.json'
+DEFAULT_SLOW_QUERY_MS = 500
+MAX_SLOW_QUERIES = 100
+
+_current_profile = ContextVar('query_profile', default=None)
+
+# EXPLAIN çıktıları süreç boyunca parmak izi başına bir kez alınır
+_explains = {}
+_explains_lock = threading.Lock()
+
+_COMMENT_RE = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_PARAM_RE = re.compile(r'%\(\w+\)s|%s|\?')
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def profiling_enabled():
+    return os.environ.get('DB_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+
+def slow_query_ms():
+    try:
+        return float(os.environ.get('DB_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS))
+    except ValueError:
+        return DEFAULT_SLOW_QUERY_MS
+
+
+def normalize_sql(query):
+    """
+    Sorguyu parmak izi için normalize et: yorumlar atılır, literal ve
+    parametreler ? olur, IN listeleri tek ? olur, boşluklar tekleşir
+    """
+    sql = _COMMENT_RE.sub(' ', str(query))
+    sql = _STRING_RE.sub('?', sql)
+    sql = _PARAM_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _SPACE_RE.sub(' ', sql).strip().lower()
+    return _IN_LIST_RE.sub('in (?+)', sql)
+
+
+def fingerprint(query):
+    """Normalize SQL'in kısa hash'i"""
+    return hashlib.sha1(normalize_sql(query).encode('utf-8')).hexdigest()[:12]
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class QueryProfile:
+    """Bir analiz (veya bağlantı) boyunca çalışan sorguların parmak izi bazında özeti"""
+
+    def __init__(self, threshold_ms=None):
+        self.threshold_ms = slow_query_ms() if threshold_ms is None else threshold_ms
+        self.started_at = datetime.now().isoformat()
+        self._lock = threading.Lock()
+        self._fingerprints = {}
+        self._slow = []
+        self._slow_total = 0
+
+    def record(self, query, seconds, rows=0, ok=True, explain=None):
+        """
+        Sorguyu kaydet
+
+        Args:
+            explain: EXPLAIN çıktısını döndüren fonksiyon (parmak izi için
+                henüz alınmadıysa bir kez çağrılır)
+        """
+        fp = fingerprint(query)
+        ms = seconds * 1000
+        with self._lock:
+            entry = self._fingerprints.get(fp)
+            if entry is None:
+                entry = self._fingerprints[fp] = {
+                    'fingerprint': fp,
+                    'sql': normalize_sql(query),
+                    'latencies': [],
+                    'rows': 0,
+                    'errors': 0
+                }
+            entry['latencies'].append(ms)
+            entry['rows'] += rows
+            entry['errors'] += 0 if ok else 1
+
+            slow = ms >= self.threshold_ms
+            if slow:
+                self._slow_total += 1
+                if len(self._slow) < MAX_SLOW_QUERIES:
+                    self._slow.append({
+                        'fingerprint': fp,
+                        'ms': round(ms, 1),
+                        'rows': rows,
+                        'at': datetime.now().isoformat()
+                    })
+
+        if slow:
+            print(f"🐢 Yavaş sorgu ({ms:.0f} ms, {rows} satır) [{fp}]: {normalize_sql(query)[:200]}")
+
+        if ok and explain is not None:
+            capture_explain(fp, query, explain)
+
+    def to_dict(self):
+        """Rapor: parmak izleri toplam süreye göre sıralı"""
+        with self._lock:
+            entries = [dict(e, latencies=sorted(e['latencies'])) for e in self._fingerprints.values()]
+            slow = list(self._slow)
+            slow_total = self._slow_total
+
+        fingerprints = []
+        for entry in entries:
+            latencies = entry.pop('latencies')
+            total = sum(latencies)
+            fingerprints.append({
+                **entry,
+                'count': len(latencies),
+                'total_ms': round(total, 1),
+                'mean_ms': round(total / len(latencies), 2),
+                'p50_ms': round(_percentile(latencies, 0.5), 2),
+                'p95_ms': round(_percentile(latencies, 0.95), 2),
+                'max_ms': round(latencies[-1], 2),
+                'explain': get_explain(entry['fingerprint'])
+            })
+        fingerprints.sort(key=lambda e: e['total_ms'], reverse=True)
+
+        return {
+            'started_at': self.started_at,
+            'finished_at': datetime.now().isoformat(),
+            'threshold_ms': self.threshold_ms,
+            'queries': sum(e['count'] for e in fingerprints),
+            'total_ms': round(sum(e['total_ms'] for e in fingerprints), 1),
+            'slow_queries': slow_total,
+            'fingerprints': fingerprints,
+            'slow': slow
+        }
+
+
+def capture_explain(fp, query, explain):
+    """Parmak izi için EXPLAIN çıktısını (süreçte ilk kez görülüyorsa) al"""
+    if not normalize_sql(query).startswith('select'):
+        return
+    with _explains_lock:
+        if fp in _explains:
+            return
+        _explains[fp] = None  # Eşzamanlı ikinci alımı engelle
+    try:
+        plan = json.loads(json.dumps(explain(), default=str))
+    except Exception as e:
+        plan = {'error': str(e)}
+    with _explains_lock:
+        _explains[fp] = plan
+
+
+def get_explain(fp):
+    with _explains_lock:
+        return _explains.get(fp)
+
+
+def active_profile():
+    """Açık analiz kapsamındaki profil (yoksa None)"""
+    return _current_profile.get()
+
+
+@contextmanager
+def profile_queries(enabled=None):
+    """
+    Sorgu profilleme kapsamı. enabled verilmezse DB_PROFILE'a bakılır;
+    kapalıysa None döner ve sorgulara ek yük binmez.
+    """
+    if enabled is None:
+        enabled = profiling_enabled()
+    if not enabled:
+        yield None
+        return
+
+    profile = QueryProfile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def write_query_profile(output_dir, profile):
+    """Raporu kampanya çıktısına yaz"""
+    report = profile.to_dict()
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, QUERY_PROFILE_FILENAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+    return report
@@ -0,0 +1,175 @@
+"""
+İstek Profilleme (opsiyonel)
+REQUEST_PROFILING=1 ile açılır; kapalıyken uygulamaya hiçbir hook eklenmez.
+Açıkken yalnızca giriş yapmış kullanıcının "X-Profile: 1" başlığı veya
+"?_profile=1" parametresiyle işaretlediği istekler cProfile ile çalıştırılır.
+Profil PROFILE_FOLDER'a (varsayılan data/profiles) .prof (pstats / snakeviz)
+olarak, kümülatif süreye göre ilk fonksiyonlar ise yanına .json olarak yazılır.
+
+Aynı anda tek istek profillenir: Python 3.12+ (Docker imajı) cProfile'ı
+sys.monitoring üzerinden süreç genelinde kurar, ikinci bir profiler
+"Another profiling tool is already active" hatası verir. Profil kilidi
+meşgulken işaretli istek profilsiz çalışır (istek başarısız olmaz).
+
+Not: Python 3.11'de cProfile yalnızca isteği işleyen thread'i ölçer; 3.12+'da
+profil o sürede çalışan tüm thread'leri (diğer istekler, analiz DAG
+aşamaları) kapsar.
+"""
+
+import os
+import re
+import json
+import time
+import pstats
+import cProfile
+import threading
+from datetime import datetime
+
+from flask import g, request
+from flask_login import current_user
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ARG = '_profile'
+PROFILE_TOP = 30
+MAX_PROFILES = 200
+
+PROFILE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+_SLUG_RE = re.compile(r'[^A-Za-z0-9]+')
+
+# Süreçte aynı anda tek profiler (bkz. modül notu)
+_profile_lock = threading.Lock()
+
+
+def request_profiling_enabled():
+    return os.environ.get('REQUEST_PROFILING', '').lower() in ('1', 'true', 'yes')
+
+
+def _profile_requested():
+    flag = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_ARG)
+    return flag in ('1', 'true', 'yes') and current_user.is_authenticated
+
+
+def top_functions(stats, limit=PROFILE_TOP):
+    """
+    Kümülatif süreye göre ilk fonksiyonlar
+
+    Returns:
+        list: [{'function', 'calls', 'primitive_calls', 'tottime_ms', 'cumtime_ms'}]
+    """
+    rows = []
+    for (filename, line, name), (primitive, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{filename}:{line}({name})",
+            'calls': calls,
+            'primitive_calls': primitive,
+            'tottime_ms': round(tottime * 1000, 2),
+            'cumtime_ms': round(cumtime * 1000, 2)
+        })
+    rows.sort(key=lambda r: r['cumtime_ms'], reverse=True)
+    return rows[:limit]
+
+
+def save_profile(profile_dir, profiler, meta):
+    """Profili (.prof) ve özetini (.json) yaz; en eski profilleri buda"""
+    os.makedirs(profile_dir, exist_ok=True)
+    slug = _SLUG_RE.sub('-', meta['path']).strip('-')[:60] or 'root'
+    profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{meta['method'].lower()}_{slug}"
+
+    stats = pstats.Stats(profiler)
+    summary = {
+        'id': profile_id,
+        **meta,
+        'total_calls': stats.total_calls,
+        'top': top_functions(stats)
+    }
+    stats.dump_stats(os.path.join(profile_dir, f'{profile_id}.prof'))
+    with open(os.path.join(profile_dir, f'{profile_id}.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    _prune(profile_dir)
+    return summary
+
+
+def _prune(profile_dir, keep=MAX_PROFILES):
+    summaries = sorted(name for name in os.listdir(profile_dir) if name.endswith('.json'))
+    for name in summaries[:-keep] if len(summaries) > keep else []:
+        profile_id = name[:-len('.json')]
+        for ext in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(profile_dir, profile_id + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(profile_dir, limit=50, top=10):
+    """Kayıtlı profil özetleri (en yeni önce), her biri ilk top fonksiyonla"""
+    if not os.path.isdir(profile_dir):
+        return []
+    names = sorted((name for name in os.listdir(profile_dir) if name.endswith('.json')), reverse=True)
+    profiles = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(profile_dir, name), 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summary['top'] = summary.get('top', [])[:top]
+        profiles.append(summary)
+    return profiles
+
+
+def profile_path(profile_dir, profile_id):
+    """Profilin .prof dosyası (geçersiz veya bulunamayan id için None)"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(profile_dir, f'{profile_id}.prof')
+    return path if os.path.exists(path) else None
+
+
+def init_request_profiling(app):
+    """İstek profilleme hook'larını kaydet (REQUEST_PROFILING kapalıysa hiçbir şey yapmaz)"""
+    if not request_profiling_enabled():
+        return False
+
+    @app.before_request
+    def _start_profile():
+        if not _profile_requested():
+            return
+        if not _profile_lock.acquire(blocking=False):
+            print(f"⚠️ Başka bir istek profilleniyor, profilsiz çalışıyor: {request.path}")
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Süreçte başka bir profil aracı etkin (3.12+)
+            _profile_lock.release()
+            print(f"⚠️ İstek profillenemedi: {e}")
+            return
+        g.request_profiler = profiler
+        g.request_profile_started = time.perf_counter()
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        profiler = g.pop('request_profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        _profile_lock.release()
+        meta = {
+            'method': request.method,
+            'path': request.path,
+            'query': request.query_string.decode('utf-8', 'replace'),
+            'endpoint': request.endpoint,
+            'duration_ms': round((time.perf_counter() - g.pop('request_profile_started')) * 1000, 1),
+            'error': repr(exc) if exc else None,
+            'created_at': datetime.now().isoformat()
+        }
+        try:
+            summary = save_profile(app.config['PROFILE_FOLDER'], profiler, meta)
+            print(f"🔬 İstek profili kaydedildi: {summary['id']} ({meta['duration_ms']} ms)")
+        except Exception as e:
+            print(f"⚠️ İstek profili kaydedilemedi: {e}")
+
+    print("🔬 İstek profilleme açık (X-Profile: 1 veya ?_profile=1)")
+    return True
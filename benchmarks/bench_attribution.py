@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Çoklu temas atıf motoru benchmark'ı
+Sentetik form kayıtları (varsayılan 1M satır) üzerinde compute_attribution
+ve model özetlerinin süresini ölçer.
+
+Kullanım:
+    python benchmarks/bench_attribution.py --rows 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.attribution_service import (
+    compute_attribution, summarize_attribution, write_attribution, load_attribution, MODELS
+)
+
+
+def make_submissions(rows, emails, seed=42):
+    """email başına ortalama rows/emails kayıt içeren sentetik df_all_records"""
+    rng = np.random.default_rng(seed)
+    email_ids = rng.integers(0, emails, rows)
+    start = np.datetime64('2025-01-01T00:00:00')
+    created_at = start + rng.integers(0, 60 * 86400, rows).astype('timedelta64[s]')
+    adset_ids = rng.integers(0, 400, rows)
+
+    durum = np.where(rng.random(rows) < 0.9, 'UTM VAR', 'BOŞ')
+    utm_content = np.where(rng.random(rows) < 0.01, '{{ad.name}}', 'ad')
+
+    return pd.DataFrame({
+        'email': pd.Series(email_ids).map(lambda i: f"user{i}@example.com"),
+        'kayit_sayisi': 1,
+        'durum': durum,
+        'created_at': created_at,
+        'utm_source': rng.choice(['fb', 'ig', 'google', 'youtube'], rows),
+        'utm_medium': 'paid',
+        'utm_campaign': pd.Series(adset_ids // 20).map(lambda i: f"campaign{i}"),
+        'utm_content': utm_content,
+        'utm_term': adset_ids.astype(str)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Atıf motoru benchmark')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--emails', type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"🧪 {args.rows:,} kayıt / {args.emails:,} email üretiliyor...")
+    df = make_submissions(args.rows, args.emails)
+    adset_names = pd.Series({str(i): f"adset {i}" for i in range(400)})
+
+    t0 = time.perf_counter()
+    touches = compute_attribution(df, adset_names=adset_names)
+    t_compute = time.perf_counter() - t0
+    print(f"⏱️  compute_attribution: {t_compute:.2f} sn ({len(touches):,} geçerli temas)")
+
+    credit_per_email = touches.groupby('email')[MODELS].sum()
+    assert np.allclose(credit_per_email.to_numpy(), 1.0), 'Email başına kredi toplamı 1 olmalı'
+
+    output_dir = tempfile.mkdtemp()
+    t0 = time.perf_counter()
+    write_attribution(output_dir, touches)
+    touches = load_attribution(output_dir)
+    print(f"⏱️  parquet yaz + oku: {time.perf_counter() - t0:.2f} sn")
+
+    for model in MODELS:
+        t0 = time.perf_counter()
+        summarize_attribution(touches, model=model, limit=50)
+        print(f"⏱️  summarize {model:<12}: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    t0 = time.perf_counter()
+    summarize_attribution(touches, model='time_decay', half_life_days=3, limit=50)
+    print(f"⏱️  time_decay (half_life=3) yeniden hesap: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Satın alma → form gecikme analizi benchmark'ı
+Sentetik satın almalar (varsayılan 300k) ve form kayıtları (1M) üzerinde
+match_purchases (merge_asof) ve summarize_lag sürelerini ölçer.
+
+Kullanım:
+    python benchmarks/bench_lag.py --purchases 300000 --submissions 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.lag_service import match_purchases, summarize_lag
+from bench_attribution import make_submissions
+
+
+def make_purchases(rows, emails, seed=7):
+    """Buyer dosyası formatında (DATE: 04.11.2025 22:10:13) sentetik satın almalar"""
+    rng = np.random.default_rng(seed)
+    email_ids = rng.integers(0, emails, rows)
+    start = np.datetime64('2025-01-15T00:00:00')
+    purchased = pd.Series(start + rng.integers(0, 60 * 86400, rows).astype('timedelta64[s]'))
+    return pd.DataFrame({
+        'MAİL ADRESİ': pd.Series(email_ids).map(lambda i: f" User{i}@Example.com "),
+        'DATE': purchased.dt.strftime('%d.%m.%Y %H:%M:%S')
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gecikme analizi benchmark')
+    parser.add_argument('--purchases', type=int, default=300_000)
+    parser.add_argument('--submissions', type=int, default=1_000_000)
+    parser.add_argument('--emails', type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"🧪 {args.purchases:,} satın alma / {args.submissions:,} form kaydı üretiliyor...")
+    submissions = make_submissions(args.submissions, args.emails)
+    purchases = make_purchases(args.purchases, args.emails)
+
+    t0 = time.perf_counter()
+    matched = match_purchases(purchases, 'MAİL ADRESİ', 'DATE', submissions)
+    print(f"⏱️  match_purchases: {time.perf_counter() - t0:.2f} sn "
+          f"({matched['lag_hours'].notna().sum():,} eşleşme)")
+
+    for group_by in (['utm_source'], ['utm_campaign', 'utm_term']):
+        t0 = time.perf_counter()
+        summarize_lag(matched, group_by=group_by, limit=50)
+        print(f"⏱️  summarize_lag {','.join(group_by):<22}: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
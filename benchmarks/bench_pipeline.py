@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Uçtan uca pipeline benchmark'ı
+workload.py ile üretilen iş yükü üzerinde (yerel SQLite veri kaynağı) her
+pipeline fonksiyonunun, tüm analiz DAG'ının (run_analysis) ve web
+arayüzündeki kampanya oluştur → /analyze akışının süresini ölçer. Sonuçlar
+JSON olarak yazılır ve kayıtlı bir baseline ile karşılaştırılır; eşiği aşan
+yavaşlama varsa çıkış kodu 1'dir.
+
+Kullanım:
+    python benchmarks/bench_pipeline.py --scale 10k --save-baseline
+    python benchmarks/bench_pipeline.py --scale 10k          # baseline ile karşılaştır
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+import pandas as pd
+
+from workload import SCALES, load_or_generate
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINES_DIR = os.path.join(BENCH_DIR, 'baselines')
+WORKLOAD_DIR = os.path.join(BENCH_DIR, '.workload')
+
+# Bu süreden kısa ölçümlerde oransal fark gürültü sayılır (sn)
+MIN_DELTA_SECONDS = 0.05
+
+
+def timed(timings, name, func, *args, repeat=1, **kwargs):
+    """func'ı repeat kez çalıştır (çıktısı bastırılır); medyan süreyi kaydet"""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func(*args, **kwargs)
+        runs.append(time.perf_counter() - started)
+    timings[name] = {'seconds': round(sorted(runs)[len(runs) // 2], 4), 'runs': [round(r, 4) for r in runs]}
+    print(f"⏱️  {name:<26} {timings[name]['seconds']:8.3f} sn")
+    return result
+
+
+def bench_functions(workload, work_dir, timings, repeat):
+    """Pipeline fonksiyonları tek tek ve run_analysis (DAG) bütün olarak"""
+    from app.models import Campaign
+    from app.services.pipeline_service import read_customer_file, run_analysis, campaign_output_dir
+    from app.services.utm_service import fetch_form_submissions, build_utm_records, process_utm_details
+    from app.services.reklam_service import enrich_with_ad_details
+    from app.services.analysis_service import categorize_customers
+    from app.services.validation_service import validate_analysis
+    from app.services.export_service import create_campaign_export
+    from app.services.attribution_service import compute_attribution
+    from app.services.lag_service import find_purchase_date_column, match_purchases
+    from app.services.rollup_service import RollupStore
+
+    start_date, end_date = workload['start_date'], workload['end_date']
+    buyers_csv = workload['buyers_csv']
+
+    df_customers, email_column, email_list = timed(
+        timings, 'read_customer_file', read_customer_file, buyers_csv, repeat=repeat)
+    df_submissions = timed(timings, 'fetch_form_submissions', fetch_form_submissions,
+                           email_list, start_date, end_date, repeat=repeat)
+    df_records, _ = timed(timings, 'build_utm_records', build_utm_records,
+                          email_list, df_submissions, start_date, end_date, repeat=repeat)
+    df_details, _ = timed(timings, 'process_utm_details', process_utm_details, df_records, repeat=repeat)
+    df_reklam, _ = timed(timings, 'enrich_with_ad_details', enrich_with_ad_details, df_details, repeat=repeat)
+    df_categorized, _ = timed(timings, 'categorize_customers', categorize_customers, df_reklam, repeat=repeat)
+    timed(timings, 'validate_analysis', validate_analysis, buyers_csv, df_categorized, email_column, repeat=repeat)
+    timed(timings, 'create_campaign_export', create_campaign_export, df_categorized, 'Benchmark',
+          os.path.join(work_dir, 'export'), repeat=repeat)
+    timed(timings, 'compute_attribution', compute_attribution, df_records, repeat=repeat)
+    date_column = find_purchase_date_column(df_customers)
+    timed(timings, 'match_purchases', match_purchases, df_customers, email_column, date_column,
+          df_records, repeat=repeat)
+
+    campaign = Campaign(id='bench001', name='Benchmark', start_date=start_date, end_date=end_date,
+                        customer_file=os.path.basename(buyers_csv), created_at=datetime.now())
+    results = timed(timings, 'run_analysis', run_analysis, campaign, buyers_csv,
+                    campaign_output_dir(os.path.join(work_dir, 'output'), campaign.id),
+                    rollup_store=RollupStore(os.path.join(work_dir, 'store')), repeat=repeat)
+    return {
+        'emails': len(email_list),
+        'records': len(df_records),
+        'final_stats': results['final_stats']
+    }
+
+
+def bench_http(workload, work_dir, timings, repeat):
+    """Web akışı: giriş → kampanya oluştur (CSV yükle) → /analyze (iş bitene kadar) → dosya listesi"""
+    from app import create_app
+
+    app = create_app()
+    app.config['UPLOAD_FOLDER'] = os.path.join(work_dir, 'uploads')
+    app.config['OUTPUT_FOLDER'] = os.path.join(work_dir, 'output')
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    client = app.test_client()
+    client.post('/login', data={
+        'username': os.environ.get('ADMIN_USERNAME', 'admin'),
+        'password': os.environ.get('ADMIN_PASSWORD', 'admin123')
+    })
+
+    def flow():
+        with open(workload['buyers_csv'], 'rb') as f:
+            response = client.post('/api/campaign/create', data={
+                'name': 'Benchmark',
+                'start_date': workload['start_date'],
+                'end_date': workload['end_date'],
+                'file': (f, 'buyers.csv')
+            }, content_type='multipart/form-data')
+        campaign_id = response.get_json()['campaign_id']
+
+        # /analyze işi kuyruğa alır (202); süre iş bitene kadar ölçülür
+        started = time.perf_counter()
+        response = client.post(f'/api/campaign/{campaign_id}/analyze')
+        if response.status_code != 202:
+            raise RuntimeError(f"/analyze {response.status_code}: {response.get_json()}")
+        while True:
+            job = client.get(response.headers['Location']).get_json()['job']
+            if job['status'] == 'completed':
+                break
+            if job['status'] == 'error':
+                raise RuntimeError(f"/analyze işi hata ile bitti: {job['error']}")
+            time.sleep(0.05)
+        flow.analyze_seconds.append(time.perf_counter() - started)
+
+        client.get(f'/api/campaign/{campaign_id}/files')
+        return campaign_id
+
+    flow.analyze_seconds = []
+    timed(timings, 'http_analyze_flow', flow, repeat=repeat)
+    runs = flow.analyze_seconds
+    timings['http_analyze'] = {'seconds': round(sorted(runs)[len(runs) // 2], 4), 'runs': [round(r, 4) for r in runs]}
+    print(f"⏱️  {'http_analyze':<26} {timings['http_analyze']['seconds']:8.3f} sn")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Baseline ile karşılaştır
+
+    Returns:
+        dict: {ad: {'baseline', 'current', 'ratio', 'status'}}
+            status: regression, improvement, ok
+    """
+    comparison = {}
+    for name, timing in results['timings'].items():
+        base = baseline.get('timings', {}).get(name)
+        if not base:
+            continue
+        current, previous = timing['seconds'], base['seconds']
+        ratio = current / previous if previous else None
+        status = 'ok'
+        if ratio is not None and abs(current - previous) >= MIN_DELTA_SECONDS:
+            if ratio > 1 + tolerance:
+                status = 'regression'
+            elif ratio < 1 - tolerance:
+                status = 'improvement'
+        comparison[name] = {
+            'baseline': previous,
+            'current': current,
+            'ratio': round(ratio, 3) if ratio is not None else None,
+            'status': status
+        }
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Uçtan uca pipeline benchmark')
+    parser.add_argument('--scale', default='10k', help=f"{', '.join(SCALES)} veya alıcı sayısı")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=1, help='Her ölçüm kaç kez (medyan alınır)')
+    parser.add_argument('--output', help='Sonuç JSON (varsayılan benchmarks/results/pipeline_<scale>.json)')
+    parser.add_argument('--baseline', help='Baseline JSON (varsayılan benchmarks/baselines/pipeline_<scale>.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='Sonucu baseline olarak kaydet')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='İzin verilen yavaşlama oranı')
+    parser.add_argument('--skip-http', action='store_true', help='Web akışını ölçme')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output or os.path.join(RESULTS_DIR, f"pipeline_{args.scale}.json"))
+    baseline_path = os.path.abspath(args.baseline or os.path.join(BASELINES_DIR, f"pipeline_{args.scale}.json"))
+
+    print(f"🧪 İş yükü hazırlanıyor ({args.scale})...")
+    workload = load_or_generate(args.scale, os.path.join(WORKLOAD_DIR, args.scale), seed=args.seed)
+    print(f"   {workload['buyers']:,} alıcı, {workload['submissions']:,} form kaydı")
+
+    os.environ['DATA_SOURCE'] = 'sqlite'
+    os.environ['DATA_SOURCE_PATH'] = workload['source_db']
+
+    # Kampanya/rollup store'ları ve çıktılar geçici dizinde
+    work_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    os.chdir(work_dir)
+    from app.utils.metrics import peak_rss_bytes
+
+    timings = {}
+    try:
+        counts = bench_functions(workload, work_dir, timings, args.repeat)
+        if not args.skip_http:
+            bench_http(workload, work_dir, timings, args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'scale': args.scale,
+        'created_at': datetime.now().isoformat(),
+        'workload': {k: workload[k] for k in ('buyers', 'unique_buyers', 'submissions', 'adsets', 'seed')},
+        'counts': counts,
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count()
+        },
+        'peak_rss_mb': round(peak_rss_bytes() / 1024 / 1024, 1),
+        'timings': timings
+    }
+
+    exit_code = 0
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        results['comparison'] = compare(results, baseline, args.tolerance)
+        results['baseline'] = {'path': baseline_path, 'created_at': baseline.get('created_at')}
+        print(f"\n📊 Baseline karşılaştırması ({baseline.get('created_at')}):")
+        for name, entry in results['comparison'].items():
+            icon = {'regression': '🔴', 'improvement': '🟢'}.get(entry['status'], '⚪')
+            print(f"{icon} {name:<26} {entry['baseline']:8.3f} → {entry['current']:8.3f} sn (x{entry['ratio']})")
+        if any(e['status'] == 'regression' for e in results['comparison'].values()):
+            exit_code = 1
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Sonuçlar: {output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        shutil.copyfile(output, baseline_path)
+        print(f"📌 Baseline kaydedildi: {baseline_path}")
+
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
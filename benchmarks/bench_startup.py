@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Açılış (startup) benchmark'ı
+Her ölçüm temiz bir Python sürecinde yapılır:
+- create_app: uygulamanın import + oluşturulma süresi ve sonunda yüklü olan
+  ağır modüller (pandas, sqlalchemy, paramiko ... yüklenmemiş olmalı)
+- first_login: oluşturulan uygulamada ilk /login isteği
+- first_pipeline: ilk analiz öncesi ağır modüllerin yüklenmesi
+  (preload_heavy_modules; gunicorn preload modunda master'da bir kez ödenir)
+- gunicorn_ready_*: gunicorn.conf.py ile preload açık/kapalı başlatılıp ilk
+  /login cevabına kadar geçen süre
+
+`python -X importtime` çıktısından en pahalı import'lar da rapora eklenir.
+Sonuçlar bench_pipeline.py ile aynı biçimde baseline ile karşılaştırılır.
+
+Kullanım:
+    python benchmarks/bench_startup.py --save-baseline
+    python benchmarks/bench_startup.py --repeat 5
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+import http.client
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, REPO_DIR)
+
+from bench_pipeline import compare
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINES_DIR = os.path.join(BENCH_DIR, 'baselines')
+
+HEAVY_PACKAGES = ('pandas', 'numpy', 'pyarrow', 'sqlalchemy', 'pymysql', 'sshtunnel', 'paramiko')
+
+# Temiz süreçte çalışır; ölçümleri JSON olarak stdout'a yazar
+PROBE = r'''
+import io, sys, json, time, contextlib
+started = time.perf_counter()
+from app import create_app, preload_heavy_modules
+app = create_app()
+create_seconds = time.perf_counter() - started
+loaded = [m for m in HEAVY if m in sys.modules]
+
+client = app.test_client()
+started = time.perf_counter()
+status = client.get('/login').status_code
+login_seconds = time.perf_counter() - started
+
+with contextlib.redirect_stdout(io.StringIO()):
+    pipeline_seconds = preload_heavy_modules()
+print(json.dumps({'create_app': create_seconds, 'first_login': login_seconds, 'login_status': status,
+                  'first_pipeline': pipeline_seconds, 'heavy_loaded': loaded}))
+'''
+
+
+def _env(data_root):
+    env = dict(os.environ)
+    env.update({
+        'UPLOAD_FOLDER': os.path.join(data_root, 'uploads'),
+        'OUTPUT_FOLDER': os.path.join(data_root, 'output'),
+        'PROFILE_FOLDER': os.path.join(data_root, 'profiles'),
+        'PYTHONPATH': REPO_DIR
+    })
+    return env
+
+
+def probe(data_root):
+    """Temiz süreçte create_app / ilk istek / pipeline yükleme süreleri"""
+    code = f"HEAVY = {HEAVY_PACKAGES!r}\n{PROBE}"
+    result = subprocess.run([sys.executable, '-c', code], cwd=data_root, env=_env(data_root),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(data_root, top):
+    """
+    python -X importtime çıktısından kümülatif süreye göre en pahalı import'lar
+
+    Returns:
+        tuple: (toplam ms, [{'module', 'depth', 'self_ms', 'cumulative_ms'}])
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'from app import create_app; create_app()'],
+                            cwd=data_root, env=_env(data_root), capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_ms': round(int(self_us) / 1000, 1),
+            'cumulative_ms': round(int(cumulative_us) / 1000, 1)
+        })
+    total_ms = round(sum(r['cumulative_ms'] for r in rows if r['depth'] == 0), 1)
+    rows.sort(key=lambda r: r['cumulative_ms'], reverse=True)
+    return total_ms, rows[:top]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def gunicorn_ready(data_root, preload, workers, timeout=120):
+    """gunicorn.conf.py ile başlat; ilk başarılı /login cevabına kadar geçen süre"""
+    port = _free_port()
+    env = dict(_env(data_root), GUNICORN_PRELOAD='1' if preload else '0',
+               WEB_CONCURRENCY=str(workers), PORT=str(port))
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_DIR, 'gunicorn.conf.py'),
+               '--pythonpath', REPO_DIR, '-b', f'127.0.0.1:{port}', 'run:app']
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=data_root, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn başlamadı')
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                conn.request('GET', '/login')
+                status = conn.getresponse().status
+                conn.close()
+                if status == 200:
+                    return time.perf_counter() - started
+            except OSError:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError('gunicorn zaman aşımı')
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _median_timing(runs):
+    return {'seconds': round(sorted(runs)[len(runs) // 2], 4), 'runs': [round(r, 4) for r in runs]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Açılış / import süresi benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='Her ölçüm kaç temiz süreçte (medyan alınır)')
+    parser.add_argument('--top', type=int, default=15, help='Raporlanacak en pahalı import sayısı')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn ölçümünde worker sayısı')
+    parser.add_argument('--skip-gunicorn', action='store_true', help='gunicorn açılışını ölçme')
+    parser.add_argument('--output', help='Sonuç JSON (varsayılan benchmarks/results/startup.json)')
+    parser.add_argument('--baseline', help='Baseline JSON (varsayılan benchmarks/baselines/startup.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='Sonucu baseline olarak kaydet')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='İzin verilen yavaşlama oranı')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output or os.path.join(RESULTS_DIR, 'startup.json'))
+    baseline_path = os.path.abspath(args.baseline or os.path.join(BASELINES_DIR, 'startup.json'))
+
+    data_root = tempfile.mkdtemp(prefix='bench_startup_')
+    timings = {}
+    try:
+        probe(data_root)  # .pyc'ler hazır olsun; ilk süreç ölçülmez
+        probes = [probe(data_root) for _ in range(args.repeat)]
+        for name in ('create_app', 'first_login', 'first_pipeline'):
+            timings[name] = _median_timing([p[name] for p in probes])
+            print(f"⏱️  {name:<26} {timings[name]['seconds']:8.3f} sn")
+        heavy_loaded = sorted({m for p in probes for m in p['heavy_loaded']})
+        print(f"📦 create_app sonrası yüklü ağır modüller: {', '.join(heavy_loaded) or 'yok'}")
+
+        imports_total_ms, imports = import_profile(data_root, args.top)
+        print(f"\n📥 En pahalı import'lar (toplam {imports_total_ms:.0f} ms):")
+        for row in imports:
+            print(f"   {row['cumulative_ms']:8.1f} ms  {'  ' * row['depth']}{row['module']}")
+
+        if not args.skip_gunicorn:
+            print()
+            for preload in (True, False):
+                name = f"gunicorn_ready_{'preload' if preload else 'lazy'}"
+                timings[name] = _median_timing([gunicorn_ready(data_root, preload, args.workers)
+                                                for _ in range(args.repeat)])
+                print(f"⏱️  {name:<26} {timings[name]['seconds']:8.3f} sn")
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+
+    results = {
+        'created_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'cpus': os.cpu_count(),
+        'heavy_loaded_after_create_app': heavy_loaded,
+        'imports_total_ms': imports_total_ms,
+        'imports': imports,
+        'timings': timings
+    }
+
+    exit_code = 0
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        results['comparison'] = compare(results, baseline, args.tolerance)
+        results['baseline'] = {'path': baseline_path, 'created_at': baseline.get('created_at')}
+        print(f"\n📊 Baseline karşılaştırması ({baseline.get('created_at')}):")
+        for name, entry in results['comparison'].items():
+            icon = {'regression': '🔴', 'improvement': '🟢'}.get(entry['status'], '⚪')
+            print(f"{icon} {name:<26} {entry['baseline']:8.3f} → {entry['current']:8.3f} sn (x{entry['ratio']})")
+        if any(e['status'] == 'regression' for e in results['comparison'].values()):
+            exit_code = 1
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Sonuçlar: {output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        shutil.copyfile(output, baseline_path)
+        print(f"📌 Baseline kaydedildi: {baseline_path}")
+
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
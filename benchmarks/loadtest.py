@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP yük testi
+Uygulamayı yerelde (ağ erişimi gerekmeden) geliştirme sunucusu ve farklı
+gunicorn worker/thread ayarlarıyla başlatır; giriş yapmış eşzamanlı
+kullanıcılarla karışık trafik üretir ve uç nokta bazında p50/p95/p99 gecikme
+ile throughput ölçer. Veritabanı yerine workload.py'nin SQLite iş yükü
+(DATA_SOURCE=sqlite) kullanılır.
+
+Trafik: ana sayfa, sonuç sayfası (results.html), dosya listesi yoklaması
+(ETag ile), önizleme, adım verisi, indirme ve /analyze.
+
+Kullanım:
+    python benchmarks/loadtest.py --servers dev,gunicorn:4x1,gunicorn:2x4 --concurrency 4,16 --duration 15
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+import subprocess
+import http.client
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, quote
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, REPO_DIR)
+
+from workload import load_or_generate
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+WORKLOAD_DIR = os.path.join(BENCH_DIR, '.workload')
+
+DEFAULT_MIX = 'index=10,results=10,files=30,preview=20,step=15,download=10,analyze=5'
+# Hata sayılmayan durum kodları (304: ETag, 409: analiz zaten sırada, 429: kullanıcı kuyruğu dolu)
+OK_STATUS = {200, 202, 206, 304, 409, 429}
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Bilinmeyen uç nokta: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def parse_server(spec):
+    """dev | gunicorn:<worker>x<thread>"""
+    if spec == 'dev':
+        return {'name': 'dev', 'kind': 'dev'}
+    kind, _, shape = spec.partition(':')
+    if kind != 'gunicorn':
+        raise ValueError(f"Bilinmeyen sunucu: {spec}")
+    workers, _, threads = (shape or '2x1').partition('x')
+    return {'name': spec, 'kind': 'gunicorn', 'workers': int(workers), 'threads': int(threads or 1)}
+
+
+def seed_campaigns(workload, data_root, count, analyze_count):
+    """
+    Okuma trafiği için analiz edilmiş kampanyalar ve /analyze trafiği için
+    ayrı kampanyalar oluştur (uygulama içinden, test client ile)
+
+    Returns:
+        dict: {'read': [{'id', 'csv', 'downloads'}], 'analyze': [id, ...]}
+    """
+    from app import create_app
+    from app.services.export_service import export_name
+    from app.services.pipeline_service import campaign_output_dir
+
+    app = create_app()
+    client = app.test_client()
+    _login_test_client(client)
+
+    def create(name):
+        with open(workload['buyers_csv'], 'rb') as f:
+            response = client.post('/api/campaign/create', data={
+                'name': name,
+                'start_date': workload['start_date'],
+                'end_date': workload['end_date'],
+                'file': (f, 'buyers.csv')
+            }, content_type='multipart/form-data')
+        return response.get_json()['campaign_id']
+
+    campaigns = {'read': [], 'analyze': []}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(count + analyze_count):
+            campaign_id = create(f"Yük Testi {i + 1}")
+            response = client.post(f'/api/campaign/{campaign_id}/analyze')
+            if response.status_code not in (200, 202):
+                raise RuntimeError(f"Kampanya analizi başarısız: {response.get_json()}")
+            files = _wait_for_files(client, campaign_id)
+            if i >= count:
+                campaigns['analyze'].append(campaign_id)
+                continue
+            names = [f['filename'] for f in files]
+            campaigns['read'].append({
+                'id': campaign_id,
+                'csv': export_name(campaign_output_dir(app.config['OUTPUT_FOLDER'], campaign_id), 'csv'),
+                'downloads': [n for n in names if n.endswith(('.csv', '.xlsx'))]
+            })
+    # Test sırasında sunucunun kuyruğa aldığı işleri bu süreç almasın
+    from app.routes import scheduler
+    scheduler.stop()
+    return campaigns
+
+
+def _login_test_client(client):
+    client.post('/login', data={
+        'username': os.environ.get('ADMIN_USERNAME', 'admin'),
+        'password': os.environ.get('ADMIN_PASSWORD', 'admin123')
+    })
+
+
+def _wait_for_files(client, campaign_id, timeout=300):
+    """Analiz bitene kadar dosya listesini yokla"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        data = client.get(f'/api/campaign/{campaign_id}/files').get_json()
+        if data['status'] == 'completed' and data['files']:
+            return data['files']
+        if data['status'] == 'error':
+            raise RuntimeError(f"Kampanya analizi başarısız: {campaign_id}")
+        time.sleep(0.2)
+    raise RuntimeError(f"Kampanya analizi zaman aşımına uğradı: {campaign_id}")
+
+
+def start_server(server, port, data_root, env):
+    """Sunucuyu alt süreçte başlat ve hazır olmasını bekle"""
+    if server['kind'] == 'dev':
+        command = [sys.executable, os.path.join(REPO_DIR, 'run.py')]
+    else:
+        # Üretim ayarları (gunicorn.conf.py); worker/thread sayısı komut satırından
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_DIR, 'gunicorn.conf.py'),
+                   '--pythonpath', REPO_DIR,
+                   '-b', f'127.0.0.1:{port}', '-w', str(server['workers']),
+                   '--threads', str(server['threads']), '--timeout', '300', 'run:app']
+
+    log = open(os.path.join(data_root, f"server_{server['name'].replace(':', '_')}.log"), 'w')
+    process = subprocess.Popen(command, cwd=data_root, stdout=log, stderr=subprocess.STDOUT,
+                               env=dict(env, PORT=str(port), DEBUG='False'))
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Sunucu başlamadı ({server['name']}), log: {log.name}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/login')
+            conn.getresponse().read()
+            conn.close()
+            return process, log
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Sunucu zaman aşımı ({server['name']}), log: {log.name}")
+
+
+def stop_server(process, log):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    log.close()
+
+
+class Session:
+    """Tek kullanıcı: kalıcı bağlantı, oturum çerezi ve ETag'ler"""
+
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+        self.cookies = {}
+        self.etags = {}
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{k}={v}" for k, v in self.cookies.items())
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Sunucu bağlantıyı kapattıysa bir kez yeniden bağlan
+            self.conn.close()
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+        response.read()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        if response.will_close:
+            self.conn.close()
+        return response
+
+    def login(self):
+        body = urlencode({
+            'username': os.environ.get('ADMIN_USERNAME', 'admin'),
+            'password': os.environ.get('ADMIN_PASSWORD', 'admin123')
+        })
+        self.request('POST', '/login', body=body,
+                     headers={'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def close(self):
+        self.conn.close()
+
+
+def _index(session, campaigns, rng):
+    return session.request('GET', '/')
+
+
+def _results(session, campaigns, rng):
+    return session.request('GET', f"/campaign/{rng.choice(campaigns['read'])['id']}")
+
+
+def _files(session, campaigns, rng):
+    # Sonuç sayfasının yoklaması gibi: ETag ile koşullu istek
+    path = f"/api/campaign/{rng.choice(campaigns['read'])['id']}/files"
+    headers = {'If-None-Match': session.etags[path]} if path in session.etags else {}
+    response = session.request('GET', path, headers=headers)
+    if response.headers.get('ETag'):
+        session.etags[path] = response.headers['ETag']
+    return response
+
+
+def _preview(session, campaigns, rng):
+    campaign = rng.choice(campaigns['read'])
+    offset = rng.choice([0, 0, 50, 500])
+    return session.request('GET', f"/api/campaign/{campaign['id']}/preview/{quote(campaign['csv'])}?offset={offset}&limit=50")
+
+
+def _step(session, campaigns, rng):
+    campaign = rng.choice(campaigns['read'])
+    return session.request('GET', f"/api/campaign/{campaign['id']}/data/final_analysis?offset={rng.choice([0, 100])}&limit=100")
+
+
+def _download(session, campaigns, rng):
+    campaign = rng.choice(campaigns['read'])
+    return session.request('GET', f"/api/campaign/{campaign['id']}/download/{quote(rng.choice(campaign['downloads']))}")
+
+
+def _analyze(session, campaigns, rng):
+    return session.request('POST', f"/api/campaign/{rng.choice(campaigns['analyze'])}/analyze")
+
+
+ENDPOINTS = {
+    'index': _index,
+    'results': _results,
+    'files': _files,
+    'preview': _preview,
+    'step': _step,
+    'download': _download,
+    'analyze': _analyze
+}
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 1)
+
+
+def run_load(port, campaigns, mix, concurrency, duration, seed=0):
+    """
+    concurrency kullanıcıyla duration saniye trafik üret
+
+    Returns:
+        dict: toplam ve uç nokta bazında istek sayısı, hata, rps, p50/p95/p99 (ms)
+    """
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    statuses = {name: {} for name in names}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [None]
+
+    def user(index):
+        rng = random.Random(seed * 1000 + index)
+        session = Session(port)
+        session.login()
+        start_barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = ENDPOINTS[name](session, campaigns, rng).status
+            except Exception:
+                status = 'exception'
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples[name].append(elapsed)
+                statuses[name][str(status)] = statuses[name].get(str(status), 0) + 1
+                if status not in OK_STATUS:
+                    errors[name] += 1
+        session.close()
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name in names:
+        latencies = sorted(samples[name])
+        endpoints[name] = {
+            'requests': len(latencies),
+            'errors': errors[name],
+            'statuses': statuses[name],
+            'rps': round(len(latencies) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 1) if latencies else None,
+            'p50_ms': _percentile(latencies, 0.50),
+            'p95_ms': _percentile(latencies, 0.95),
+            'p99_ms': _percentile(latencies, 0.99)
+        }
+    all_latencies = sorted(v for values in samples.values() for v in values)
+    return {
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 2),
+        'requests': len(all_latencies),
+        'errors': sum(errors.values()),
+        'rps': round(len(all_latencies) / elapsed, 2),
+        'p50_ms': _percentile(all_latencies, 0.50),
+        'p95_ms': _percentile(all_latencies, 0.95),
+        'p99_ms': _percentile(all_latencies, 0.99),
+        'endpoints': endpoints
+    }
+
+
+def print_run(server, run):
+    print(f"\n🖥️  {server} | {run['concurrency']} kullanıcı | {run['requests']} istek, "
+          f"{run['rps']} istek/sn, hata: {run['errors']}")
+    print(f"   {'uç nokta':<10} {'istek':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'hata':>6}")
+    for name, e in run['endpoints'].items():
+        if not e['requests']:
+            continue
+        print(f"   {name:<10} {e['requests']:>7} {e['rps']:>8} {e['p50_ms']:>8} "
+              f"{e['p95_ms']:>8} {e['p99_ms']:>8} {e['errors']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP yük testi')
+    parser.add_argument('--scale', default='1k', help='Kampanya alıcı dosyası ölçeği (workload.py)')
+    parser.add_argument('--servers', default='dev,gunicorn:4x1,gunicorn:2x4',
+                        help='dev ve/veya gunicorn:<worker>x<thread> listesi')
+    parser.add_argument('--concurrency', default='4,16', help='Eşzamanlı kullanıcı sayıları')
+    parser.add_argument('--duration', type=float, default=15, help='Her koşu süresi (sn)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Trafik ağırlıkları (ad=ağırlık,...)')
+    parser.add_argument('--campaigns', type=int, default=4, help='Okunan kampanya sayısı')
+    parser.add_argument('--analyze-campaigns', type=int, default=2, help='/analyze trafiği kampanya sayısı')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--output', help='Sonuç JSON (varsayılan benchmarks/results/loadtest.json)')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    servers = [parse_server(s.strip()) for s in args.servers.split(',') if s.strip()]
+    levels = [int(c) for c in args.concurrency.split(',')]
+    output = os.path.abspath(args.output or os.path.join(RESULTS_DIR, 'loadtest.json'))
+
+    print(f"🧪 İş yükü hazırlanıyor ({args.scale})...")
+    workload = load_or_generate(args.scale, os.path.join(WORKLOAD_DIR, args.scale))
+
+    # Tüm sunucular aynı geçici veri dizinini kullanır (repo'daki data/ etkilenmez)
+    data_root = tempfile.mkdtemp(prefix='loadtest_')
+    env = dict(os.environ,
+               DATA_SOURCE='sqlite',
+               DATA_SOURCE_PATH=workload['source_db'],
+               UPLOAD_FOLDER=os.path.join(data_root, 'uploads'),
+               OUTPUT_FOLDER=os.path.join(data_root, 'output'),
+               PYTHONUNBUFFERED='1')
+    os.environ.update({k: env[k] for k in ('DATA_SOURCE', 'DATA_SOURCE_PATH', 'UPLOAD_FOLDER', 'OUTPUT_FOLDER')})
+    os.chdir(data_root)
+
+    print(f"📦 {args.campaigns + args.analyze_campaigns} kampanya hazırlanıyor...")
+    campaigns = seed_campaigns(workload, data_root, args.campaigns, args.analyze_campaigns)
+    if 'analyze' in mix and not campaigns['analyze']:
+        mix.pop('analyze')
+
+    results = {
+        'created_at': datetime.now().isoformat(),
+        'scale': args.scale,
+        'mix': mix,
+        'duration': args.duration,
+        'cpus': os.cpu_count(),
+        'runs': []
+    }
+    try:
+        for server in servers:
+            process, log = start_server(server, args.port, data_root, env)
+            try:
+                for concurrency in levels:
+                    run = run_load(args.port, campaigns, mix, concurrency, args.duration)
+                    run['server'] = server['name']
+                    results['runs'].append(run)
+                    print_run(server['name'], run)
+            finally:
+                stop_server(process, log)
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+
+    print("\n📊 Karşılaştırma (istek/sn | p95 ms):")
+    print(f"   {'sunucu':<16}" + ''.join(f"{f'{c} kullanıcı':>22}" for c in levels))
+    for server in servers:
+        cells = []
+        for concurrency in levels:
+            run = next(r for r in results['runs'] if r['server'] == server['name'] and r['concurrency'] == concurrency)
+            cells.append(f"{run['rps']:>10} | {run['p95_ms']:>8}")
+        print(f"   {server['name']:<16}" + ''.join(f"{c:>22}" for c in cells))
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Sonuçlar: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sentetik iş yükü üreteci
+Gerçekçi bir alıcı dosyası (satin-alanlar.csv formatı) ve ona uyan
+iframe_form_submissions / meta_adsets verisini yerel SQLite veri kaynağına
+(DATA_SOURCE=sqlite) yazar. Kapsanan durumlar:
+- email başına birden fazla form kaydı, hiç kaydı olmayan alıcılar
+- {{placeholder}} UTM'ler, boş ('' ve NULL) UTM'ler, organik kaynaklar
+- Türkçe karakterli ad/kampanya/adset adları
+- tekrar eden alıcılar (farklı büyük/küçük harf ve boşlukla)
+- tarih aralığı dışındaki kayıtlar ve alıcı olmayan email'lerin kayıtları
+
+Kullanım:
+    python benchmarks/workload.py --scale 10k --out benchmarks/.workload/10k
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.utils.data_source import SQLiteDataSource
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+BUYERS_FILENAME = 'buyers.csv'
+SOURCE_FILENAME = 'source.db'
+MANIFEST_FILENAME = 'workload.json'
+
+FIRST_NAMES = ['Ayşe', 'Fatma', 'Emine', 'Hülya', 'Özge', 'Gülşen', 'Şükrü', 'Çağrı', 'İsmail',
+               'Oğuz', 'Mehmet', 'Ömer', 'Büşra', 'Ilgın', 'Gökçe', 'Ümit', 'Cem', 'Deniz']
+LAST_NAMES = ['Yılmaz', 'Kaya', 'Demir', 'Çelik', 'Şahin', 'Öztürk', 'Aydın', 'Arslan', 'Doğan',
+              'Kılıç', 'Aslan', 'Çetin', 'Koç', 'Kurt', 'Özdemir', 'Güneş', 'Erdoğan', 'Bereket']
+EMAIL_DOMAINS = ['gmail.com', 'hotmail.com', 'outlook.com', 'yahoo.com', 'icloud.com', 'yandex.com']
+SOURCES = ['THRIVE_CART', 'SHOPIER', 'IYZICO']
+PRODUCTS = ['OTU PREMIUM 6 AYLIK 297$', 'OTU PREMIUM YILLIK ETSY', 'KALDIRAÇ METODU']
+CAMPAIGN_NAMES = ['UB KM {i} | Lansmanlar | CBO | Lead', 'UB KM {i} | SOĞUK | CBO | Lead',
+                  'Etsy Eğitimi {i} | Sıcak Kitle', 'Kaldıraç Metodu {i} | Dönüşüm | Ağustos']
+META_SOURCES = ['fb', 'ig', 'facebook', 'instagram']
+ORGANIC_SOURCES = ['google', 'youtube', 'tiktok', 'newsletter']
+PLACEHOLDERS = ['{{ad.name}}', '{{adset.id}}', '{{campaign.name}}']
+
+# Form kaydı UTM türleri ve olasılıkları
+UTM_KINDS = ['meta', 'placeholder', 'organic', 'empty', 'null']
+UTM_WEIGHTS = [0.55, 0.08, 0.15, 0.12, 0.10]
+
+ADSET_ID_BASE = 120_234_000_000_000_000
+
+
+def _ascii(values):
+    """Türkçe karakterleri email için sadeleştir"""
+    table = str.maketrans('çğıöşüÇĞİÖŞÜ', 'cgiosuCGIOSU')
+    return pd.Series(values).str.translate(table).str.lower()
+
+
+def _pick(rng, values, size):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), size)]
+
+
+def make_buyers(count, start, days, rng):
+    """
+    Alıcı dosyası: %3'ü tekrar eden alıcı (aynı email, farklı yazım/tarih)
+
+    Returns:
+        tuple: (df_buyers, email_keys) email_keys: tekil alıcıların normalize email'leri
+    """
+    unique = max(1, int(count * 0.97))
+    first = _pick(rng, FIRST_NAMES, unique)
+    last = _pick(rng, LAST_NAMES, unique)
+    local = _ascii(first) + '.' + _ascii(last) + pd.Series(np.arange(unique)).astype(str)
+    email_keys = (local + '@' + pd.Series(_pick(rng, EMAIL_DOMAINS, unique))).to_numpy()
+
+    index = np.concatenate([np.arange(unique), rng.integers(0, unique, count - unique)])
+    rng.shuffle(index)
+    emails = pd.Series(email_keys[index])
+
+    # Yazım farkları: büyük harf ve baş/son boşluk
+    upper = rng.random(count) < 0.05
+    emails[upper] = emails[upper].str.title()
+    padded = rng.random(count) < 0.03
+    emails[padded] = ' ' + emails[padded] + ' '
+
+    purchased = pd.Series(start + pd.to_timedelta(rng.integers(0, days * 86400, count), unit='s'))
+    df = pd.DataFrame({
+        'AD SOYAD': pd.Series(first[index]) + ' ' + pd.Series(last[index]),
+        'MAİL ADRESİ': emails,
+        'TELEFON NUMARASI': pd.Series(rng.integers(5_300_000_000, 5_599_999_999, count)).astype(str),
+        'DATE': purchased.dt.strftime('%d.%m.%Y %H:%M:%S'),
+        'KAYNAK': _pick(rng, SOURCES, count),
+        'URUN ADI': _pick(rng, PRODUCTS, count)
+    })
+    return df, email_keys
+
+
+def make_adsets(count, rng):
+    """meta_adsets: Türkçe karakterli adlar"""
+    ids = ADSET_ID_BASE + np.arange(count) * 1_000_067
+    names = pd.Series(_pick(rng, ['SOĞUK', 'Sıcak', 'Lookalike %1 Türkiye', 'Geniş İlgi', 'Öğrenciler'], count))
+    return pd.DataFrame({'adset_id': ids.astype(str), 'name': names + ' | ' + pd.Series(np.arange(count)).astype(str)})
+
+
+def make_submissions(email_keys, adset_ids, start, days, rng, noise_emails):
+    """
+    Form kayıtları: alıcıların %12'sinin kaydı yok, diğerlerinin 1-20 kaydı
+    var; kayıtların bir kısmı analiz aralığının dışında. Alıcı olmayan
+    email'lerin kayıtları da eklenir.
+    """
+    has_forms = rng.random(len(email_keys)) >= 0.12
+    per_email = np.minimum(rng.geometric(0.45, len(email_keys)), 20) * has_forms
+    owners = np.repeat(np.arange(len(email_keys)), per_email)
+    emails = pd.Series(email_keys[owners])
+
+    noise = pd.Series([f"lead{i}@example.com" for i in range(noise_emails)])
+    emails = pd.concat([emails, noise], ignore_index=True)
+    rows = len(emails)
+
+    # Analiz aralığı ve ±30 gün (aralık dışı kayıtlar süzülmeli)
+    offsets = rng.integers(-30 * 86400, (days + 30) * 86400, rows)
+    created_at = start + pd.to_timedelta(offsets, unit='s')
+
+    # Kayıtların bir kısmında email farklı yazılmış (LOWER(TRIM()) ile eşleşir)
+    upper = rng.random(rows) < 0.04
+    emails[upper] = emails[upper].str.upper()
+
+    kind = rng.choice(UTM_KINDS, rows, p=UTM_WEIGHTS)
+    adsets = _pick(rng, adset_ids, rows)
+    template = rng.integers(0, len(CAMPAIGN_NAMES), rows)
+    heads, tails = zip(*(name.split('{i}') for name in CAMPAIGN_NAMES))
+    campaigns = (pd.Series(np.asarray(heads, dtype=object)[template])
+                 + pd.Series(rng.integers(1, 200, rows)).astype(str)
+                 + pd.Series(np.asarray(tails, dtype=object)[template]))
+
+    def column(meta, placeholder, organic):
+        values = np.full(rows, None, dtype=object)
+        values[kind == 'meta'] = meta[kind == 'meta']
+        values[kind == 'placeholder'] = placeholder[kind == 'placeholder']
+        values[kind == 'organic'] = organic[kind == 'organic']
+        values[kind == 'empty'] = ''
+        return values
+
+    placeholder = _pick(rng, PLACEHOLDERS, rows)
+    none = np.full(rows, None, dtype=object)
+    return pd.DataFrame({
+        'email': emails,
+        'created_at': created_at,
+        'utm_source': column(_pick(rng, META_SOURCES, rows), _pick(rng, META_SOURCES, rows),
+                             _pick(rng, ORGANIC_SOURCES, rows)),
+        'utm_medium': column(np.full(rows, 'paid', dtype=object), np.full(rows, 'paid', dtype=object),
+                             _pick(rng, ['organic', 'video', 'email'], rows)),
+        'utm_campaign': column(campaigns.to_numpy(dtype=object), placeholder, campaigns.to_numpy(dtype=object)),
+        'utm_content': column(_pick(rng, ['OE-HDH-V2', 'SPNSR-KM-ND-4 - Kopya', 'Reels Çekim 3'], rows),
+                              placeholder, none),
+        'utm_term': column(adsets, np.full(rows, '{{adset.id}}', dtype=object), none)
+    }).sort_values('created_at', kind='mergesort').reset_index(drop=True)
+
+
+def generate_workload(scale, out_dir, seed=42, start_date='2025-01-01', end_date='2025-03-31'):
+    """
+    İş yükünü üret ve out_dir'e yaz (buyers.csv, source.db, workload.json)
+
+    Args:
+        scale: SCALES anahtarı veya alıcı satır sayısı
+
+    Returns:
+        dict: workload.json içeriği (yollar, tarih aralığı, satır sayıları)
+    """
+    buyers = SCALES[scale] if scale in SCALES else int(scale)
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start_date)
+    days = (pd.Timestamp(end_date) - start).days + 1
+
+    df_buyers, email_keys = make_buyers(buyers, start, days, rng)
+    df_adsets = make_adsets(int(np.clip(buyers // 50, 50, 5000)), rng)
+    # adset'lerin %10'u meta_adsets'te yok (eşleşmeyen utm_term)
+    known = df_adsets.sample(frac=0.9, random_state=seed)
+    df_forms = make_submissions(email_keys, df_adsets['adset_id'].to_numpy(dtype=object),
+                                start, days, rng, noise_emails=buyers // 2)
+
+    os.makedirs(out_dir, exist_ok=True)
+    buyers_csv = os.path.join(out_dir, BUYERS_FILENAME)
+    df_buyers.to_csv(buyers_csv, index=False)
+    source_db = os.path.join(out_dir, SOURCE_FILENAME)
+    SQLiteDataSource(source_db).write(df_forms, known)
+
+    manifest = {
+        'scale': scale,
+        'seed': seed,
+        'start_date': start_date,
+        'end_date': end_date,
+        'buyers': len(df_buyers),
+        'unique_buyers': len(email_keys),
+        'submissions': len(df_forms),
+        'adsets': len(known),
+        'buyers_csv': os.path.abspath(buyers_csv),
+        'source_db': os.path.abspath(source_db)
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_or_generate(scale, out_dir, seed=42):
+    """Aynı ölçek ve seed ile üretilmiş iş yükü varsa onu kullan"""
+    path = os.path.join(out_dir, MANIFEST_FILENAME)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('scale') == scale and manifest.get('seed') == seed \
+                and os.path.exists(manifest['source_db']) and os.path.exists(manifest['buyers_csv']):
+            return manifest
+    return generate_workload(scale, out_dir, seed=seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sentetik iş yükü üreteci')
+    parser.add_argument('--scale', default='10k', help=f"{', '.join(SCALES)} veya alıcı sayısı")
+    parser.add_argument('--out', help='Çıktı dizini (varsayılan benchmarks/.workload/<scale>)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    out_dir = args.out or os.path.join(os.path.dirname(__file__), '.workload', args.scale)
+    print(f"🧪 {args.scale} ölçekli iş yükü üretiliyor → {out_dir}")
+    manifest = generate_workload(args.scale, out_dir, seed=args.seed)
+    print(f"✅ {manifest['buyers']:,} alıcı ({manifest['unique_buyers']:,} tekil), "
+          f"{manifest['submissions']:,} form kaydı, {manifest['adsets']:,} adset")
+    print(f"   DATA_SOURCE=sqlite DATA_SOURCE_PATH={manifest['source_db']}")
+
+
+if __name__ == '__main__':
+    main()
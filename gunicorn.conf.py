@@ -0,0 +1,58 @@
+"""
+Gunicorn ayarları (üretim)
+
+    gunicorn -c gunicorn.conf.py run:app
+
+- preload_app: Uygulama ve ağır modüller (pandas, pyarrow, servisler, MySQL/SSH
+  sürücüleri) master süreçte bir kez yüklenir; worker'lar fork ile kopyalanır.
+  Worker açılışı ve max_requests sonrası yeniden başlatmalar ucuzlar, sayfalar
+  bellekte paylaşılır. GUNICORN_PRELOAD=0 ile kapatılır (her worker kendi
+  yükler; modüller ilk analizde/ilk veri isteğinde yüklenir).
+- Analizler worker'ın arka plan thread'lerinde çalışır (bkz. scheduler_service);
+  yeniden başlatma/kapanışta çalışan analiz graceful_timeout kadar beklenir,
+  bu yüzden süre uzundur. Kapanan worker kuyruktan yeni iş almaz (worker_exit).
+"""
+
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Analizler CPU ağırlıklı (pandas): çekirdek başına bir worker, G/Ç beklerken
+# (veritabanı, dosya indirme) diğer isteklere thread'ler bakar
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 900))
+graceful_timeout = timeout
+keepalive = 5
+
+# Uzun süreli worker'larda pandas bellek parçalanmasını sınırla
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+
+# Heartbeat dosyası diskte değil bellekte (Docker overlay fs'te takılmasın)
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    """Worker'lar fork edilmeden önce (master'da) ağır modülleri yükle"""
+    if not preload_app:
+        return
+    from app import preload_heavy_modules
+    seconds = preload_heavy_modules()
+    server.log.info("Ağır modüller master süreçte yüklendi (%.2f sn)", seconds)
+
+
+def worker_exit(server, worker):
+    """Kapanan worker'ın dağıtıcısı yeni iş almasın; elindeki analizler biter"""
+    from app.routes import scheduler
+    scheduler.stop()